@@ -0,0 +1,24 @@
+"""product.updated_at index for the in-memory catalog index refresh
+
+Revision ID: 0b5e9d2c7f48
+Revises: f1c6d8a3e594
+Create Date: 2026-10-19 20:45:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b5e9d2c7f48'
+down_revision = 'f1c6d8a3e594'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_product_updated_at', 'product', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_product_updated_at', table_name='product')
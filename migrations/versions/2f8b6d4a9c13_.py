@@ -0,0 +1,53 @@
+"""checkout: sale.offer_id, one sale per product and the idempotency key store
+
+Revision ID: 2f8b6d4a9c13
+Revises: 9c2d5e8f1a36
+Create Date: 2026-10-19 23:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f8b6d4a9c13'
+down_revision = '9c2d5e8f1a36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'idempotency_key',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('request_hash', sa.String(length=64), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('response_body', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('user_id', 'key')
+    )
+    op.create_index('ix_idempotency_key_created_at', 'idempotency_key', ['created_at'], unique=False)
+
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('offer_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_sale_offer_id', 'offer', ['offer_id'], ['id'])
+    op.create_index('uq_sale_product_id', 'sale', ['product_id'], unique=True)
+
+    # Los productos con venta dejan de estar disponibles
+    op.execute("UPDATE product SET status = 'sold' WHERE id IN (SELECT product_id FROM sale)")
+
+
+def downgrade():
+    # Antes solo existían active y reserved: un producto vendido queda reservado
+    op.execute("UPDATE product SET status = 'reserved' WHERE status = 'sold'")
+
+    op.drop_index('uq_sale_product_id', table_name='sale')
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_sale_offer_id', type_='foreignkey')
+        batch_op.drop_column('offer_id')
+
+    op.drop_index('ix_idempotency_key_created_at', table_name='idempotency_key')
+    op.drop_table('idempotency_key')
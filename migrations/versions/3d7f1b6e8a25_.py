@@ -0,0 +1,75 @@
+"""money as integer cents and indexed effective price
+
+Revision ID: 3d7f1b6e8a25
+Revises: 0b5e9d2c7f48
+Create Date: 2026-10-19 21:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d7f1b6e8a25'
+down_revision = '0b5e9d2c7f48'
+branch_labels = None
+depends_on = None
+
+# (tabla, columna en euros, columna en céntimos, tipo)
+MONEY_COLUMNS = (
+    ('product', 'price', 'price_cents', sa.Integer()),
+    ('sale', 'price', 'price_cents', sa.Integer()),
+    ('offer', 'amount', 'amount_cents', sa.Integer()),
+    ('offer_archive', 'amount', 'amount_cents', sa.Integer()),
+    ('seller_stats', 'total_earnings', 'total_earnings_cents', sa.BigInteger()),
+)
+EFFECTIVE_PRICE = 'price_cents - (price_cents * discount + 50) / 100'
+
+
+def _recreate():
+    # SQLite no puede añadir columnas generadas STORED con ALTER TABLE: hay que recrear la tabla
+    return 'always' if op.get_context().dialect.name == 'sqlite' else 'auto'
+
+
+def upgrade():
+    for table, old, new, type_ in MONEY_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(new, type_, nullable=True))
+        # Vía NUMERIC para redondear exacto (19.99 -> 1999, no 1998)
+        op.execute(f'UPDATE "{table}" SET {new} = CAST(ROUND(CAST({old} AS NUMERIC) * 100) AS {type_.compile()})')
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(new, existing_type=type_, nullable=False,
+                                  server_default='0' if table == 'seller_stats' else None)
+            batch_op.drop_column(old)
+
+    # Descuento como porcentaje entero
+    for table in ('product', 'sale'):
+        op.execute(f'UPDATE "{table}" SET discount = ROUND(COALESCE(discount, 0))')
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('discount', existing_type=sa.Float(), type_=sa.Integer(), nullable=False,
+                                  server_default='0', postgresql_using='ROUND(discount)::integer')
+
+    with op.batch_alter_table('product', schema=None, recreate=_recreate()) as batch_op:
+        batch_op.add_column(sa.Column('effective_price_cents', sa.Integer(),
+                                      sa.Computed(EFFECTIVE_PRICE, persisted=True), nullable=True))
+    op.create_index('ix_product_effective_price', 'product', ['effective_price_cents'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_product_effective_price', table_name='product')
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('effective_price_cents')
+
+    for table in ('product', 'sale'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('discount', existing_type=sa.Integer(), type_=sa.Float(), nullable=True,
+                                  server_default=None)
+
+    for table, old, new, type_ in MONEY_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(old, sa.Float(), nullable=True))
+        op.execute(f'UPDATE "{table}" SET {old} = {new} / 100.0')
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(old, existing_type=sa.Float(), nullable=False,
+                                  server_default='0' if table == 'seller_stats' else None)
+            batch_op.drop_column(new)
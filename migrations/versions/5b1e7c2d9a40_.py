@@ -0,0 +1,26 @@
+"""add product status
+
+Revision ID: 5b1e7c2d9a40
+Revises: 2f9a46d54169
+Create Date: 2026-10-19 17:45:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7c2d9a40'
+down_revision = '2f9a46d54169'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=20), server_default='active', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('status')
@@ -0,0 +1,55 @@
+"""partial catalog indexes over active products; category counters count active products only
+
+Revision ID: 5b1e7c3f8d20
+Revises: 2f8b6d4a9c13
+Create Date: 2026-10-20 00:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7c3f8d20'
+down_revision = '2f8b6d4a9c13'
+branch_labels = None
+depends_on = None
+
+ACTIVE = "status = 'active'"
+# Índices del catálogo que pasan a ser parciales: (nombre, columnas)
+CATALOG_INDEXES = (
+    ('ix_product_gender_created_at', ['gender_id', 'created_at']),
+    ('ix_product_category_created_at', ['category_id', 'created_at']),
+    ('ix_product_subcategory_id', ['subcategory_id']),
+    ('ix_product_brand_id', ['brand_id']),
+    ('ix_product_color_id', ['color_id']),
+    ('ix_product_effective_price', ['effective_price_cents']),
+)
+
+
+def _recount_categories(condition):
+    op.execute(
+        "UPDATE category SET product_count = (SELECT count(*) FROM product "
+        "WHERE (product.category_id = category.id OR product.subcategory_id = category.id)"
+        f"{' AND ' + condition if condition else ''})"
+    )
+
+
+def upgrade():
+    for name, columns in CATALOG_INDEXES:
+        op.drop_index(name, table_name='product')
+        op.create_index(name, 'product', columns, unique=False,
+                        postgresql_where=sa.text(ACTIVE), sqlite_where=sa.text(ACTIVE))
+    op.create_index('ix_product_active_created_at', 'product', ['created_at'], unique=False,
+                    postgresql_where=sa.text(ACTIVE), sqlite_where=sa.text(ACTIVE))
+
+    _recount_categories(ACTIVE)
+
+
+def downgrade():
+    _recount_categories(None)
+
+    op.drop_index('ix_product_active_created_at', table_name='product')
+    for name, columns in CATALOG_INDEXES:
+        op.drop_index(name, table_name='product')
+        op.create_index(name, 'product', columns, unique=False)
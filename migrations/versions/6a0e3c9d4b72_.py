@@ -0,0 +1,180 @@
+"""category taxonomy table with integer foreign keys on product
+
+Revision ID: 6a0e3c9d4b72
+Revises: 3d7f1b6e8a25
+Create Date: 2026-10-19 22:10:00.000000
+
+"""
+import re
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a0e3c9d4b72'
+down_revision = '3d7f1b6e8a25'
+branch_labels = None
+depends_on = None
+
+# Copia del árbol inicial de api/taxonomy.py (la migración no debe depender del código actual)
+GENDERS = (("mujer", "Mujer"), ("hombre", "Hombre"), ("unisex", "Unisex"))
+DEFAULT_CATEGORIES = {
+    "mujer": (("vestidos", "Vestidos"), ("blusas", "Blusas"), ("pantalones", "Pantalones"),
+              ("faldas", "Faldas"), ("abrigos", "Abrigos"), ("zapatos", "Zapatos"),
+              ("deportivo", "Ropa Deportiva")),
+    "hombre": (("camisetas", "Camisetas"), ("camisas", "Camisas"), ("pantalones", "Pantalones"),
+               ("abrigos", "Abrigos"), ("zapatos", "Zapatos"), ("deportivo", "Ropa Deportiva")),
+    "unisex": (("accesorios", "Accesorios"), ("bolsos", "Bolsos"), ("gorras", "Gorras")),
+}
+
+category = sa.table('category',
+    sa.column('id', sa.Integer), sa.column('parent_id', sa.Integer), sa.column('depth', sa.Integer),
+    sa.column('slug', sa.String), sa.column('name', sa.String), sa.column('position', sa.Integer),
+)
+
+
+def _slugify(value):
+    value = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")
+
+
+def _insert(conn, parent_id, depth, slug, name, position=0):
+    return conn.execute(category.insert().values(
+        parent_id=parent_id, depth=depth, slug=slug, name=name, position=position
+    ).returning(category.c.id)).scalar()
+
+
+def _is_sqlite():
+    return op.get_context().dialect.name == 'sqlite'
+
+
+# En SQLite batch_alter_table recrea la tabla copiando todas las columnas y no puede
+# escribir en la columna generada: se quita antes y se vuelve a crear al final
+def _drop_effective_price():
+    op.drop_index('ix_product_effective_price', table_name='product')
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('effective_price_cents')
+
+
+def _add_effective_price():
+    with op.batch_alter_table('product', schema=None, recreate='always') as batch_op:
+        batch_op.add_column(sa.Column('effective_price_cents', sa.Integer(),
+                                      sa.Computed('price_cents - (price_cents * discount + 50) / 100',
+                                                  persisted=True), nullable=True))
+    op.create_index('ix_product_effective_price', 'product', ['effective_price_cents'], unique=False)
+
+
+def upgrade():
+    op.create_table('category',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('parent_id', sa.Integer(), nullable=True),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.Column('slug', sa.String(length=120), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('position', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('product_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['parent_id'], ['category.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('slug')
+    )
+    with op.batch_alter_table('category', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_category_parent_id'), ['parent_id'], unique=False)
+
+    conn = op.get_bind()
+    nodes = {}
+    for position, (gender, gender_name) in enumerate(GENDERS):
+        nodes[gender] = _insert(conn, None, 0, gender, gender_name, position)
+        for child_position, (slug, name) in enumerate(DEFAULT_CATEGORIES[gender]):
+            nodes[f"{gender}_{slug}"] = _insert(conn, nodes[gender], 1, f"{gender}_{slug}", name, child_position)
+
+    # Categorías libres que ya existan en product: bajo su género si el prefijo lo es, si no en unisex
+    mapping = {}
+    for slug, subcategory in conn.execute(sa.text("SELECT DISTINCT category, subcategory FROM product")):
+        slug = slug.lower()
+        if slug not in nodes:
+            gender = slug.split("_", 1)[0] if "_" in slug and slug.split("_", 1)[0] in dict(GENDERS) else "unisex"
+            nodes[slug] = _insert(conn, nodes[gender], 1, slug, slug.split("_", 1)[-1].capitalize())
+        subcategory_id = None
+        name = " ".join((subcategory or "").split())[:100]
+        if _slugify(name):
+            sub_slug = f"{slug}_{_slugify(name)}"[:120]
+            if sub_slug not in nodes:
+                nodes[sub_slug] = _insert(conn, nodes[slug], 2, sub_slug, name)
+            subcategory_id = nodes[sub_slug]
+        mapping[slug, subcategory] = subcategory_id
+
+    if _is_sqlite():
+        _drop_effective_price()
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('gender_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('category_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('subcategory_id', sa.Integer(), nullable=True))
+
+    op.execute("""
+        UPDATE product SET
+            category_id = (SELECT id FROM category WHERE category.slug = LOWER(product.category))
+    """)
+    op.execute("""
+        UPDATE product SET
+            gender_id = (SELECT parent_id FROM category WHERE category.id = product.category_id)
+    """)
+    for (slug, subcategory), subcategory_id in mapping.items():
+        if subcategory_id is not None:
+            conn.execute(sa.text(
+                "UPDATE product SET subcategory_id = :id WHERE LOWER(category) = :slug AND subcategory = :subcategory"
+            ), {"id": subcategory_id, "slug": slug, "subcategory": subcategory})
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.alter_column('gender_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('category_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('fk_product_gender_id_category', 'category', ['gender_id'], ['id'])
+        batch_op.create_foreign_key('fk_product_category_id_category', 'category', ['category_id'], ['id'])
+        batch_op.create_foreign_key('fk_product_subcategory_id_category', 'category', ['subcategory_id'], ['id'])
+        batch_op.create_index('ix_product_gender_created_at', ['gender_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_product_category_created_at', ['category_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_product_subcategory_id', ['subcategory_id'], unique=False)
+        batch_op.drop_column('category')
+        batch_op.drop_column('subcategory')
+    if _is_sqlite():
+        _add_effective_price()
+
+    # Contadores por nodo (los géneros se suman al leer)
+    op.execute("""
+        UPDATE category SET product_count =
+            (SELECT COUNT(*) FROM product WHERE product.category_id = category.id)
+          + (SELECT COUNT(*) FROM product WHERE product.subcategory_id = category.id)
+    """)
+
+
+def downgrade():
+    if _is_sqlite():
+        _drop_effective_price()
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('subcategory', sa.String(length=50), nullable=True))
+
+    op.execute("""
+        UPDATE product SET
+            category = (SELECT slug FROM category WHERE category.id = product.category_id),
+            subcategory = (SELECT name FROM category WHERE category.id = product.subcategory_id)
+    """)
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.alter_column('category', existing_type=sa.String(length=50), nullable=False)
+        batch_op.drop_index('ix_product_subcategory_id')
+        batch_op.drop_index('ix_product_category_created_at')
+        batch_op.drop_index('ix_product_gender_created_at')
+        batch_op.drop_constraint('fk_product_subcategory_id_category', type_='foreignkey')
+        batch_op.drop_constraint('fk_product_category_id_category', type_='foreignkey')
+        batch_op.drop_constraint('fk_product_gender_id_category', type_='foreignkey')
+        batch_op.drop_column('subcategory_id')
+        batch_op.drop_column('category_id')
+        batch_op.drop_column('gender_id')
+    if _is_sqlite():
+        _add_effective_price()
+
+    with op.batch_alter_table('category', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_category_parent_id'))
+
+    op.drop_table('category')
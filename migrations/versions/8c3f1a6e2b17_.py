@@ -0,0 +1,35 @@
+"""unique pending offer per product and buyer
+
+Revision ID: 8c3f1a6e2b17
+Revises: 5b1e7c2d9a40
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c3f1a6e2b17'
+down_revision = '5b1e7c2d9a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Si ya hay duplicados pendientes, nos quedamos con la oferta más reciente
+    op.execute(
+        "UPDATE offer SET status = 'rejected' "
+        "WHERE status = 'pending' AND id NOT IN ("
+        "SELECT max_id FROM (SELECT MAX(id) AS max_id FROM offer "
+        "WHERE status = 'pending' GROUP BY product_id, buyer_id) AS latest)"
+    )
+    op.create_index(
+        'uq_offer_pending_product_buyer', 'offer', ['product_id', 'buyer_id'], unique=True,
+        postgresql_where=sa.text("status = 'pending'"),
+        sqlite_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade():
+    op.drop_index('uq_offer_pending_product_buyer', table_name='offer')
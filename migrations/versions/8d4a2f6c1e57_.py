@@ -0,0 +1,44 @@
+"""product view/impression counters and the precomputed trending ranking
+
+Revision ID: 8d4a2f6c1e57
+Revises: 5b1e7c3f8d20
+Create Date: 2026-10-20 00:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4a2f6c1e57'
+down_revision = '5b1e7c3f8d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'product_activity',
+        sa.Column('product_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('views', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('impressions', sa.Integer(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('product_id', 'day')
+    )
+    op.create_index('ix_product_activity_day', 'product_activity', ['day'], unique=False)
+
+    op.create_table(
+        'trending_product',
+        sa.Column('product_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('product_id'),
+        sa.UniqueConstraint('rank')
+    )
+
+
+def downgrade():
+    op.drop_table('trending_product')
+    op.drop_index('ix_product_activity_day', table_name='product_activity')
+    op.drop_table('product_activity')
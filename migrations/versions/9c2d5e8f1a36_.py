@@ -0,0 +1,153 @@
+"""canonical brand and color dictionaries with integer foreign keys on product
+
+Revision ID: 9c2d5e8f1a36
+Revises: 6a0e3c9d4b72
+Create Date: 2026-10-19 23:05:00.000000
+
+"""
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2d5e8f1a36'
+down_revision = '6a0e3c9d4b72'
+branch_labels = None
+depends_on = None
+
+# (columna de product, tabla del diccionario, longitud)
+DICTIONARIES = (('brand', 'brand', 100), ('color', 'color', 50))
+
+
+def _normalize(value):
+    # Igual que api/dictionaries.normalize
+    value = unicodedata.normalize("NFKD", value or "").encode("ascii", "ignore").decode("ascii").lower()
+    value = re.sub(r"[^a-z0-9& ]+", "", value.replace("-", " "))
+    return " ".join(value.split())
+
+
+def _is_sqlite():
+    return op.get_context().dialect.name == 'sqlite'
+
+
+# En SQLite batch_alter_table recrea la tabla copiando todas las columnas y no puede
+# escribir en la columna generada: se quita antes y se vuelve a crear al final
+def _drop_effective_price():
+    op.drop_index('ix_product_effective_price', table_name='product')
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('effective_price_cents')
+
+
+def _add_effective_price():
+    with op.batch_alter_table('product', schema=None, recreate='always') as batch_op:
+        batch_op.add_column(sa.Column('effective_price_cents', sa.Integer(),
+                                      sa.Computed('price_cents - (price_cents * discount + 50) / 100',
+                                                  persisted=True), nullable=True))
+    op.create_index('ix_product_effective_price', 'product', ['effective_price_cents'], unique=False)
+
+
+def _create_trigram_indexes(conn):
+    # pg_trgm para la coincidencia aproximada; sin permisos para la extensión se usa la de Python
+    if conn.scalar(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")) is None:
+        return
+    try:
+        with conn.begin_nested():
+            conn.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except sa.exc.DBAPIError:
+        return
+    for table in ('brand', 'color', 'dictionary_alias'):
+        op.execute(f'CREATE INDEX ix_{table}_key_trgm ON "{table}" USING gin (key gin_trgm_ops)')
+
+
+def upgrade():
+    op.create_table('brand',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=100), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    op.create_table('color',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=50), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    op.create_table('dictionary_alias',
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.String(length=100), nullable=False),
+    sa.Column('value_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'key')
+    )
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('brand_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('color_id', sa.Integer(), nullable=True))
+
+    # Un valor canónico por clave normalizada; el nombre es la grafía más usada
+    conn = op.get_bind()
+    for column, table_name, length in DICTIONARIES:
+        spellings = defaultdict(Counter)
+        for value, count in conn.execute(sa.text(
+                f"SELECT {column}, COUNT(*) FROM product WHERE {column} IS NOT NULL GROUP BY {column}")):
+            key = _normalize(value)[:length]
+            if key:
+                spellings[key][value] += count
+        table = sa.table(table_name, sa.column('id', sa.Integer), sa.column('key', sa.String),
+                         sa.column('name', sa.String))
+        for key, counter in spellings.items():
+            name = " ".join(counter.most_common(1)[0][0].split())[:length]
+            value_id = conn.execute(table.insert().values(key=key, name=name).returning(table.c.id)).scalar()
+            for value in counter:
+                conn.execute(sa.text(f"UPDATE product SET {column}_id = :id WHERE {column} = :value"),
+                             {"id": value_id, "value": value})
+
+    if _is_sqlite():
+        _drop_effective_price()
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_foreign_key('fk_product_brand_id_brand', 'brand', ['brand_id'], ['id'])
+        batch_op.create_foreign_key('fk_product_color_id_color', 'color', ['color_id'], ['id'])
+        batch_op.create_index('ix_product_brand_id', ['brand_id'], unique=False)
+        batch_op.create_index('ix_product_color_id', ['color_id'], unique=False)
+        batch_op.drop_column('brand')
+        batch_op.drop_column('color')
+    if _is_sqlite():
+        _add_effective_price()
+
+    if op.get_context().dialect.name == 'postgresql':
+        _create_trigram_indexes(conn)
+
+
+def downgrade():
+    for table in ('brand', 'color', 'dictionary_alias'):
+        op.execute(f'DROP INDEX IF EXISTS ix_{table}_key_trgm')
+
+    if _is_sqlite():
+        _drop_effective_price()
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('brand', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('color', sa.String(length=50), nullable=True))
+
+    op.execute("""
+        UPDATE product SET
+            brand = (SELECT name FROM brand WHERE brand.id = product.brand_id),
+            color = (SELECT name FROM color WHERE color.id = product.color_id)
+    """)
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_color_id')
+        batch_op.drop_index('ix_product_brand_id')
+        batch_op.drop_constraint('fk_product_color_id_color', type_='foreignkey')
+        batch_op.drop_constraint('fk_product_brand_id_brand', type_='foreignkey')
+        batch_op.drop_column('color_id')
+        batch_op.drop_column('brand_id')
+    if _is_sqlite():
+        _add_effective_price()
+
+    op.drop_table('dictionary_alias')
+    op.drop_table('color')
+    op.drop_table('brand')
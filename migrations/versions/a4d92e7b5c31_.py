@@ -0,0 +1,58 @@
+"""offer expiry rules and archive
+
+Revision ID: a4d92e7b5c31
+Revises: 8c3f1a6e2b17
+Create Date: 2026-10-19 18:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d92e7b5c31'
+down_revision = '8c3f1a6e2b17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('offer_expiry_rule',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('seller_id', sa.Integer(), nullable=True),
+    sa.Column('category', sa.String(length=50), nullable=True),
+    sa.Column('ttl_hours', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['seller_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('offer_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('buyer_id', sa.Integer(), nullable=False),
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('seller_response', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('responded_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('offer_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_offer_archive_buyer_id'), ['buyer_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_offer_archive_product_id'), ['product_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_offer_archive_seller_id'), ['seller_id'], unique=False)
+
+    op.create_index('ix_offer_status_created_at', 'offer', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_offer_status_created_at', table_name='offer')
+    with op.batch_alter_table('offer_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_offer_archive_seller_id'))
+        batch_op.drop_index(batch_op.f('ix_offer_archive_product_id'))
+        batch_op.drop_index(batch_op.f('ix_offer_archive_buyer_id'))
+
+    op.drop_table('offer_archive')
+    op.drop_table('offer_expiry_rule')
@@ -0,0 +1,55 @@
+"""updated_at columns and deleted_record tombstones for delta sync
+
+Revision ID: d3b8e5f1a7c2
+Revises: a4d92e7b5c31
+Create Date: 2026-10-19 19:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3b8e5f1a7c2'
+down_revision = 'a4d92e7b5c31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('user', 'product', 'offer'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f'UPDATE "{table}" SET updated_at = created_at')
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+    op.create_index('ix_product_seller_updated_at', 'product', ['seller_id', 'updated_at'], unique=False)
+    op.create_index('ix_offer_seller_updated_at', 'offer', ['seller_id', 'updated_at'], unique=False)
+    op.create_index('ix_offer_buyer_updated_at', 'offer', ['buyer_id', 'updated_at'], unique=False)
+    op.create_index('ix_sale_seller_updated_at', 'sale', ['seller_id', 'updated_at'], unique=False)
+
+    op.create_table('deleted_record',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=30), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('seller_id', sa.Integer(), nullable=True),
+    sa.Column('buyer_id', sa.Integer(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_deleted_record_entity_deleted_at', 'deleted_record', ['entity', 'deleted_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_deleted_record_entity_deleted_at', table_name='deleted_record')
+    op.drop_table('deleted_record')
+
+    op.drop_index('ix_sale_seller_updated_at', table_name='sale')
+    op.drop_index('ix_offer_buyer_updated_at', table_name='offer')
+    op.drop_index('ix_offer_seller_updated_at', table_name='offer')
+    op.drop_index('ix_product_seller_updated_at', table_name='product')
+
+    for table in ('offer', 'product', 'user'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,64 @@
+"""seller_stats table and product offer counters
+
+Revision ID: e7a2c4f9b316
+Revises: d3b8e5f1a7c2
+Create Date: 2026-10-19 19:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a2c4f9b316'
+down_revision = 'd3b8e5f1a7c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('seller_stats',
+    sa.Column('seller_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('product_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('pending_offers', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('accepted_offers', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rejected_offers', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('sales_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('total_earnings', sa.Float(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['seller_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('seller_id')
+    )
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('offer_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('pending_offer_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Rellenar los contadores con los datos existentes
+    op.execute("""
+        UPDATE product SET
+            offer_count = (SELECT COUNT(*) FROM offer WHERE offer.product_id = product.id),
+            pending_offer_count = (SELECT COUNT(*) FROM offer
+                                   WHERE offer.product_id = product.id AND offer.status = 'pending')
+    """)
+    op.execute("""
+        INSERT INTO seller_stats (seller_id, product_count, pending_offers, accepted_offers,
+                                  rejected_offers, sales_count, total_earnings, updated_at)
+        SELECT u.id,
+               (SELECT COUNT(*) FROM product p WHERE p.seller_id = u.id),
+               (SELECT COUNT(*) FROM offer o WHERE o.seller_id = u.id AND o.status = 'pending'),
+               (SELECT COUNT(*) FROM offer o WHERE o.seller_id = u.id AND o.status = 'accepted'),
+               (SELECT COUNT(*) FROM offer o WHERE o.seller_id = u.id AND o.status = 'rejected'),
+               (SELECT COUNT(*) FROM sale s WHERE s.seller_id = u.id),
+               (SELECT COALESCE(SUM(s.price), 0) FROM sale s WHERE s.seller_id = u.id),
+               CURRENT_TIMESTAMP
+        FROM "user" u
+        WHERE u.role = 'seller'
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('pending_offer_count')
+        batch_op.drop_column('offer_count')
+
+    op.drop_table('seller_stats')
@@ -0,0 +1,24 @@
+"""product_image (product_id, position) index for catalog cards
+
+Revision ID: f1c6d8a3e594
+Revises: e7a2c4f9b316
+Create Date: 2026-10-19 20:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6d8a3e594'
+down_revision = 'e7a2c4f9b316'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_product_image_product_position', 'product_image', ['product_id', 'position'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_product_image_product_position', table_name='product_image')
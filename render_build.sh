@@ -7,4 +7,7 @@ npm run build
 
 pipenv install
 
+# Variantes .br/.gz de los estáticos para servirlas sin comprimir en cada petición
+pipenv run precompress-static
+
 pipenv run upgrade
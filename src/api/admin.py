@@ -1,7 +1,7 @@
 
 import os
 from flask_admin import Admin
-from .models import db, User, Product, ProductImage
+from .models import db, User, Product, ProductImage, OfferExpiryRule
 from flask_admin.contrib.sqla import ModelView
 
 
@@ -12,6 +12,7 @@ def setup_admin(app):
 
     # Add your models here, for example this is how we add a the User model to the admin
     admin.add_view(ModelView(User, db.session))
+    admin.add_view(ModelView(OfferExpiryRule, db.session))
 
     # You can duplicate that line to add mew models
     # admin.add_view(ModelView(YourModelName, db.session))
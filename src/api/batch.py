@@ -0,0 +1,97 @@
+# src/api/batch.py
+
+"""
+Peticiones agrupadas (POST /api/batch): varias llamadas a la API en un solo viaje.
+
+    {"requests": [{"id": "products", "method": "GET", "path": "/api/seller/products"},
+                  {"id": "profile", "method": "GET", "path": "/api/seller/profile"}]}
+    -> {"responses": [{"id": "products", "status": 200, "body": {...}}, ...]}
+
+Cada subpetición se despacha dentro del proceso contra las rutas del blueprint,
+con la cabecera Authorization y la IP de la petición original (el JWT y los
+límites por usuario/IP se aplican igual que por HTTP). Los hooks de la petición
+(admisión, métricas, compresión) cuentan una vez, para el lote, y las queries de
+las subpeticiones se suman a las suyas.
+
+Si todas son GET (independientes) se ejecutan en paralelo, hasta BATCH_WORKERS a
+la vez; si hay alguna escritura, en orden. Cada subpetición tiene su propio
+contexto y su sesión de base de datos: una sesión de SQLAlchemy no se comparte
+entre hilos.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import g, request
+from werkzeug.test import EnvironBuilder
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", 10))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 4))
+
+METHODS = ("GET", "POST", "PUT", "DELETE")
+# Respuestas en streaming y el propio lote no se pueden agrupar
+EXCLUDED_PATHS = ("/api/batch", "/api/events/stream")
+
+
+def validate(subrequests):
+    """Lista de subpeticiones normalizadas; ValueError si alguna no es válida."""
+    if not isinstance(subrequests, list) or not subrequests:
+        raise ValueError("requests must be a non-empty list")
+    if len(subrequests) > BATCH_MAX_REQUESTS:
+        raise ValueError(f"At most {BATCH_MAX_REQUESTS} requests per batch")
+    normalized = []
+    for position, item in enumerate(subrequests):
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str):
+            raise ValueError(f"requests[{position}] must have a path")
+        method = str(item.get("method", "GET")).upper()
+        path = item["path"]
+        if method not in METHODS:
+            raise ValueError(f"requests[{position}]: unsupported method {method}")
+        if not path.startswith("/api/") or path.split("?", 1)[0].rstrip("/") in EXCLUDED_PATHS:
+            raise ValueError(f"requests[{position}]: path not allowed: {path}")
+        normalized.append({"id": item.get("id", position), "method": method, "path": path,
+                           "body": item.get("body")})
+    return normalized
+
+
+def _dispatch(app, subrequest, headers, remote_addr, query_stats):
+    path, _, query_string = subrequest["path"].partition("?")
+    builder = EnvironBuilder(
+        path=path, method=subrequest["method"], query_string=query_string, headers=headers,
+        json=subrequest["body"] if subrequest["body"] is not None else None,
+        environ_base={"REMOTE_ADDR": remote_addr},
+    )
+    # Contexto propio (g, sesión): sus teardown no tocan los de la petición del lote
+    with app.app_context(), app.request_context(builder.get_environ()):
+        # Sus queries cuentan en las métricas y el Server-Timing del lote (api/metrics.py)
+        if query_stats is not None:
+            g.query_stats = query_stats
+        # Solo rutas de la API: /api/<ruta inexistente> caería en el servidor de estáticos
+        if request.routing_exception is None and request.blueprint != "api":
+            return {"id": subrequest["id"], "status": 404, "body": {"error": "Not found"}}
+        try:
+            try:
+                rv = app.dispatch_request()
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = app.make_response(rv)
+        except Exception:
+            app.logger.exception("Batch subrequest %s %s failed", subrequest["method"], path)
+            return {"id": subrequest["id"], "status": 500, "body": {"error": "Internal server error"}}
+        if response.is_streamed or response.direct_passthrough:
+            return {"id": subrequest["id"], "status": 400, "body": {"error": "Streaming responses cannot be batched"}}
+        body = response.get_json(silent=True) if response.is_json else response.get_data(as_text=True)
+        return {"id": subrequest["id"], "status": response.status_code, "body": body}
+
+
+def run_batch(app, subrequests):
+    """Ejecuta las subpeticiones ya validadas; las respuestas vuelven en el mismo orden."""
+    headers = {"Authorization": request.headers["Authorization"]} if "Authorization" in request.headers else {}
+    remote_addr = request.remote_addr
+    query_stats = g.get("query_stats")
+
+    def dispatch(subrequest):
+        return _dispatch(app, subrequest, headers, remote_addr, query_stats)
+
+    if len(subrequests) > 1 and all(subrequest["method"] == "GET" for subrequest in subrequests):
+        with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(subrequests))) as executor:
+            return list(executor.map(dispatch, subrequests))
+    return [dispatch(subrequest) for subrequest in subrequests]
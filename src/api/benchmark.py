@@ -0,0 +1,341 @@
+# src/api/benchmark.py
+
+"""
+Escenarios de carga para los endpoints más usados de la API.
+
+Las peticiones se ejecutan en proceso con el test client de Flask (toda la pila
+WSGI + base de datos real, sin red), así los resultados son reproducibles.
+Para comparar SQLite y Postgres basta con cambiar DATABASE_URL.
+El número de queries por petición sale de la cabecera Server-Timing (api/metrics.py).
+"""
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from flask_jwt_extended import create_access_token
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from api.models import db, User, Product, Offer
+from api.seed import seed_users
+from api.stats import offer_status_changed, product_categorized, product_created
+from api.taxonomy import ensure_default_taxonomy, resolve_category
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+SEARCH_TERMS = ["vestido", "zara", "abrigo", "vintage", "nike", "camisa", "negro", "básico"]
+FILTERS = [
+    "gender=mujer", "gender=hombre&category=hombre_camisas", "category=vestidos",
+    "size=M", "condition=very_good", "min_price=10&max_price=50", "brand=zara",
+    "color=negro&sort=price_asc", "gender=unisex&sort=price_desc",
+]
+
+
+class BenchmarkContext:
+    """Ids y tokens precargados para construir peticiones realistas."""
+
+    def __init__(self, rng, sample_size=2000):
+        self.rng = rng
+        self.product_ids = list(db.session.scalars(
+            select(Product.id).order_by(Product.id.desc()).limit(sample_size)))
+        self.products = {row.id: row.price_cents for row in db.session.execute(
+            select(Product.id, Product.price_cents).where(Product.id.in_(self.product_ids)))}
+        self.seller_tokens = [self._token(user_id) for user_id in db.session.scalars(
+            select(User.id).where(User.role == "seller").limit(200))]
+        self.buyer_tokens = [self._token(user_id) for user_id in db.session.scalars(
+            select(User.id).where(User.role == "buyer").limit(500))]
+        self.pending_offers = [(offer_id, self._token(seller_id)) for offer_id, seller_id in db.session.execute(
+            select(Offer.id, Offer.seller_id).where(Offer.status == "pending").limit(sample_size))]
+        rng.shuffle(self.pending_offers)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _token(user_id):
+        return {"Authorization": "Bearer " + create_access_token(identity=str(user_id))}
+
+    def pop_pending_offer(self):
+        with self._lock:
+            return self.pending_offers.pop() if self.pending_offers else None
+
+
+def _catalog(ctx):
+    return "GET", f"/api/products/catalog?page={ctx.rng.randint(1, 5)}", None, None
+
+
+def _catalog_filtered(ctx):
+    return "GET", f"/api/products/catalog?{ctx.rng.choice(FILTERS)}", None, None
+
+
+def _search(ctx):
+    return "GET", f"/api/products/catalog?search={ctx.rng.choice(SEARCH_TERMS)}", None, None
+
+
+def _product_detail(ctx):
+    return "GET", f"/api/products/{ctx.rng.choice(ctx.product_ids)}/details", None, None
+
+
+def _seller_dashboard(ctx):
+    path = ctx.rng.choice(["/api/seller/profile", "/api/seller/products", "/api/seller/offers", "/api/seller/sales"])
+    return "GET", path, None, ctx.rng.choice(ctx.seller_tokens)
+
+
+def _offer_create(ctx):
+    product_id = ctx.rng.choice(ctx.product_ids)
+    amount = round(ctx.products[product_id] * ctx.rng.uniform(0.7, 1.0)) / 100
+    return ("POST", f"/api/products/{product_id}/offers",
+            {"amount": amount, "message": "benchmark"}, ctx.rng.choice(ctx.buyer_tokens))
+
+
+def _offer_accept(ctx):
+    pending = ctx.pop_pending_offer()
+    if pending is None:
+        return None
+    offer_id, headers = pending
+    return "PUT", f"/api/offers/{offer_id}/accept", {"message": "benchmark"}, headers
+
+
+SCENARIOS = {
+    "catalog": _catalog,
+    "catalog_filtered": _catalog_filtered,
+    "search": _search,
+    "product_detail": _product_detail,
+    "seller_dashboard": _seller_dashboard,
+    "offer_create": _offer_create,
+    "offer_accept": _offer_accept,
+}
+
+
+def _percentile(values, pct):
+    if len(values) < 2:
+        return values[0] if values else 0
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+def _run_scenario(app, build, ctx, count, concurrency):
+    latencies, queries, sizes, statuses = [], [], [], Counter()
+    lock = threading.Lock()
+    remaining = [count]
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+                spec = build(ctx)
+            if spec is None:
+                return
+            method, url, body, headers = spec
+            start = time.perf_counter()
+            response = client.open(url, method=method, json=body, headers=headers)
+            elapsed = time.perf_counter() - start
+            match = QUERIES_RE.search(response.headers.get("Server-Timing", ""))
+            with lock:
+                latencies.append(elapsed * 1000)
+                sizes.append(len(response.get_data()))
+                statuses[response.status_code] += 1
+                if match:
+                    queries.append(int(match.group(1)))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50), 3),
+            "p95": round(_percentile(latencies, 95), 3),
+            "p99": round(_percentile(latencies, 99), 3),
+            "mean": round(statistics.fmean(latencies), 3) if latencies else 0,
+        },
+        "queries_per_request": round(statistics.fmean(queries), 2) if queries else None,
+        "response_bytes": round(statistics.fmean(sizes)) if sizes else 0,
+        "status_codes": {str(code): n for code, n in sorted(statuses.items())},
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(app, requests=200, scenarios=None, concurrency=1, warmup=10, seed=1):
+    rng = random.Random(seed)
+    with app.app_context():
+        ctx = BenchmarkContext(rng)
+        if not ctx.product_ids or not ctx.seller_tokens or not ctx.buyer_tokens:
+            raise RuntimeError("No hay datos: ejecuta antes `flask seed-benchmark-data`")
+
+        results = {}
+        for name in scenarios or SCENARIOS:
+            build = SCENARIOS[name]
+            if warmup and name != "offer_accept":
+                _run_scenario(app, build, ctx, warmup, 1)
+            results[name] = _run_scenario(app, build, ctx, requests, concurrency)
+
+        return {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "database": db.engine.dialect.name,
+            "python": platform.python_version(),
+            "config": {"requests": requests, "concurrency": concurrency, "warmup": warmup, "seed": seed},
+            "scenarios": results,
+        }
+
+
+def save_report(report, directory):
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(directory, f"{stamp}_{report['commit'] or 'nogit'}_{report['database']}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def format_report(report, baseline=None):
+    lines = [f"{'scenario':<18} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'q/req':>7} {'bytes':>9}"]
+    for name, result in report["scenarios"].items():
+        latency = result["latency_ms"]
+        line = (f"{name:<18} {result['throughput_rps']:>9.1f} {latency['p50']:>9.2f} {latency['p95']:>9.2f} "
+                f"{latency['p99']:>9.2f} {result['queries_per_request'] or 0:>7.1f} {result['response_bytes']:>9}")
+        previous = (baseline or {}).get("scenarios", {}).get(name)
+        if previous and previous["latency_ms"]["p95"]:
+            change = (latency["p95"] / previous["latency_ms"]["p95"] - 1) * 100
+            line += f"   p95 {change:+.1f}% vs {baseline.get('commit')}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def is_test_database(url):
+    """SQLite (la base local por defecto) o una base cuyo nombre contiene "test"."""
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" or "test" in (url.database or "").lower()
+
+
+def stress_offer_acceptance(app, offers=20, rounds=5):
+    """
+    Lanza a la vez, desde `offers` hilos, la aceptación de todas las ofertas pendientes
+    de un mismo producto. Tras cada ronda debe haber exactamente una oferta aceptada,
+    ninguna pendiente y el producto reservado.
+
+    Crea usuarios y productos de prueba que no se borran: solo se ejecuta contra una
+    base de pruebas (is_test_database), nunca contra la de producción.
+    """
+    if not is_test_database(app.config["SQLALCHEMY_DATABASE_URI"]):
+        raise ValueError("stress_offer_acceptance writes stress users and products: "
+                         "point DATABASE_URL to a throwaway SQLite or *test* database")
+    with app.app_context():
+        seller_id = seed_users(1, "seller", seed=int(time.time()))[0]
+        buyer_ids = seed_users(offers, "buyer", seed=int(time.time()))
+        headers = BenchmarkContext._token(seller_id)
+        ensure_default_taxonomy()
+        gender_id, category_id, _ = resolve_category("unisex_bolsos")
+
+    failures, outcomes = [], Counter()
+    for _ in range(rounds):
+        with app.app_context():
+            product = Product(title="Stress", description="Stress", gender_id=gender_id, category_id=category_id,
+                              size="M", condition="good", price_cents=10000, seller_id=seller_id)
+            db.session.add(product)
+            db.session.flush()
+            offer_ids = []
+            for buyer_id in buyer_ids:
+                offer = Offer(product_id=product.id, buyer_id=buyer_id, seller_id=seller_id,
+                              amount_cents=8000, status="pending")
+                db.session.add(offer)
+                db.session.flush()
+                offer_ids.append(offer.id)
+            product_id = product.id
+            product_created(seller_id)
+            product_categorized(new_ids=(category_id,))
+            offer_status_changed(seller_id, product_id, None, "pending", len(offer_ids))
+            db.session.commit()
+
+        barrier = threading.Barrier(len(offer_ids))
+
+        def accept(offer_id):
+            client = app.test_client()
+            barrier.wait()
+            response = client.put(f"/api/offers/{offer_id}/accept", json={}, headers=headers)
+            with lock:
+                outcomes[response.status_code] += 1
+
+        lock = threading.Lock()
+        threads = [threading.Thread(target=accept, args=(offer_id,)) for offer_id in offer_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with app.app_context():
+            statuses = Counter(db.session.scalars(select(Offer.status).where(Offer.product_id == product_id)))
+            product_status = db.session.scalar(select(Product.status).where(Product.id == product_id))
+        if statuses["accepted"] != 1 or statuses["pending"] or product_status != "reserved":
+            failures.append({"product_id": product_id, "offers": dict(statuses), "product": product_status})
+
+    return {"rounds": rounds, "threads": offers, "status_codes": dict(outcomes), "failures": failures}
+
+
+def compare_catalog_index(app, requests=30):
+    """
+    Mismas URLs del catálogo resueltas por SQL y por el índice en memoria
+    (api/catalog_index.py): latencias, total de resultados y si coincide la página.
+    """
+    from api.catalog_index import CatalogIndex, get_catalog_index, set_catalog_index
+
+    with app.app_context():
+        start = time.perf_counter()
+        index = CatalogIndex().build()
+        build_seconds = time.perf_counter() - start
+
+    urls = ["/api/products/catalog?view=card"] + [f"/api/products/catalog?view=card&{f}" for f in FILTERS]
+    client = app.test_client()
+    previous = get_catalog_index()
+    results = []
+    try:
+        for url in urls:
+            result = {"url": url}
+            for mode, current in (("sql", None), ("index", index)):
+                set_catalog_index(current)
+                client.get(url)
+                latencies = []
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                body = response.get_json()
+                result[mode] = {
+                    "p50": round(_percentile(latencies, 50), 3),
+                    "p95": round(_percentile(latencies, 95), 3),
+                    "total": body["pagination"]["total"],
+                    "ids": [product["id"] for product in body["products"]],
+                }
+            result["same_total"] = result["sql"]["total"] == result["index"]["total"]
+            # Con empates de precio o fecha el orden de SQL no está definido: es informativo
+            result["same_page"] = result["sql"]["ids"] == result["index"]["ids"]
+            results.append(result)
+    finally:
+        set_catalog_index(previous)
+
+    return {
+        "products": len(index),
+        "build_seconds": round(build_seconds, 3),
+        "memory_mb": round(index.nbytes / 1e6, 1),
+        "results": results,
+    }
@@ -0,0 +1,292 @@
+# src/api/catalog_index.py
+
+"""
+Índice en memoria del catálogo (opcional, CATALOG_INDEX=1).
+
+Usa numpy, que está en el Pipfile; si aun así falta, la app arranca y el
+catálogo sigue por SQL (con un aviso en el log).
+
+Guarda los productos como arrays columnares: id, precio, fecha, los ids de
+taxonomía, marca y color (gender_id, category_id, brand_id...) y, para el resto
+de columnas de texto (size, condition, status), códigos enteros de un diccionario
+de valores distintos. Los filtros llegan ya resueltos a ids (api/taxonomy.py,
+api/dictionaries.py) y se aplican con np.isin; precio y orden son operaciones
+vectorizadas. La base de datos solo lee los ids de la página.
+
+Solo contiene los productos activos, los del catálogo: uno que se reserva, vende
+o archiva sale del índice como si se hubiera borrado.
+
+Frescura: cada worker tiene su índice y un hilo que aplica los cambios
+incrementales (Product.updated_at y tombstones de api/sync.py) cada
+CATALOG_INDEX_REFRESH_SECONDS, o en cuanto este proceso escribe un producto
+(hooks de sesión). Mientras se construye, o si un filtro no es representable
+(búsqueda de texto libre, ?sort=trending), el catálogo usa la consulta SQL de siempre.
+"""
+import logging
+import os
+import threading
+from datetime import datetime
+from sqlalchemy import select
+from api.models import db, Product, DeletedRecord, PRODUCT_IS_ACTIVE
+from api.dictionaries import facet_names
+from api.sync import SYNC_OVERLAP, watch_product_writes
+from api.utils import serves_requests
+
+# numpy se importa solo con el índice activo (load_numpy): sin él, el catálogo usa SQL
+np = None
+
+CATALOG_INDEX = os.getenv("CATALOG_INDEX", "0") == "1"
+CATALOG_INDEX_REFRESH_SECONDS = float(os.getenv("CATALOG_INDEX_REFRESH_SECONDS", 5))
+
+DICTIONARY_COLUMNS = ("size", "condition", "status")
+ID_COLUMNS = ("gender_id", "category_id", "subcategory_id", "brand_id", "color_id")
+ROW_COLUMNS = (Product.id, Product.effective_price_cents, Product.created_at) + tuple(
+    getattr(Product, column) for column in ID_COLUMNS + DICTIONARY_COLUMNS)
+# Más de esta fracción de filas borradas y se compactan los arrays
+COMPACT_RATIO = 0.2
+
+logger = logging.getLogger(__name__)
+
+
+class _Dictionary:
+    """Valores distintos de una columna -> código entero. Solo crece; el código 0 es NULL."""
+
+    def __init__(self):
+        self.values = [None]
+        self.codes = {None: 0}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def matching(self, predicate):
+        return [code for code, value in enumerate(self.values) if value is not None and predicate(value)]
+
+
+class CatalogIndex:
+    def __init__(self):
+        self.dictionaries = {column: _Dictionary() for column in DICTIONARY_COLUMNS}
+        self.synced_at = None
+        self._data = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._data is not None
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self._data.values()) if self._data else 0
+
+    def __len__(self):
+        return int(self._data["alive"].sum()) if self._data else 0
+
+    # --- construcción y refresco ---
+
+    def _encode(self, rows):
+        columns = {"id": [], "price": [], "created_at": []}
+        columns.update({column: [] for column in ID_COLUMNS + DICTIONARY_COLUMNS})
+        for row in rows:
+            columns["id"].append(row.id)
+            columns["price"].append(row.effective_price_cents)
+            columns["created_at"].append(row.created_at)
+            for column in ID_COLUMNS:
+                columns[column].append(getattr(row, column) or 0)
+            for column in DICTIONARY_COLUMNS:
+                columns[column].append(self.dictionaries[column].encode(getattr(row, column)))
+        data = {
+            "id": np.array(columns["id"], dtype=np.int64),
+            "price": np.array(columns["price"], dtype=np.int64),  # céntimos, con descuento
+            "created_at": np.array(columns["created_at"], dtype="datetime64[us]"),
+        }
+        for column in ID_COLUMNS + DICTIONARY_COLUMNS:
+            data[column] = np.array(columns[column], dtype=np.int32)
+        data["alive"] = np.ones(len(columns["id"]), dtype=bool)
+        return data
+
+    @staticmethod
+    def _with_orderings(data):
+        # Permutaciones precalculadas: filtrar una ordenación ya hecha es O(n), ordenar el filtrado no
+        data["by_newest"] = np.lexsort((-data["id"], -data["created_at"].astype(np.int64)))
+        data["by_price"] = np.lexsort((data["id"], data["price"]))
+        return data
+
+    def build(self):
+        started = datetime.utcnow()
+        rows = db.session.execute(
+            select(*ROW_COLUMNS).where(PRODUCT_IS_ACTIVE).order_by(Product.id).execution_options(yield_per=50000))
+        self._data = self._with_orderings(self._encode(rows))
+        self.synced_at = started
+        return self
+
+    def refresh(self):
+        """Aplica los productos creados/modificados/borrados desde el último refresco."""
+        with self._refresh_lock:
+            started = datetime.utcnow()
+            since = self.synced_at - SYNC_OVERLAP
+            changed = db.session.execute(select(*ROW_COLUMNS).where(Product.updated_at >= since)).all()
+            deleted = db.session.scalars(select(DeletedRecord.entity_id).where(
+                DeletedRecord.entity == "product", DeletedRecord.deleted_at >= since)).all()
+            self.synced_at = started
+            if not changed and not deleted:
+                return 0
+            # Los que dejaron de estar activos salen del índice
+            deleted = list(deleted) + [row.id for row in changed if row.status != "active"]
+            changed = [row for row in changed if row.status == "active"]
+
+            # Copia y sustituye: las peticiones en curso siguen con su versión
+            data = {name: array.copy() for name, array in self._data.items()
+                    if name not in ("by_newest", "by_price")}
+            if changed:
+                update = self._encode(changed)
+                positions = np.searchsorted(data["id"], update["id"])
+                found = positions < len(data["id"])
+                found[found] = data["id"][positions[found]] == update["id"][found]
+                for name, array in update.items():
+                    data[name][positions[found]] = array[found]
+                new = ~found
+                if new.any():
+                    for name in data:
+                        data[name] = np.concatenate((data[name], update[name][new]))
+                    order = np.argsort(data["id"], kind="stable")
+                    for name in data:
+                        data[name] = data[name][order]
+            if deleted:
+                ids = np.array(deleted, dtype=np.int64)
+                positions = np.searchsorted(data["id"], ids)
+                valid = positions < len(data["id"])
+                valid[valid] = data["id"][positions[valid]] == ids[valid]
+                data["alive"][positions[valid]] = False
+
+            dead = len(data["alive"]) - int(data["alive"].sum())
+            if dead > COMPACT_RATIO * len(data["alive"]):
+                keep = data["alive"]
+                data = {name: array[keep] for name, array in data.items()}
+            self._data = self._with_orderings(data)
+            return len(changed) + len(deleted)
+
+    # --- consultas ---
+
+    def search(self, gender_id=None, category_ids=None, subcategory_ids=None, min_price_cents=None,
+               max_price_cents=None, size="", condition="", brand_ids=None, color_ids=None, search="",
+               sort="newest", page=1, per_page=12):
+        """
+        Mismos filtros que get_products_catalog (taxonomía, marca y color ya resueltos
+        a ids). Devuelve (ids de la página, total) o None si la consulta no se puede
+        resolver aquí y debe ir a SQL.
+        """
+        # La búsqueda de texto libre (título, descripción) y el orden por tendencia
+        # (tabla trending_product) se quedan en SQL
+        if search or sort == "trending":
+            return None
+
+        data = self._data
+        mask = data["alive"].copy()
+
+        def restrict(column, predicate):
+            codes = self.dictionaries[column].matching(predicate)
+            np.logical_and(mask, np.isin(data[column], codes), out=mask)
+
+        if gender_id is not None:
+            np.logical_and(mask, data["gender_id"] == gender_id, out=mask)
+        if category_ids is not None:
+            np.logical_and(mask, np.isin(data["category_id"], category_ids), out=mask)
+        if subcategory_ids is not None:
+            np.logical_and(mask, np.isin(data["subcategory_id"], subcategory_ids), out=mask)
+        if min_price_cents is not None:
+            np.logical_and(mask, data["price"] >= min_price_cents, out=mask)
+        if max_price_cents is not None:
+            np.logical_and(mask, data["price"] <= max_price_cents, out=mask)
+        if size:
+            restrict("size", lambda value: value == size)
+        if condition:
+            restrict("condition", lambda value: value == condition)
+        if brand_ids is not None:
+            np.logical_and(mask, np.isin(data["brand_id"], brand_ids), out=mask)
+        if color_ids is not None:
+            np.logical_and(mask, np.isin(data["color_id"], color_ids), out=mask)
+
+        if sort == "price_asc":
+            ordering = data["by_price"]
+        elif sort == "price_desc":
+            ordering = data["by_price"][::-1]
+        else:
+            ordering = data["by_newest"]
+        selected = ordering[mask[ordering]]
+        start = (page - 1) * per_page
+        return data["id"][selected[start:start + per_page]].tolist(), int(selected.size)
+
+    def facets(self):
+        """Valores distintos de talla, marca, color y estado de conservación (available_filters)."""
+        data = self._data
+        alive = data["alive"]
+        facets = {}
+        for name, column in (("sizes", "size"), ("conditions", "condition")):
+            values = self.dictionaries[column].values
+            facets[name] = [values[code] for code in np.unique(data[column][alive]).tolist() if values[code]]
+        for name, kind in (("brands", "brand"), ("colors", "color")):
+            value_ids = np.unique(data[f"{kind}_id"][alive]).tolist()
+            facets[name] = facet_names(kind, [value_id for value_id in value_ids if value_id])
+        return facets
+
+
+_index = None
+_wakeup = threading.Event()
+
+
+def get_catalog_index():
+    """El índice si está habilitado y construido; None = usar SQL."""
+    return _index if _index is not None and _index.ready else None
+
+
+def set_catalog_index(index):
+    global _index
+    _index = index
+
+
+def load_numpy():
+    """Importa numpy la primera vez (es la importación más cara de la app); None si no está."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+    return np
+
+
+def setup_catalog_index(app):
+    if not CATALOG_INDEX:
+        return
+    if load_numpy() is None:
+        logger.warning("CATALOG_INDEX=1 but numpy is not installed: catalog stays on SQL")
+        return
+    # Solo los procesos que atienden peticiones (benchmark-catalog-index construye el suyo)
+    if not serves_requests():
+        return
+
+    watch_product_writes(_wakeup)
+
+    def run():
+        index = CatalogIndex()
+        while True:
+            with app.app_context():
+                try:
+                    if index.ready:
+                        index.refresh()
+                    else:
+                        set_catalog_index(index.build())
+                        logger.info("Catalog index ready: %d products", len(index))
+                except Exception:
+                    # Se reintenta en la siguiente vuelta; mientras tanto el catálogo usa SQL
+                    db.session.rollback()
+                    logger.exception("Catalog index update failed")
+            _wakeup.wait(CATALOG_INDEX_REFRESH_SECONDS)
+            _wakeup.clear()
+
+    threading.Thread(target=run, name="catalog-index", daemon=True).start()
@@ -1,19 +1,30 @@
 # 🎯 EXPLICACIÓN: Este archivo maneja toda la lógica de Cloudinary
 # Centraliza la configuración y las funciones de subida de imágenes
 
-import cloudinary
-import cloudinary.uploader
-from cloudinary.utils import cloudinary_url
 import os
-from flask import jsonify
 
-# 📍 Configuración de Cloudinary usando variables de entorno
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True
-)
+_configured = False
+
+
+def _uploader():
+    """
+    🎯 Importa y configura el SDK de Cloudinary en el primer uso,
+    así el arranque de la app no paga su coste de importación.
+    """
+    global _configured
+    import cloudinary
+    import cloudinary.uploader
+
+    if not _configured:
+        # 📍 Configuración de Cloudinary usando variables de entorno
+        cloudinary.config(
+            cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            api_key=os.getenv("CLOUDINARY_API_KEY"),
+            api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+            secure=True
+        )
+        _configured = True
+    return cloudinary.uploader
 
 
 def upload_image(file, folder="revistete"):
@@ -29,7 +40,7 @@ def upload_image(file, folder="revistete"):
     """
     try:
         # Subir imagen a Cloudinary
-        upload_result = cloudinary.uploader.upload(
+        upload_result = _uploader().upload(
             file,
             folder=folder,  # Organiza las imágenes en carpetas
             resource_type="image",
@@ -66,7 +77,7 @@ def delete_image(public_id):
         dict: Resultado de la operación
     """
     try:
-        result = cloudinary.uploader.destroy(public_id)
+        result = _uploader().destroy(public_id)
         return {
             "success": result['result'] == 'ok',
             "result": result
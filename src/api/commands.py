@@ -1,34 +1,327 @@
 
+import os
+import subprocess
+import sys
+import time
 import click
-from api.models import db, User
 
 """
 In this file, you can add as many commands as you want using the @app.cli.command decorator
 Flask commands are usefull to run cronjobs or tasks outside of the API but sill in integration 
 with youy database, for example: Import the price of bitcoin every night as 12am
 """
+def _seed_catalog(sellers, buyers, products, images_per_product, offers_per_product,
+                  sale_ratio, seed, chunk_size=5000):
+    from api.seed import seed_catalog
+
+    start = time.perf_counter()
+
+    def progress(counts):
+        elapsed = time.perf_counter() - start
+        print(f"  {counts['products']}/{products} products ({counts['products'] / elapsed:.0f}/s)")
+
+    counts = seed_catalog(sellers, buyers, products, images_per_product, offers_per_product,
+                          sale_ratio, seed, chunk_size, progress)
+    print(", ".join(f"{n} {table}" for table, n in counts.items()),
+          f"created in {time.perf_counter() - start:.1f}s")
+
+
 def setup_commands(app):
     
     """ 
-    This is an example command "insert-test-users" that you can run from the command line
-    by typing: $ flask insert-test-users 5
-    Note: 5 is the number of users to add
+    Crea usuarios de prueba completos con inserts masivos y un único hash de contraseña
+    (la contraseña de todos es api.seed.SEED_PASSWORD):
+    $ flask insert-test-users 5 --role seller
     """
     @app.cli.command("insert-test-users") # name of our command
-    @click.argument("count") # argument of out command
-    def insert_test_users(count):
-        print("Creating test users")
-        for x in range(1, int(count) + 1):
-            user = User()
-            user.email = "test_user" + str(x) + "@test.com"
-            user.password = "123456"
-            user.is_active = True
-            db.session.add(user)
-            db.session.commit()
-            print("User: ", user.email, " created.")
-
-        print("All test users created")
+    @click.argument("count", type=int) # argument of out command
+    @click.option("--role", type=click.Choice(["buyer", "seller"]), default="buyer")
+    @click.option("--seed", default=42, help="Semilla para que los datos sean reproducibles")
+    def insert_test_users(count, role, seed):
+        from api.seed import seed_users, SEED_PASSWORD
+
+        start = time.perf_counter()
+        ids = seed_users(count, role, seed)
+        print(f"{len(ids)} {role}s created in {time.perf_counter() - start:.1f}s "
+              f"(password: {SEED_PASSWORD})")
 
+    """
+    Genera un catálogo realista completo (usuarios, productos, imágenes, ofertas y ventas).
+    Un catálogo de un millón de productos para pruebas de rendimiento:
+    $ flask insert-test-data --products 1000000 --sellers 5000 --buyers 50000
+    """
     @app.cli.command("insert-test-data")
-    def insert_test_data():
-        pass
\ No newline at end of file
+    @click.option("--sellers", default=20)
+    @click.option("--buyers", default=100)
+    @click.option("--products", default=1000)
+    @click.option("--images-per-product", default=3)
+    @click.option("--offers-per-product", default=2)
+    @click.option("--sale-ratio", default=0.05, help="Fracción de productos con venta")
+    @click.option("--seed", default=42, help="Semilla para que los datos sean reproducibles")
+    @click.option("--chunk-size", default=5000, help="Filas de producto por transacción")
+    def insert_test_data(sellers, buyers, products, images_per_product, offers_per_product,
+                         sale_ratio, seed, chunk_size):
+        _seed_catalog(sellers, buyers, products, images_per_product, offers_per_product,
+                      sale_ratio, seed, chunk_size)
+
+    """
+    Mide el coste de arranque importando la app en un proceso limpio con
+    `python -X importtime` y muestra los módulos más caros:
+    $ flask profile-imports --limit 20
+    """
+    @app.cli.command("profile-imports")
+    @click.option("--limit", default=25, help="Número de módulos a mostrar")
+    @click.option("--depth", default=1, help="Profundidad máxima del árbol de imports")
+    def profile_imports(limit, depth):
+        src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        # Simula un worker web (gunicorn), no un comando `flask ...`
+        env.pop("FLASK_RUN_FROM_CLI", None)
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app"],
+            cwd=src_dir, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(result.stderr)
+            raise SystemExit(result.returncode)
+
+        rows = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            if not self_us.strip().isdigit():
+                continue  # cabecera
+            # El nombre viene indentado dos espacios por nivel de anidamiento
+            level = (len(name) - len(name.lstrip()) - 1) // 2
+            if level <= depth:
+                rows.append((int(cumulative_us), int(self_us), name.strip()))
+
+        total = max((row[0] for row in rows if row[2] == "app"), default=0)
+        print(f"{'cumulative (ms)':>16} {'self (ms)':>10}  module")
+        for cumulative_us, self_us, name in sorted(rows, reverse=True)[:limit]:
+            print(f"{cumulative_us / 1000:>16.1f} {self_us / 1000:>10.1f}  {name}")
+        print(f"Total import time of app: {total / 1000:.1f} ms")
+
+    """
+    Mide cuántos hashes por segundo soporta cada política de contraseñas:
+    $ flask benchmark-hashing -m pbkdf2:sha256:600000 -m scrypt:32768:8:1
+    """
+    @app.cli.command("benchmark-hashing")
+    @click.option("--method", "-m", "methods", multiple=True,
+                  help="Método de werkzeug a medir (se puede repetir)")
+    @click.option("--seconds", default=3.0, help="Duración de cada medición")
+    def benchmark_hashing(methods, seconds):
+        from werkzeug.security import generate_password_hash, check_password_hash
+        from api.hashing import PASSWORD_HASH_METHOD
+
+        methods = methods or (PASSWORD_HASH_METHOD, "pbkdf2:sha256:260000",
+                              "pbkdf2:sha256:600000", "scrypt:32768:8:1")
+        print(f"{'method':<28} {'hash/s':>10} {'verify/s':>10} {'ms/hash':>10}")
+        for method in dict.fromkeys(methods):
+            hashed = generate_password_hash("benchmark-password", method)
+            rates = []
+            for fn, args in ((generate_password_hash, ("benchmark-password", method)),
+                             (check_password_hash, (hashed, "benchmark-password"))):
+                count = 0
+                start = time.perf_counter()
+                while time.perf_counter() - start < seconds:
+                    fn(*args)
+                    count += 1
+                rates.append(count / (time.perf_counter() - start))
+            print(f"{method:<28} {rates[0]:>10.1f} {rates[1]:>10.1f} {1000 / rates[0]:>10.1f}")
+
+    """
+    Genera un dataset de rendimiento (vendedores, productos, imágenes, ofertas y ventas):
+    $ flask seed-benchmark-data --sellers 50 --products-per-seller 200
+    """
+    @app.cli.command("seed-benchmark-data")
+    @click.option("--sellers", default=20)
+    @click.option("--buyers", default=100)
+    @click.option("--products-per-seller", default=50)
+    @click.option("--images-per-product", default=3)
+    @click.option("--offers-per-product", default=2)
+    @click.option("--sale-ratio", default=0.05, help="Fracción de productos con venta")
+    @click.option("--seed", default=42, help="Semilla para que los datos sean reproducibles")
+    def seed_benchmark(sellers, buyers, products_per_seller, images_per_product,
+                       offers_per_product, sale_ratio, seed):
+        _seed_catalog(sellers, buyers, sellers * products_per_seller, images_per_product,
+                      offers_per_product, sale_ratio, seed)
+
+    """
+    Ejecuta los escenarios de carga y guarda el resultado en JSON:
+    $ flask benchmark-api --requests 300 --compare benchmarks/<anterior>.json
+    """
+    @app.cli.command("benchmark-api")
+    @click.option("--requests", "count", default=200, help="Peticiones por escenario")
+    @click.option("--scenario", "-s", "scenarios", multiple=True, help="Escenario a ejecutar (se puede repetir)")
+    @click.option("--concurrency", default=1, help="Hilos concurrentes por escenario")
+    @click.option("--output-dir", default="benchmarks", help="Carpeta donde guardar el JSON")
+    @click.option("--compare", "baseline_path", type=click.Path(exists=True), help="JSON anterior con el que comparar")
+    def benchmark_api(count, scenarios, concurrency, output_dir, baseline_path):
+        import json
+        from api import rate_limit
+        from api.benchmark import SCENARIOS, run_benchmark, save_report, format_report
+
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise click.BadParameter(f"Escenarios desconocidos: {', '.join(unknown)}")
+
+        # Los límites por IP/usuario harían que el benchmark midiera respuestas 429
+        rate_limit.RATE_LIMITS_ENABLED = False
+        report = run_benchmark(app, count, scenarios or None, concurrency)
+        baseline = None
+        if baseline_path:
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+        print(format_report(report, baseline))
+        print("Saved to", save_report(report, output_dir))
+
+    """
+    Comprueba que aceptar ofertas es seguro bajo concurrencia. Crea usuarios y productos,
+    así que se niega a ejecutarse fuera de una base de pruebas:
+    $ DATABASE_URL=sqlite:////tmp/stress.db flask db upgrade
+    $ DATABASE_URL=sqlite:////tmp/stress.db flask stress-offer-accept --offers 32 --rounds 10
+    """
+    @app.cli.command("stress-offer-accept")
+    @click.option("--offers", default=20, help="Ofertas (e hilos) por producto")
+    @click.option("--rounds", default=5)
+    def stress_offer_accept(offers, rounds):
+        from api.benchmark import stress_offer_acceptance
+
+        try:
+            result = stress_offer_acceptance(app, offers, rounds)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        print(f"{rounds} rounds x {offers} threads, status codes: {result['status_codes']}")
+        if result["failures"]:
+            for failure in result["failures"]:
+                print("FAILED:", failure)
+            raise SystemExit(1)
+        print("OK: exactly one accepted offer per product")
+
+    """
+    Caduca las ofertas pendientes vencidas y las mueve a offer_archive, y libera las reservas
+    sin compra de más de RESERVATION_TTL_HOURS (pensado para cron):
+    $ flask expire-offers --batch-size 1000
+    """
+    @app.cli.command("expire-offers")
+    @click.option("--batch-size", default=1000, help="Ofertas por transacción")
+    @click.option("--dry-run", is_flag=True, help="Solo cuenta las ofertas que caducarían")
+    def expire_offers_command(batch_size, dry_run):
+        from api.offer_expiry import expire_offers
+
+        for rule in expire_offers(batch_size=batch_size, dry_run=dry_run):
+            scope = ", ".join(f"{key}={rule[key]}" for key in ("seller_id", "category") if rule[key]) or "default"
+            print(f"{scope} (ttl {rule['ttl_hours']}h): {rule['expired']} offers "
+                  f"{'would expire' if dry_run else 'expired'}")
+        if not dry_run:
+            from api.offer_expiry import release_stale_reservations
+            print(f"{release_stale_reservations(batch_size=batch_size)} stale reservations released")
+            from api.sync import prune_tombstones
+            print(f"{prune_tombstones()} old sync tombstones pruned")
+            from api.idempotency import purge_expired_keys
+            print(f"{purge_expired_keys()} expired idempotency keys purged")
+
+    """
+    Define el TTL de las ofertas pendientes por vendedor y/o categoría (sin --hours: nunca caducan):
+    $ flask set-offer-ttl --category mujer_vestidos --hours 48
+    """
+    @app.cli.command("set-offer-ttl")
+    @click.option("--seller-id", type=int)
+    @click.option("--category")
+    @click.option("--hours", type=int)
+    def set_offer_ttl(seller_id, category, hours):
+        from api.models import db, OfferExpiryRule
+
+        rule = OfferExpiryRule.query.filter_by(seller_id=seller_id, category=category).first()
+        if rule is None:
+            rule = OfferExpiryRule(seller_id=seller_id, category=category)
+            db.session.add(rule)
+        rule.ttl_hours = hours
+        db.session.commit()
+        print("Rule saved:", rule.serialize())
+
+    """
+    Recalcula el ranking de tendencias (?sort=trending) desde product_activity:
+    $ flask refresh-trending
+    """
+    @app.cli.command("refresh-trending")
+    def refresh_trending():
+        from api.trending import rebuild_trending
+
+        print(f"{rebuild_trending()} products ranked")
+
+    """
+    Funde una variante de marca o color en su valor canónico (la variante queda como alias):
+    $ flask merge-dictionary-value --kind brand --source "Zaraa" --into "Zara"
+    """
+    @app.cli.command("merge-dictionary-value")
+    @click.option("--kind", type=click.Choice(["brand", "color"]), required=True)
+    @click.option("--source", required=True, help="Variante a eliminar")
+    @click.option("--into", "target", required=True, help="Valor canónico")
+    def merge_dictionary_value(kind, source, target):
+        from api.dictionaries import merge_values
+
+        try:
+            moved = merge_values(kind, source, target)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        print(f"{moved} products moved from {source!r} to {target!r}; {source!r} is now an alias")
+
+    """
+    Recalcula seller_stats y los contadores de producto desde cero e informa de la deriva:
+    $ flask reconcile-stats --dry-run
+    """
+    @app.cli.command("reconcile-stats")
+    @click.option("--dry-run", is_flag=True, help="Solo informa de la deriva, no corrige")
+    @click.option("--limit", default=20, help="Diferencias a mostrar por tabla")
+    def reconcile_stats_command(dry_run, limit):
+        from api.stats import reconcile_stats
+        report = reconcile_stats(fix=not dry_run)
+        for name, drift in report.items():
+            print(f"{name}: {len(drift)} counters drifted{'' if dry_run or not drift else ' (fixed)'}")
+            for item in drift[:limit]:
+                print(f"  {item}")
+
+    """
+    Compara el catálogo por SQL con el índice en memoria (CATALOG_INDEX) sobre los datos actuales:
+    $ flask seed-benchmark-data --products-per-seller 5000 && flask benchmark-catalog-index
+    """
+    @app.cli.command("benchmark-catalog-index")
+    @click.option("--requests", "count", default=30, help="Peticiones por URL y modo")
+    def benchmark_catalog_index(count):
+        from api.benchmark import compare_catalog_index
+        from api.catalog_index import load_numpy
+        if load_numpy() is None:
+            raise click.ClickException("numpy is not installed: run `pipenv install`")
+
+        report = compare_catalog_index(app, requests=count)
+        print(f"{report['products']} products, index built in {report['build_seconds']}s, "
+              f"{report['memory_mb']} MB")
+        print(f"{'url':<70} {'sql p50':>9} {'idx p50':>9} {'speedup':>8}  total")
+        for result in report["results"]:
+            sql, index = result["sql"], result["index"]
+            speedup = sql["p50"] / index["p50"] if index["p50"] else 0
+            check = "ok" if result["same_total"] else f"MISMATCH ({sql['total']} vs {index['total']})"
+            print(f"{result['url'][22:]:<70} {sql['p50']:>9.2f} {index['p50']:>9.2f} {speedup:>7.1f}x  {check}")
+
+    """
+    Genera las variantes .gz/.br de los estáticos (se ejecuta al construir, tras `npm run build`):
+    $ flask precompress-static --directory public
+    """
+    @app.cli.command("precompress-static")
+    @click.option("--directory", "directories", multiple=True, default=["public", "dist"],
+                  help="Carpeta de estáticos (se puede repetir)")
+    def precompress_static(directories):
+        from api.compression import brotli, precompress_directory
+
+        if brotli is None:
+            print("brotli is not installed: only .gz files will be generated")
+        for directory in directories:
+            if not os.path.isdir(directory):
+                continue
+            written = precompress_directory(directory)
+            for path, size, compressed in written:
+                print(f"{path}: {size} -> {compressed} bytes")
+            print(f"{directory}: {len(written)} files written")
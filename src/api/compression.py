@@ -0,0 +1,129 @@
+# src/api/compression.py
+
+"""
+Compresión de respuestas y servido de estáticos.
+
+- Respuestas dinámicas (JSON, texto) de más de COMPRESS_MIN_SIZE bytes se comprimen
+  con brotli (si el paquete `brotli` está instalado) o gzip según Accept-Encoding.
+- Los estáticos se precomprimen al construir (`flask precompress-static` genera
+  .br/.gz junto a cada fichero) y send_static() elige la variante que acepte el cliente.
+- Caché: los ficheros con hash en el nombre (bundle-3f9a1c2e.js, assets/...) son
+  inmutables durante un año; el resto, incluido index.html, se revalida siempre (ETag).
+"""
+import gzip
+import mimetypes
+import os
+import re
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli  # dependencia opcional: sin ella solo se usa gzip
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", 6))
+# Calidad baja para respuestas dinámicas: casi la ratio de gzip -9 a una fracción del coste
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+COMPRESS_MIMETYPES = {"application/json", "text/html", "text/plain", "text/css", "text/csv",
+                      "application/javascript", "text/javascript", "image/svg+xml"}
+STATIC_EXTENSIONS = (".js", ".mjs", ".css", ".html", ".json", ".svg", ".txt", ".map", ".ico", ".xml")
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Hash de contenido: 8+ caracteres hex con letras y dígitos (una fecha como image-20240101.png no lo es)
+HASHED_NAME_RE = re.compile(r"[.-](?=[0-9a-f]*[a-f])(?=[0-9a-f]*\d)[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _accepted_encoding():
+    encodings = ["br", "gzip"] if brotli else ["gzip"]
+    return request.accept_encodings.best_match(encodings)
+
+
+def compress(data, encoding, static=False):
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if static else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9 if static else COMPRESS_LEVEL, mtime=0)
+
+
+def is_hashed_asset(path):
+    return path.startswith("assets/") or bool(HASHED_NAME_RE.search(os.path.basename(path)))
+
+
+def send_static(directory, path):
+    """send_from_directory con variantes precomprimidas y política de caché por tipo de fichero."""
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    response = None
+    # Servir un .br ya generado no necesita el paquete brotli
+    for encoding, extension in PRECOMPRESSED:
+        candidate = safe_join(directory, path + extension)
+        if request.accept_encodings[encoding] and candidate and os.path.isfile(candidate):
+            response = send_from_directory(directory, path + extension, mimetype=mimetype)
+            response.headers["Content-Encoding"] = encoding
+            break
+    if response is None:
+        response = send_from_directory(directory, path)
+    response.vary.add("Accept-Encoding")
+
+    if is_hashed_asset(path):
+        response.cache_control.no_cache = None  # send_file lo activa por defecto
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # index.html y ficheros sin hash: siempre se revalidan (304 con el ETag)
+        response.cache_control.no_cache = True
+    return response
+
+
+def precompress_directory(directory, min_size=COMPRESS_MIN_SIZE):
+    """Genera .gz (y .br si hay brotli) para los estáticos comprimibles. Devuelve los ficheros escritos."""
+    written = []
+    encodings = [(encoding, extension) for encoding, extension in PRECOMPRESSED if encoding != "br" or brotli]
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(STATIC_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            if os.path.getsize(path) < min_size:
+                continue
+            with open(path, "rb") as f:
+                data = None
+                for encoding, extension in encodings:
+                    target = path + extension
+                    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                        continue
+                    data = data if data is not None else f.read()
+                    compressed = compress(data, encoding, static=True)
+                    # Si no compensa, mejor no tener variante
+                    if len(compressed) >= len(data):
+                        continue
+                    with open(target, "wb") as out:
+                        out.write(compressed)
+                    written.append((target, len(data), len(compressed)))
+    return written
+
+
+def setup_compression(app):
+    @app.after_request
+    def compress_response(response):
+        if any((response.direct_passthrough, response.is_streamed,
+                response.status_code < 200, response.status_code in (204, 304),
+                "Content-Encoding" in response.headers,
+                response.mimetype not in COMPRESS_MIMETYPES)):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        if response.content_length is not None and response.content_length < COMPRESS_MIN_SIZE:
+            return response
+        encoding = _accepted_encoding()
+        if not encoding:
+            return response
+
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
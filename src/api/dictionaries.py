@@ -0,0 +1,209 @@
+# src/api/dictionaries.py
+
+"""
+Diccionarios canónicos de marcas y colores (tablas brand, color y dictionary_alias).
+
+Escritura: lo que teclea el vendedor se normaliza ("  ZARA " -> "zara",
+"Marrón" -> "marron") y se resuelve a un id por clave exacta o por alias; si no
+existe se crea un valor nuevo. Los productos guardan brand_id / color_id.
+
+Lectura: el filtro del catálogo se traduce a ids (clave o alias exactos y, si no,
+coincidencia aproximada por trigramas) y en SQL queda como igualdad indexada.
+La coincidencia aproximada usa pg_trgm cuando está instalado en Postgres y, si
+no, la misma medida (trigramas de palabras, similitud de Jaccard) en Python
+sobre la instantánea en memoria. Umbral: FUZZY_MATCH_THRESHOLD (0.3, como pg_trgm).
+La búsqueda libre (?search=) no es aproximada: casa las marcas cuya clave o alias
+contiene el texto, igual que el ILIKE sobre título y descripción.
+
+Las variantes que se cuelan (erratas) se funden con `flask merge-dictionary-value`:
+los productos pasan al valor canónico y la variante queda como alias.
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from sqlalchemy import delete, func, select, text, update
+from api.models import db, Brand, Color, DictionaryAlias, Product, PRODUCT_IS_ACTIVE
+from api.stats import dialect_insert
+
+DICTIONARY_CACHE_SECONDS = float(os.getenv("DICTIONARY_CACHE_SECONDS", 300))
+FUZZY_MATCH_THRESHOLD = float(os.getenv("FUZZY_MATCH_THRESHOLD", 0.3))
+
+MODELS = {"brand": Brand, "color": Color}
+PRODUCT_COLUMNS = {"brand": Product.brand_id, "color": Product.color_id}
+
+
+def normalize(value):
+    """Clave de comparación: minúsculas, sin acentos ni puntuación (salvo &), espacios simples."""
+    value = unicodedata.normalize("NFKD", value or "").encode("ascii", "ignore").decode("ascii").lower()
+    value = re.sub(r"[^a-z0-9& ]+", "", value.replace("-", " "))
+    return " ".join(value.split())
+
+
+def trigrams(value):
+    """Trigramas como pg_trgm: cada palabra con dos espacios delante y uno detrás."""
+    grams = set()
+    for word in re.findall(r"[a-z0-9]+", value):
+        word = f"  {word} "
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class Dictionary:
+    """Instantánea inmutable de un diccionario: valores canónicos y alias."""
+
+    def __init__(self, kind, rows, aliases):
+        self.kind = kind
+        self.names = {value_id: name for value_id, key, name in rows}
+        self.by_key = {key: value_id for value_id, key, name in rows}
+        self.by_key.update(aliases)
+        self.trigrams = {key: trigrams(key) for key in self.by_key}
+        self.loaded_at = time.monotonic()
+
+    def name(self, value_id):
+        return self.names.get(value_id)
+
+    def resolve(self, value):
+        """Id del valor canónico por clave o alias exactos; None si no existe."""
+        return self.by_key.get(normalize(value))
+
+    def match(self, value):
+        """Ids para un filtro escrito por el usuario: exacto si lo hay, si no aproximado."""
+        key = normalize(value)
+        if not key:
+            return []
+        if key in self.by_key:
+            return [self.by_key[key]]
+        if _has_pg_trgm():
+            return _match_pg_trgm(self.kind, key)
+        grams = trigrams(key)
+        return sorted({value_id for candidate, value_id in self.by_key.items()
+                       if key in candidate or similarity(grams, self.trigrams[candidate]) >= FUZZY_MATCH_THRESHOLD})
+
+    def containing(self, value):
+        """Ids cuya clave o alias contiene el texto (subcadena, sin coincidencia aproximada)."""
+        key = normalize(value)
+        if not key:
+            return []
+        return sorted({value_id for candidate, value_id in self.by_key.items() if key in candidate})
+
+
+_dictionaries = {}
+_lock = threading.Lock()
+_pg_trgm = None
+
+
+def _has_pg_trgm():
+    global _pg_trgm
+    if _pg_trgm is None:
+        _pg_trgm = db.engine.dialect.name == "postgresql" and bool(db.session.scalar(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")))
+    return _pg_trgm
+
+
+def _match_pg_trgm(kind, key):
+    # Índice GIN gin_trgm_ops sobre key (migración); incluye los alias
+    model = MODELS[kind]
+    values = select(model.id).where(model.key.op("%")(key) | model.key.contains(key, autoescape=True))
+    aliases = select(DictionaryAlias.value_id).where(
+        DictionaryAlias.kind == kind,
+        DictionaryAlias.key.op("%")(key) | DictionaryAlias.key.contains(key, autoescape=True))
+    db.session.execute(text("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)"),
+                       {"threshold": str(FUZZY_MATCH_THRESHOLD)})
+    return sorted(set(db.session.scalars(values.union(aliases))))
+
+
+def load_dictionary(kind):
+    model = MODELS[kind]
+    rows = db.session.execute(select(model.id, model.key, model.name)).all()
+    aliases = dict(db.session.execute(
+        select(DictionaryAlias.key, DictionaryAlias.value_id).where(DictionaryAlias.kind == kind)).all())
+    _dictionaries[kind] = Dictionary(kind, rows, aliases)
+    return _dictionaries[kind]
+
+
+def get_dictionary(kind, *value_ids):
+    """Diccionario en caché; se recarga si caducó o si falta alguno de value_ids."""
+    dictionary = _dictionaries.get(kind)
+    if dictionary is not None and time.monotonic() - dictionary.loaded_at < DICTIONARY_CACHE_SECONDS \
+            and all(value_id is None or value_id in dictionary.names for value_id in value_ids):
+        return dictionary
+    with _lock:
+        current = _dictionaries.get(kind)
+        if current is not dictionary and current is not None:
+            return current
+        return load_dictionary(kind)
+
+
+def invalidate_dictionary(kind):
+    _dictionaries.pop(kind, None)
+
+
+def resolve_value(kind, value):
+    """Valor escrito por un vendedor -> id canónico (lo crea si es nuevo). None si está vacío."""
+    key = normalize(value)
+    if not key:
+        return None
+    value_id = get_dictionary(kind).by_key.get(key)
+    if value_id is not None:
+        return value_id
+    model = MODELS[kind]
+    name = " ".join(value.split())[:model.name.type.length]
+    # Dos vendedores pueden crear el mismo valor a la vez: gana el primero
+    db.session.execute(
+        dialect_insert(model.__table__)
+        .values(key=key[:model.key.type.length], name=name)
+        .on_conflict_do_nothing(index_elements=["key"])
+    )
+    invalidate_dictionary(kind)
+    return db.session.scalar(select(model.id).where(model.key == key[:model.key.type.length]))
+
+
+def merge_values(kind, source, target):
+    """
+    Funde `source` en `target` (valores tal como se escriben): los productos pasan a
+    target, source se borra y su clave queda como alias. Devuelve los productos movidos.
+    """
+    dictionary = get_dictionary(kind)
+    source_id, target_id = dictionary.resolve(source), dictionary.resolve(target)
+    if source_id is None or target_id is None:
+        raise ValueError(f"Unknown {kind}: {source if source_id is None else target}")
+    if source_id == target_id:
+        return 0
+    model = MODELS[kind]
+    column = PRODUCT_COLUMNS[kind]
+    moved = db.session.execute(
+        update(Product).where(column == source_id)
+        # updated_at: la sincronización incremental y el índice del catálogo ven el cambio
+        .values({column.key: target_id, "updated_at": datetime.utcnow()})
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    source_key = db.session.scalar(select(model.key).where(model.id == source_id))
+    db.session.execute(update(DictionaryAlias)
+                       .where(DictionaryAlias.kind == kind, DictionaryAlias.value_id == source_id)
+                       .values(value_id=target_id))
+    db.session.execute(delete(model).where(model.id == source_id))
+    db.session.merge(DictionaryAlias(kind=kind, key=source_key, value_id=target_id))
+    db.session.commit()
+    invalidate_dictionary(kind)
+    return moved
+
+
+def facet_names(kind, value_ids):
+    dictionary = get_dictionary(kind, *value_ids)
+    return sorted((dictionary.name(value_id) for value_id in value_ids if value_id is not None),
+                  key=lambda name: normalize(name))
+
+
+def used_values(kind):
+    """Ids distintos en uso por los productos activos (facetas del catálogo, índice parcial de brand_id/color_id)."""
+    column = PRODUCT_COLUMNS[kind]
+    return db.session.scalars(select(func.distinct(column)).where(column.isnot(None), PRODUCT_IS_ACTIVE)).all()
@@ -0,0 +1,167 @@
+# src/api/events.py
+
+"""
+Notificaciones en tiempo real (Server-Sent Events).
+
+Las rutas publican eventos de ofertas tras hacer commit con publish(user_ids, type, data).
+Cada conexión SSE (/api/events/stream) se suscribe a los eventos de su usuario.
+
+- Por defecto el reparto es en proceso (LocalBroker): suficiente con un solo worker.
+- Con EVENTS_BROKER_URL=redis://... los eventos se publican en Redis y cada worker
+  los reenvía a sus conexiones locales, así funciona con varios workers/instancias.
+
+Cada conexión ocupa un hilo mientras está abierta: gunicorn debe usar --threads
+(ver Procfile) y las conexiones se cierran tras SSE_MAX_SECONDS para que el
+navegador reconecte y libere el hilo. Como mucho SSE_MAX_STREAMS conexiones por
+worker (menos que sus --threads, para que quede sitio a las peticiones normales;
+MAX_CONCURRENT_REQUESTS no cuenta los streams): por encima se responde 503 con
+`retry:` y el navegador lo vuelve a intentar más tarde.
+
+Con LocalBroker un evento solo llega a las conexiones del worker que lo
+publica, por eso el Procfile arranca un único worker (--workers 1); para
+subirlo hay que configurar EVENTS_BROKER_URL.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from api.models import Offer
+from api.money import from_cents
+
+EVENTS_BROKER_URL = os.getenv("EVENTS_BROKER_URL", "")
+SSE_MAX_SECONDS = int(os.getenv("SSE_MAX_SECONDS", 300))
+SSE_HEARTBEAT_SECONDS = 15
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", 4))  # por worker; 0 = sin límite
+SSE_BUSY_RETRY_SECONDS = 30
+SUBSCRIBER_QUEUE_SIZE = 100
+# Lo que necesita publish_offer_event
+OFFER_EVENT_COLUMNS = (Offer.id, Offer.product_id, Offer.buyer_id, Offer.seller_id, Offer.amount_cents, Offer.status)
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBroker:
+    """Pub/sub en memoria: user_id -> colas de las conexiones abiertas de ese usuario."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            self._subscribers[user_id].discard(subscription)
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+
+    def deliver(self, user_ids, message):
+        with self._lock:
+            targets = [sub for user_id in user_ids for sub in self._subscribers.get(user_id, ())]
+        for subscription in targets:
+            try:
+                subscription.put_nowait(message)
+            except queue.Full:
+                # Cliente lento: pierde el evento y recargará al reconectar
+                pass
+
+    def publish(self, user_ids, message):
+        self.deliver(user_ids, message)
+
+
+class RedisBroker(LocalBroker):
+    """Publica en un canal de Redis; un hilo por worker reparte a las conexiones locales."""
+
+    CHANNEL = "revistete:events"
+
+    def __init__(self, url):
+        super().__init__()
+        import redis  # dependencia opcional, solo si se configura un broker compartido
+        self._client = redis.Redis.from_url(url)
+        threading.Thread(target=self._listen, name="events-listener", daemon=True).start()
+
+    def publish(self, user_ids, message):
+        self._client.publish(self.CHANNEL, json.dumps({"user_ids": list(user_ids), "message": message}))
+
+    def _listen(self):
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.CHANNEL)
+        for item in pubsub.listen():
+            try:
+                payload = json.loads(item["data"])
+                self.deliver(payload["user_ids"], payload["message"])
+            except (ValueError, KeyError):
+                logger.warning("Invalid event payload: %r", item)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = RedisBroker(EVENTS_BROKER_URL) if EVENTS_BROKER_URL else LocalBroker()
+    return _broker
+
+
+def publish(user_ids, event_type, data):
+    """Envía un evento a todas las conexiones abiertas de los usuarios indicados."""
+    message = {"type": event_type, "data": data}
+    try:
+        get_broker().publish({int(user_id) for user_id in user_ids}, message)
+    except Exception:
+        # Una notificación perdida no debe romper la petición que ya hizo commit
+        logger.exception("Could not publish event %s", event_type)
+
+
+def publish_offer_event(event_type, offer):
+    """offer: una Offer o una fila con OFFER_EVENT_COLUMNS (p. ej. de un UPDATE ... RETURNING)."""
+    publish((offer.buyer_id, offer.seller_id), event_type, {
+        "id": offer.id,
+        "product_id": offer.product_id,
+        "buyer_id": offer.buyer_id,
+        "seller_id": offer.seller_id,
+        "amount": from_cents(offer.amount_cents),
+        "status": offer.status,
+    })
+
+
+_stream_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS) if SSE_MAX_STREAMS else None
+
+
+def acquire_stream_slot():
+    """Reserva una de las SSE_MAX_STREAMS conexiones del worker. False si están todas ocupadas."""
+    return _stream_slots is None or _stream_slots.acquire(blocking=False)
+
+
+def release_stream_slot():
+    if _stream_slots is not None:
+        _stream_slots.release()
+
+
+def stream(user_id):
+    """Generador SSE para un usuario: eventos, heartbeats y cierre tras SSE_MAX_SECONDS."""
+    broker = get_broker()
+    subscription = broker.subscribe(user_id)
+    deadline = time.monotonic() + SSE_MAX_SECONDS
+    try:
+        yield "retry: 3000\n: connected\n\n"
+        while time.monotonic() < deadline:
+            try:
+                message = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {message['type']}\ndata: {json.dumps(message['data'])}\n\n"
+    finally:
+        broker.unsubscribe(user_id, subscription)
@@ -0,0 +1,68 @@
+# src/api/hashing.py
+
+"""
+Política de hash de contraseñas.
+
+El método y su coste se configuran con PASSWORD_HASH_METHOD usando el formato
+de werkzeug, por ejemplo "pbkdf2:sha256:600000" o "scrypt:32768:8:1".
+Los hashes se calculan en un pool de hilos acotado para que una avalancha de
+logins o registros no ocupe todos los workers: si el pool y su cola están
+llenos, la petición falla rápido con un 503.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+from api.utils import APIException
+
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:600000")
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", 2))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", 8))
+HASH_ADMISSION_TIMEOUT = float(os.getenv("HASH_ADMISSION_TIMEOUT", 2))
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_MAX_PENDING)
+
+
+class HashingBusy(APIException):
+    status_code = 503
+
+    def __init__(self):
+        super().__init__("Servidor ocupado, inténtalo de nuevo en unos segundos")
+
+
+def _run(fn, *args):
+    # Admisión: esperamos como mucho HASH_ADMISSION_TIMEOUT por un hueco en el pool
+    if not _slots.acquire(timeout=HASH_ADMISSION_TIMEOUT):
+        raise HashingBusy()
+    try:
+        return _executor.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password, method=None):
+    return _run(generate_password_hash, password, method or PASSWORD_HASH_METHOD)
+
+
+def verify_password(password_hash, password):
+    if not password_hash or password is None:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+
+_method_prefix = None
+
+
+def _configured_prefix():
+    # werkzeug completa los parámetros por defecto ("pbkdf2" -> "pbkdf2:sha256:600000"),
+    # así que tomamos el prefijo real de un hash generado con la política actual
+    global _method_prefix
+    if _method_prefix is None:
+        _method_prefix = generate_password_hash("", PASSWORD_HASH_METHOD).split("$", 1)[0]
+    return _method_prefix
+
+
+def needs_rehash(password_hash):
+    # Formato de werkzeug: "<método>$<salt>$<hash>"
+    return password_hash.split("$", 1)[0] != _configured_prefix()
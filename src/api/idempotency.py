@@ -0,0 +1,132 @@
+# src/api/idempotency.py
+
+"""
+Cabecera Idempotency-Key para POST que no se deben repetir (checkout).
+
+    @api.route('/checkout', methods=['POST'])
+    @jwt_required()
+    @idempotent
+    def checkout(): ...
+
+La primera petición con una clave la reserva (fila en idempotency_key, por
+usuario) antes de ejecutar la vista y guarda después su respuesta. Un reintento
+con la misma clave:
+- devuelve la respuesta guardada (cabecera Idempotent-Replayed: true),
+- 409 si la primera sigue en curso,
+- 422 si el cuerpo o la ruta no coinciden (la clave se reutilizó para otra cosa).
+
+Las respuestas 5xx no se guardan: la clave se libera y se puede reintentar. Si
+el worker cae a mitad, la reserva caduca a los IDEMPOTENCY_LOCK_SECONDS; la
+vista debe seguir protegida por sus propias comprobaciones (el checkout lo está
+por el estado del producto). Las claves viven IDEMPOTENCY_KEY_TTL_HOURS y
+`flask expire-offers` purga las caducadas junto con los tombstones.
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, make_response, Response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import delete, update
+from api.models import db, IdempotencyKey
+from api.stats import dialect_insert
+
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", 24))
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 60))
+MAX_KEY_LENGTH = 255
+
+
+def _request_hash():
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.full_path.encode(), request.get_data()):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _claim(user_id, key, request_hash):
+    """Reserva la clave para esta petición. None si es nuestra; si no, la respuesta a devolver."""
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        dialect_insert(IdempotencyKey.__table__)
+        .values(user_id=user_id, key=key, request_hash=request_hash, created_at=now, locked_at=now)
+        .on_conflict_do_nothing(index_elements=["user_id", "key"])
+    ).rowcount
+    db.session.commit()
+    if claimed:
+        return None
+
+    record = db.session.get(IdempotencyKey, (user_id, key))
+    if record is None:
+        # Se purgó entre el INSERT y la lectura
+        return _claim(user_id, key, request_hash)
+    expired = record.created_at < now - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+    abandoned = record.status_code is None and record.locked_at < now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+    if expired or abandoned:
+        # Compare-and-set sobre locked_at: de dos reintentos simultáneos solo uno la retoma
+        taken = db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key,
+                   IdempotencyKey.locked_at == record.locked_at)
+            .values(request_hash=request_hash, status_code=None, response_body=None, created_at=now, locked_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if taken:
+            return None
+        return jsonify({"error": "A request with this Idempotency-Key is already in progress"}), 409
+
+    if record.request_hash != request_hash:
+        return jsonify({"error": "Idempotency-Key was already used for a different request"}), 422
+    if record.status_code is None:
+        return jsonify({"error": "A request with this Idempotency-Key is already in progress"}), 409
+    response = Response(record.response_body, status=record.status_code, mimetype="application/json")
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _finish(user_id, key, response):
+    record = (IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    if response is None or response.status_code >= 500:
+        db.session.execute(delete(IdempotencyKey).where(*record))
+    else:
+        db.session.execute(
+            update(IdempotencyKey).where(*record)
+            .values(status_code=response.status_code, response_body=response.get_data(as_text=True),
+                    locked_at=None)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+
+
+def idempotent(fn):
+    """Aplica Idempotency-Key a la vista (va después de @jwt_required: la clave es por usuario)."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return fn(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"}), 400
+
+        user_id = int(get_jwt_identity())
+        replay = _claim(user_id, key, _request_hash())
+        if replay is not None:
+            return replay
+
+        response = None
+        try:
+            response = make_response(fn(*args, **kwargs))
+        finally:
+            db.session.rollback()  # por si la vista dejó la transacción a medias
+            _finish(user_id, key, response)
+        return response
+    return wrapper
+
+
+def purge_expired_keys():
+    """Borra las claves más antiguas que IDEMPOTENCY_KEY_TTL_HOURS. Devuelve cuántas."""
+    cutoff = datetime.utcnow() - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+    purged = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff)).rowcount
+    db.session.commit()
+    return purged
@@ -0,0 +1,187 @@
+# src/api/metrics.py
+
+"""
+Instrumentación de la API.
+
+setup_metrics(app) registra hooks que miden, por ruta:
+- latencia de la petición (histograma)
+- número de sentencias SQL y su duración (eventos de SQLAlchemy)
+- tamaño de la respuesta
+y los expone en formato Prometheus en /metrics (protegido con METRICS_TOKEN si se define).
+
+Con PROFILE_SLOW_REQUESTS_MS=<ms> las peticiones se perfilan con cProfile y, si superan
+el umbral, se guarda un .prof en PROFILE_DIR (ábrelo con snakeviz o `python -m pstats`).
+Desde Python 3.12 solo puede haber un perfilador activo por proceso: con varios
+hilos se perfila una petición a la vez y las que coinciden con ella no.
+
+Las subpeticiones de /api/batch (api/batch.py) suman sus queries a las del lote.
+Las métricas son por proceso: con varios workers, Prometheus debe raspar cada uno.
+"""
+import cProfile
+import os
+import re
+import threading
+import time
+from flask import g, request, has_request_context, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+PROFILE_SLOW_REQUESTS_MS = float(os.getenv("PROFILE_SLOW_REQUESTS_MS", 0))  # 0 = desactivado
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/revistete-profiles")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            counts, total = self._series.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._series[labels] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, (counts, total) in series:
+            label_str = ",".join(f'{key}="{value}"' for key, value in labels)
+            prefix = label_str + "," if label_str else ""
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {counts[-1]}')
+            lines.append(f"{self.name}_sum{{{label_str}}} {total}")
+            lines.append(f"{self.name}_count{{{label_str}}} {counts[-1]}")
+        return "\n".join(lines)
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP", LATENCY_BUCKETS)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Tamaño del cuerpo de la respuesta", SIZE_BUCKETS)
+QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "Sentencias SQL ejecutadas por petición", QUERY_COUNT_BUCKETS)
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Duración de cada sentencia SQL", LATENCY_BUCKETS)
+
+ALL_METRICS = (REQUEST_LATENCY, RESPONSE_SIZE, QUERIES_PER_REQUEST, QUERY_DURATION)
+
+
+class QueryStats:
+    """Queries de una petición; las subpeticiones de un lote comparten las del lote desde sus hilos."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, elapsed):
+        with self._lock:
+            self.count += 1
+            self.time += elapsed
+
+
+_profile_lock = threading.Lock()
+
+
+def _route_label():
+    # Usamos la regla (/api/products/<int:product_id>) y no la URL para no explotar la cardinalidad
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - getattr(context, "_query_start", time.perf_counter())
+    if has_request_context() and "query_stats" in g:
+        g.query_stats.add(elapsed)
+        QUERY_DURATION.observe((("route", _route_label()),), elapsed)
+    else:
+        QUERY_DURATION.observe((("route", "background"),), elapsed)
+
+
+def _dump_profile(profiler, elapsed):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", _route_label()).strip("_") or "root"
+    path = os.path.join(PROFILE_DIR, f"{int(time.time() * 1000)}_{request.method}_{slug}_{int(elapsed * 1000)}ms.prof")
+    profiler.dump_stats(path)
+    return path
+
+
+def render_metrics():
+    return "\n".join(metric.render() for metric in ALL_METRICS) + "\n"
+
+
+def setup_metrics(app):
+    @app.before_request
+    def start_metrics():
+        g.metrics_start = time.perf_counter()
+        g.query_stats = QueryStats()
+        # Un perfilador a la vez (en 3.12+ un segundo enable() lanza ValueError)
+        if PROFILE_SLOW_REQUESTS_MS and _profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Otra herramienta (un depurador...) ya está perfilando
+                _profile_lock.release()
+            else:
+                g.profiler = profiler
+
+    @app.after_request
+    def record_metrics(response):
+        if "metrics_start" not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_start
+        route = _route_label()
+        REQUEST_LATENCY.observe(
+            (("method", request.method), ("route", route), ("status", str(response.status_code))), elapsed)
+        stats = g.query_stats
+        QUERIES_PER_REQUEST.observe((("route", route),), stats.count)
+        # No medir streams (SSE, ficheros): calcular su tamaño consumiría el generador
+        if not response.direct_passthrough and not response.is_streamed:
+            RESPONSE_SIZE.observe((("route", route),), response.calculate_content_length() or 0)
+
+        response.headers["Server-Timing"] = (
+            f"app;dur={elapsed * 1000:.1f}, db;dur={stats.time * 1000:.1f};desc=\"{stats.count} queries\""
+        )
+
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+            if elapsed * 1000 >= PROFILE_SLOW_REQUESTS_MS:
+                app.logger.warning("Petición lenta %s %s (%.0f ms, %d queries), perfil en %s",
+                                   request.method, route, elapsed * 1000, stats.count,
+                                   _dump_profile(profiler, elapsed))
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        # Si la vista lanzó una excepción after_request no se ejecuta
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+
+    @app.route('/metrics')
+    def metrics():
+        if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+            return Response("Unauthorized\n", status=401, mimetype="text/plain")
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -1,8 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Boolean, Text, Float, DateTime, ForeignKey
+from sqlalchemy import (String, Boolean, Text, Date, DateTime, Float, ForeignKey, Index, BigInteger, Computed, text,
+                        literal_column)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from api.hashing import hash_password, verify_password, needs_rehash
+from api.money import from_cents
+from datetime import date, datetime
 
 db = SQLAlchemy()
 
@@ -17,6 +19,7 @@ class User(db.Model):
     role: Mapped[str] = mapped_column(String(20), nullable=False, default="buyer")  # "buyer" o "seller"
     is_active: Mapped[bool] = mapped_column(Boolean(), nullable=False, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Campos adicionales para compradores
     address: Mapped[str] = mapped_column(String(200), nullable=True)
@@ -43,12 +46,21 @@ class User(db.Model):
     def __init__(self, **kwargs):
         # Hashear la contraseña al crear un nuevo usuario
         if "password" in kwargs:
-            kwargs["password"] = generate_password_hash(kwargs["password"])
+            kwargs["password"] = hash_password(kwargs["password"])
         super().__init__(**kwargs)
 
+    def set_password(self, password):
+        self.password = hash_password(password)
+
     def check_password(self, password):
         # Verificar si la contraseña es correcta
-        return check_password_hash(self.password, password)
+        if not verify_password(self.password, password):
+            return False
+        # Si cambió la política de hash, re-hasheamos de forma transparente
+        # (quien llama debe hacer commit)
+        if needs_rehash(self.password):
+            self.set_password(password)
+        return True
 
     def serialize(self):
         return {
@@ -65,21 +77,117 @@ class User(db.Model):
         }
 
 
+# Taxonomía del catálogo: género (depth 0) > categoría (1) > subcategoría (2).
+# El slug es el identificador estable de la API ("mujer", "mujer_vestidos",
+# "mujer_pantalones_jeans"); los productos guardan los ids (api/taxonomy.py).
+class Category(db.Model):
+    id: Mapped[int] = mapped_column(primary_key=True)
+    parent_id: Mapped[int] = mapped_column(ForeignKey("category.id"), nullable=True, index=True)
+    depth: Mapped[int] = mapped_column(nullable=False)
+    slug: Mapped[str] = mapped_column(String(120), unique=True, nullable=False)
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    position: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    # Productos activos del nodo y sus descendientes (géneros: suma de sus categorías), api/stats.py
+    product_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "slug": self.slug,
+            "name": self.name,
+            "parent_id": self.parent_id,
+            "depth": self.depth
+        }
+
+
+# Diccionarios canónicos de marcas y colores (api/dictionaries.py). `key` es el valor
+# normalizado ("massimo dutti", "marron") y `name` el que se muestra ("Massimo Dutti", "marrón").
+class Brand(db.Model):
+    id: Mapped[int] = mapped_column(primary_key=True)
+    key: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+
+
+class Color(db.Model):
+    id: Mapped[int] = mapped_column(primary_key=True)
+    key: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
+    name: Mapped[str] = mapped_column(String(50), nullable=False)
+
+
+# Variantes que apuntan a un valor canónico ("zaraa" -> Zara); kind es "brand" o "color"
+class DictionaryAlias(db.Model):
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+    key: Mapped[str] = mapped_column(String(100), primary_key=True)
+    value_id: Mapped[int] = mapped_column(nullable=False)
+
+
 class Product(db.Model):
+    # Índices del catálogo parciales sobre los productos activos: los vendidos y archivados
+    # salen de ellos y su tamaño sigue al inventario vivo, no a todo el histórico
+    __table_args__ = (
+        # Orden por defecto (más nuevos) sin filtros
+        Index("ix_product_active_created_at", "created_at",
+              postgresql_where=text("status = 'active'"), sqlite_where=text("status = 'active'")),
+        # Filtros del catálogo por taxonomía (igualdad entera) con el orden por defecto
+        Index("ix_product_gender_created_at", "gender_id", "created_at",
+              postgresql_where=text("status = 'active'"), sqlite_where=text("status = 'active'")),
+        Index("ix_product_category_created_at", "category_id", "created_at",
+              postgresql_where=text("status = 'active'"), sqlite_where=text("status = 'active'")),
+        Index("ix_product_subcategory_id", "subcategory_id",
+              postgresql_where=text("status = 'active'"), sqlite_where=text("status = 'active'")),
+        Index("ix_product_brand_id", "brand_id",
+              postgresql_where=text("status = 'active'"), sqlite_where=text("status = 'active'")),
+        Index("ix_product_color_id", "color_id",
+              postgresql_where=text("status = 'active'"), sqlite_where=text("status = 'active'")),
+        # Orden y filtros de precio del catálogo (precio con descuento)
+        Index("ix_product_effective_price", "effective_price_cents",
+              postgresql_where=text("status = 'active'"), sqlite_where=text("status = 'active'")),
+        # Sincronización incremental del panel del vendedor (?updated_since=): todos sus productos
+        Index("ix_product_seller_updated_at", "seller_id", "updated_at"),
+        # Refresco incremental de los índices en memoria (api/catalog_index.py, api/suggest.py)
+        Index("ix_product_updated_at", "updated_at"),
+    )
+
+    # Disponibilidad. active: en el catálogo; reserved: el vendedor aceptó una oferta;
+    # sold: vendido (POST /api/checkout); archived: retirado por el vendedor
+    STATUSES = ("active", "reserved", "sold", "archived")
+    # Cambios que puede hacer el vendedor a mano (PUT /api/products/<id>); el resto los hacen ofertas y ventas.
+    # reserved -> active cancela la reserva: la oferta aceptada pasa a rechazada (api/offer_expiry.py)
+    SELLER_TRANSITIONS = {"active": ("archived",), "archived": ("active",), "reserved": ("active",)}
+
+    # Campos que se pueden pedir con ?fields= en el catálogo; "image" es la primera imagen
+    PROJECTABLE_FIELDS = ("id", "title", "description", "category", "subcategory", "size", "brand",
+                          "condition", "material", "color", "price", "discount", "effective_price",
+                          "seller_id", "status",
+                          "offer_count", "pending_offer_count", "created_at", "updated_at", "image")
+    # Lo que pinta una tarjeta del catálogo (?view=card)
+    CARD_FIELDS = ("id", "title", "price", "discount", "effective_price", "size", "brand", "image")
+
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(200), nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=False)
-    category: Mapped[str] = mapped_column(String(50), nullable=False)
-    subcategory: Mapped[str] = mapped_column(String(50), nullable=True)
+    gender_id: Mapped[int] = mapped_column(ForeignKey("category.id"), nullable=False)
+    category_id: Mapped[int] = mapped_column(ForeignKey("category.id"), nullable=False)
+    subcategory_id: Mapped[int] = mapped_column(ForeignKey("category.id"), nullable=True)
     size: Mapped[str] = mapped_column(String(20), nullable=False)
-    brand: Mapped[str] = mapped_column(String(100), nullable=True)
+    brand_id: Mapped[int] = mapped_column(ForeignKey("brand.id"), nullable=True)
     condition: Mapped[str] = mapped_column(String(50), nullable=False, default="two_wears")
     material: Mapped[str] = mapped_column(String(100), nullable=True)
-    color: Mapped[str] = mapped_column(String(50), nullable=True)
-    price: Mapped[float] = mapped_column(Float, nullable=False)
-    discount: Mapped[float] = mapped_column(Float, nullable=True, default=0)
+    color_id: Mapped[int] = mapped_column(ForeignKey("color.id"), nullable=True)
+    # Dinero en céntimos (api/money.py); discount es un porcentaje entero
+    price_cents: Mapped[int] = mapped_column(nullable=False)
+    discount: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    # Precio con descuento redondeado al céntimo: columna generada, siempre coherente
+    effective_price_cents: Mapped[int] = mapped_column(
+        Computed("price_cents - (price_cents * discount + 50) / 100", persisted=True))
     seller_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
+    # Disponibilidad (STATUSES)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="active", server_default="active")
+    # Contadores desnormalizados (api/stats.py), se reconstruyen con `flask reconcile-stats`
+    offer_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    pending_offer_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relaciones
     seller = relationship("User", back_populates="products")
@@ -87,6 +195,27 @@ class Product(db.Model):
         "ProductImage", back_populates="product", cascade="all, delete-orphan"
     )
 
+    # La API sigue exponiendo slugs; se resuelven con la taxonomía en caché, sin JOIN
+    @property
+    def category(self):
+        from api.taxonomy import get_taxonomy  # import circular: taxonomy importa los modelos
+        return get_taxonomy(self.category_id).slug(self.category_id)
+
+    @property
+    def subcategory(self):
+        from api.taxonomy import get_taxonomy
+        return get_taxonomy(self.subcategory_id).name(self.subcategory_id)
+
+    @property
+    def brand(self):
+        from api.dictionaries import get_dictionary
+        return get_dictionary("brand", self.brand_id).name(self.brand_id)
+
+    @property
+    def color(self):
+        from api.dictionaries import get_dictionary
+        return get_dictionary("color", self.color_id).name(self.color_id)
+
     def serialize(self):
         return {
             "id": self.id,
@@ -99,15 +228,30 @@ class Product(db.Model):
             "condition": self.condition,
             "material": self.material,
             "color": self.color,
-            "price": self.price,
+            "price": from_cents(self.price_cents),
             "discount": self.discount,
+            "effective_price": from_cents(self.effective_price_cents),
             "seller_id": self.seller_id,
+            "status": self.status,
+            "offer_count": self.offer_count,
+            "pending_offer_count": self.pending_offer_count,
             "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "images": [image.serialize() for image in self.images]
         }
 
 
+# Condición de los productos del catálogo. Con el literal en el SQL (no un parámetro)
+# Postgres y SQLite pueden usar los índices parciales WHERE status = 'active'
+PRODUCT_IS_ACTIVE = Product.status == literal_column("'active'")
+
+
 class ProductImage(db.Model):
+    __table_args__ = (
+        # Primera imagen de cada producto (tarjetas del catálogo) e imágenes ordenadas
+        Index("ix_product_image_product_position", "product_id", "position"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
     url: Mapped[str] = mapped_column(Text, nullable=False)
     product_id: Mapped[int] = mapped_column(ForeignKey("product.id"), nullable=False)
@@ -124,12 +268,20 @@ class ProductImage(db.Model):
 
 # Modelo Sale
 class Sale(db.Model):
+    __table_args__ = (
+        Index("ix_sale_seller_updated_at", "seller_id", "updated_at"),
+        # Cada prenda es única: una sola venta por producto, aunque fallen las demás comprobaciones
+        Index("uq_sale_product_id", "product_id", unique=True),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
     product_id: Mapped[int] = mapped_column(ForeignKey("product.id"), nullable=False)
     seller_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
     buyer_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
-    price: Mapped[float] = mapped_column(Float, nullable=False)
-    discount: Mapped[float] = mapped_column(Float, nullable=True, default=0)
+    # Oferta aceptada de la que sale la venta; NULL en una compra directa
+    offer_id: Mapped[int] = mapped_column(ForeignKey("offer.id"), nullable=True)
+    price_cents: Mapped[int] = mapped_column(nullable=False)
+    discount: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
     status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -142,6 +294,7 @@ class Sale(db.Model):
     def serialize(self):
         return {
             "id": self.id,
+            "offer_id": self.offer_id,
             "product": self.product.serialize() if self.product else None,
             "seller": {
                 "id": self.seller.id,
@@ -156,7 +309,7 @@ class Sale(db.Model):
                 "last_name": self.buyer.last_name,
                 "email": self.buyer.email
             } if self.buyer else None,
-            "price": self.price,
+            "price": from_cents(self.price_cents),
             "discount": self.discount,
             "status": self.status,
             "created_at": self.created_at.isoformat(),
@@ -166,6 +319,19 @@ class Sale(db.Model):
 
 # Modelo Offer - Sistema de ofertas entre compradores y vendedores
 class Offer(db.Model):
+    # Un comprador solo puede tener una oferta pendiente por producto (índice único parcial)
+    __table_args__ = (
+        Index(
+            "uq_offer_pending_product_buyer", "product_id", "buyer_id", unique=True,
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+        # Para el job de expiración: pendientes más antiguas que el TTL
+        Index("ix_offer_status_created_at", "status", "created_at"),
+        Index("ix_offer_seller_updated_at", "seller_id", "updated_at"),
+        Index("ix_offer_buyer_updated_at", "buyer_id", "updated_at"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
 
     # Relación con el producto
@@ -177,8 +343,8 @@ class Offer(db.Model):
     # Quién recibe la oferta (vendedor) - redundante pero útil para consultas
     seller_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
 
-    # Monto de la oferta
-    amount: Mapped[float] = mapped_column(Float, nullable=False)
+    # Monto de la oferta en céntimos
+    amount_cents: Mapped[int] = mapped_column(nullable=False)
 
     # Mensaje opcional del comprador al hacer la oferta
     message: Mapped[str] = mapped_column(Text, nullable=True)
@@ -192,6 +358,7 @@ class Offer(db.Model):
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     responded_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)  # Cuando el vendedor respondió
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relaciones
     product = relationship("Product")
@@ -205,7 +372,7 @@ class Offer(db.Model):
             "product": {
                 "id": self.product.id,
                 "title": self.product.title,
-                "price": self.product.price,
+                "price": from_cents(self.product.price_cents),
                 "images": [img.serialize() for img in self.product.images[:1]]
             } if self.product else None,
             "buyer": {
@@ -218,10 +385,120 @@ class Offer(db.Model):
                 "username": self.seller.username,
                 "phone": self.seller.phone or ""  # <-- opcional: añadir aquí phone
             } if self.seller else None,
-            "amount": self.amount,
+            "amount": from_cents(self.amount_cents),
             "message": self.message,
             "status": self.status,
             "seller_response": self.seller_response,
             "created_at": self.created_at.isoformat(),
-            "responded_at": self.responded_at.isoformat() if self.responded_at else None
+            "responded_at": self.responded_at.isoformat() if self.responded_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+# Agregados por vendedor mantenidos en la misma transacción que cada escritura
+# (api/stats.py): el panel y el perfil los leen sin recorrer productos, ofertas ni ventas
+class SellerStats(db.Model):
+    seller_id: Mapped[int] = mapped_column(ForeignKey("user.id"), primary_key=True, autoincrement=False)
+    product_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    pending_offers: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    accepted_offers: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    rejected_offers: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    sales_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    total_earnings_cents: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def serialize(self):
+        return {
+            "product_count": self.product_count,
+            "pending_offers": self.pending_offers,
+            "accepted_offers": self.accepted_offers,
+            "rejected_offers": self.rejected_offers,
+            "sales_count": self.sales_count,
+            "total_earnings": from_cents(self.total_earnings_cents)
+        }
+
+
+# Tombstones: registro de borrados para que la sincronización incremental
+# (?updated_since=) pueda devolver los ids eliminados
+class DeletedRecord(db.Model):
+    __table_args__ = (
+        Index("ix_deleted_record_entity_deleted_at", "entity", "deleted_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    entity: Mapped[str] = mapped_column(String(30), nullable=False)  # "product", "offer"...
+    entity_id: Mapped[int] = mapped_column(nullable=False)
+    seller_id: Mapped[int] = mapped_column(nullable=True)
+    buyer_id: Mapped[int] = mapped_column(nullable=True)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+# Vistas (página de detalle) e impresiones (apariciones en el catálogo) por producto y
+# día, volcadas en lotes desde memoria (api/trending.py). Sin FK: un volcado puede
+# llegar después de que se borre el producto.
+class ProductActivity(db.Model):
+    __table_args__ = (
+        Index("ix_product_activity_day", "day"),
+    )
+
+    product_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    views: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    impressions: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+
+
+# Ranking de tendencias precalculado (?sort=trending del catálogo), se rehace entero
+# cada TRENDING_REFRESH_SECONDS (api/trending.py)
+class TrendingProduct(db.Model):
+    product_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    rank: Mapped[int] = mapped_column(nullable=False, unique=True)
+    score: Mapped[float] = mapped_column(Float, nullable=False)
+    computed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+# Respuestas guardadas por Idempotency-Key (api/idempotency.py): un POST reintentado
+# devuelve la respuesta original. status_code NULL = la primera petición sigue en curso.
+class IdempotencyKey(db.Model):
+    __table_args__ = (
+        Index("ix_idempotency_key_created_at", "created_at"),
+    )
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), primary_key=True, autoincrement=False)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status_code: Mapped[int] = mapped_column(nullable=True)
+    response_body: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+
+# Reglas de caducidad de ofertas pendientes. Sin seller_id ni category es la regla por defecto;
+# la más específica gana (vendedor + categoría > vendedor > categoría > por defecto).
+class OfferExpiryRule(db.Model):
+    id: Mapped[int] = mapped_column(primary_key=True)
+    seller_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=True)
+    category: Mapped[str] = mapped_column(String(50), nullable=True)
+    ttl_hours: Mapped[int] = mapped_column(nullable=True)  # NULL = nunca caducan
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "seller_id": self.seller_id,
+            "category": self.category,
+            "ttl_hours": self.ttl_hours
+        }
+
+
+# Ofertas caducadas: se mueven aquí para que la tabla offer solo tenga filas "calientes"
+class OfferArchive(db.Model):
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    product_id: Mapped[int] = mapped_column(nullable=False, index=True)
+    buyer_id: Mapped[int] = mapped_column(nullable=False, index=True)
+    seller_id: Mapped[int] = mapped_column(nullable=False, index=True)
+    amount_cents: Mapped[int] = mapped_column(nullable=False)
+    message: Mapped[str] = mapped_column(Text, nullable=True)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="expired")
+    seller_response: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    responded_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,40 @@
+# src/api/money.py
+
+"""
+Importes en céntimos enteros.
+
+En la base de datos todo el dinero se guarda como Integer (céntimos): sumas y
+comparaciones exactas en SQL. La API sigue hablando en euros con decimales.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+
+def to_cents(value):
+    """19.99, "19.99" o 20 -> 1999. ValueError si no es un importe válido."""
+    try:
+        amount = Decimal(str(value).strip())
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Invalid amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    try:
+        return int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        # Más dígitos de los que admite el contexto decimal (1e30...)
+        raise ValueError(f"Invalid amount: {value!r}")
+
+
+def from_cents(cents):
+    """1999 -> 19.99 (para serializar a JSON)."""
+    return None if cents is None else cents / 100
+
+
+def parse_discount(value):
+    """Porcentaje de descuento entero entre 0 y 100."""
+    try:
+        discount = int(Decimal(str(value or 0).strip()).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Invalid discount: {value!r}")
+    if not 0 <= discount <= 100:
+        raise ValueError(f"Invalid discount: {value!r}")
+    return discount
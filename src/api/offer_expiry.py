@@ -0,0 +1,203 @@
+# src/api/offer_expiry.py
+
+"""
+Caducidad de ofertas pendientes.
+
+expire_offers() marca como 'expired' las ofertas pendientes más antiguas que su TTL
+y las mueve a la tabla fría offer_archive (dejando tombstones para la
+sincronización incremental), por lotes (DELETE ... RETURNING + INSERT de las
+filas borradas, una transacción por lote) usando el índice (status, created_at).
+
+El TTL sale de OfferExpiryRule (por vendedor y/o categoría) y, si ninguna regla
+aplica, de OFFER_TTL_HOURS. Se ejecuta con `flask expire-offers` (cron) o, si se
+define OFFER_EXPIRY_INTERVAL_MINUTES, en un hilo de fondo de cada worker web.
+
+Reservas: un producto reservado (oferta aceptada) vuelve al catálogo si el
+comprador no paga en RESERVATION_TTL_HOURS (release_stale_reservations, en el
+mismo job) o si el vendedor lo reactiva (PUT /api/products/<id> con status=active).
+En ambos casos cancel_reservations() rechaza la oferta aceptada y ajusta los contadores.
+"""
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, func, insert, not_, or_, select, true, update
+from api.models import db, Category, Offer, OfferArchive, OfferExpiryRule, Product
+from api.events import OFFER_EVENT_COLUMNS, publish_offer_event
+from api.stats import offer_status_changed, product_status_changed
+from api.sync import record_deletions
+from api.utils import serves_requests
+
+OFFER_TTL_HOURS = int(os.getenv("OFFER_TTL_HOURS", 7 * 24))
+OFFER_EXPIRY_INTERVAL_MINUTES = float(os.getenv("OFFER_EXPIRY_INTERVAL_MINUTES", 0))  # 0 = sin hilo
+RESERVATION_TTL_HOURS = float(os.getenv("RESERVATION_TTL_HOURS", 48))  # 0 = las reservas no caducan
+
+logger = logging.getLogger(__name__)
+
+
+def _rule_scope(rule):
+    conditions = []
+    if rule.seller_id is not None:
+        conditions.append(Offer.seller_id == rule.seller_id)
+    if rule.category is not None:
+        conditions.append(Offer.product_id.in_(
+            select(Product.id).join(Category, Category.id == Product.category_id)
+            .where(Category.slug == rule.category)))
+    return and_(*conditions) if conditions else true()
+
+
+def _ordered_rules():
+    rules = OfferExpiryRule.query.all()
+    if not any(rule.seller_id is None and rule.category is None for rule in rules):
+        rules.append(OfferExpiryRule(ttl_hours=OFFER_TTL_HOURS))
+    # Más específica primero; cada regla excluye lo que ya cubren las anteriores
+    return sorted(rules, key=lambda rule: (rule.seller_id is None, rule.category is None))
+
+
+def _archive_batch(ids, now):
+    """
+    Borra las que siguen pendientes y archiva exactamente esas. Una oferta aceptada o
+    rechazada entre el SELECT del lote y aquí no se toca: el DELETE vuelve a comprobar
+    el estado (en Postgres espera al bloqueo de la fila y reevalúa el WHERE) y el
+    archivo, los tombstones y los contadores salen de las filas devueltas (RETURNING).
+    """
+    deleted = db.session.execute(
+        delete(Offer).where(Offer.id.in_(ids), Offer.status == "pending")
+        .returning(Offer.id, Offer.product_id, Offer.buyer_id, Offer.seller_id, Offer.amount_cents,
+                   Offer.message, Offer.seller_response, Offer.created_at)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not deleted:
+        return 0
+
+    db.session.execute(insert(OfferArchive), [
+        {"id": row.id, "product_id": row.product_id, "buyer_id": row.buyer_id, "seller_id": row.seller_id,
+         "amount_cents": row.amount_cents, "message": row.message, "status": "expired",
+         "seller_response": row.seller_response, "created_at": row.created_at,
+         "responded_at": now, "archived_at": now}
+        for row in deleted
+    ])
+    record_deletions("offer", ((row.id, row.seller_id, row.buyer_id) for row in deleted))
+    for (seller_id, product_id), count in Counter((row.seller_id, row.product_id) for row in deleted).items():
+        offer_status_changed(seller_id, product_id, "pending", None, count)
+    return len(deleted)
+
+
+def expire_offers(now=None, batch_size=1000, dry_run=False):
+    """Caduca y archiva las ofertas vencidas. Devuelve cuántas se procesaron por regla."""
+    now = now or datetime.utcnow()
+    summary = []
+    previous_scopes = []
+
+    for rule in _ordered_rules():
+        scope = _rule_scope(rule)
+        if rule.ttl_hours is None:
+            previous_scopes.append(scope)
+            continue
+
+        conditions = (
+            Offer.status == "pending",
+            Offer.created_at < now - timedelta(hours=rule.ttl_hours),
+            scope,
+            not_(or_(*previous_scopes)) if previous_scopes else true(),
+        )
+        previous_scopes.append(scope)
+
+        if dry_run:
+            expired = db.session.scalar(select(func.count(Offer.id)).where(*conditions))
+            summary.append({**rule.serialize(), "expired": expired})
+            continue
+
+        stale = select(Offer.id).where(*conditions).order_by(Offer.created_at).limit(batch_size)
+        expired = 0
+        while True:
+            ids = list(db.session.scalars(stale))
+            if not ids:
+                break
+            expired += _archive_batch(ids, now)
+            db.session.commit()
+            if len(ids) < batch_size:
+                break
+
+        summary.append({**rule.serialize(), "expired": expired})
+    return summary
+
+
+def cancel_reservations(product_ids, now, seller_response):
+    """
+    Devuelve al catálogo los productos que sigan reservados y rechaza su oferta aceptada.
+    Condicional (status = 'reserved'): si una compra gana la carrera el producto no se toca.
+    No hace commit. Devuelve (ids de los productos liberados, ofertas rechazadas con
+    OFFER_EVENT_COLUMNS para publicarlas).
+    """
+    released = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(product_ids), Product.status == "reserved")
+        .values(status="active")
+        .returning(Product.id, Product.category_id, Product.subcategory_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not released:
+        return [], []
+    for product_id, category_id, subcategory_id in released:
+        product_status_changed((category_id, subcategory_id), "reserved", "active")
+
+    offers = db.session.execute(
+        update(Offer)
+        .where(Offer.product_id.in_([row.id for row in released]), Offer.status == "accepted")
+        .values(status="rejected", seller_response=seller_response, responded_at=now)
+        .returning(*OFFER_EVENT_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).all()
+    for offer in offers:
+        offer_status_changed(offer.seller_id, offer.product_id, "accepted", "rejected")
+    return [row.id for row in released], offers
+
+
+def release_stale_reservations(now=None, batch_size=1000):
+    """Libera las reservas sin compra de más de RESERVATION_TTL_HOURS. Devuelve cuántas."""
+    if not RESERVATION_TTL_HOURS:
+        return 0
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(hours=RESERVATION_TTL_HOURS)
+    stale = (
+        select(Offer.product_id)
+        .join(Product, Product.id == Offer.product_id)
+        .where(Product.status == "reserved", Offer.status == "accepted",
+               func.coalesce(Offer.responded_at, Offer.updated_at) < cutoff)
+        .limit(batch_size)
+    )
+    released = 0
+    while True:
+        product_ids = list(db.session.scalars(stale))
+        if not product_ids:
+            break
+        released_ids, offers = cancel_reservations(product_ids, now, "Reserva caducada: no se completó la compra")
+        db.session.commit()
+        for offer in offers:
+            publish_offer_event("offer_rejected", offer)
+        released += len(released_ids)
+        if len(product_ids) < batch_size:
+            break
+    return released
+
+
+def setup_offer_expiry(app):
+    # Solo los procesos que atienden peticiones; en CLI usa `flask expire-offers`
+    if not OFFER_EXPIRY_INTERVAL_MINUTES or not serves_requests():
+        return
+
+    def run():
+        stop = threading.Event()
+        while not stop.wait(OFFER_EXPIRY_INTERVAL_MINUTES * 60):
+            with app.app_context():
+                try:
+                    expire_offers()
+                    release_stale_reservations()
+                except Exception:
+                    # Otro worker pudo archivar el mismo lote: se reintenta en la siguiente vuelta
+                    db.session.rollback()
+                    logger.exception("Offer expiry run failed")
+
+    threading.Thread(target=run, name="offer-expiry", daemon=True).start()
@@ -0,0 +1,194 @@
+# src/api/rate_limit.py
+
+"""
+Limitación de peticiones (token bucket) y control de admisión.
+
+- rate_limit(name): decorador para endpoints caros (login, registro, ofertas...).
+  Cada petición consume un token del bucket de la IP y, si se conoce, del
+  bucket del usuario (identidad del JWT o email enviado en el JSON).
+- Los presupuestos por ruta están en DEFAULT_LIMITS y se pueden sobrescribir con
+  RATE_LIMITS="login=5/60,offers=20/60" (peticiones/segundos).
+- El backend por defecto vive en memoria del proceso; con
+  RATE_LIMIT_STORAGE_URL=redis://... se comparte entre workers.
+- setup_rate_limits(app) añade un limitador global de concurrencia
+  (MAX_CONCURRENT_REQUESTS) que responde 503 antes de que se acumule la cola.
+- Detrás del router de Render o Heroku remote_addr es el balanceador: la IP del
+  cliente sale de X-Forwarded-For (ProxyFix, TRUSTED_PROXY_HOPS proxies de
+  confianza). Si no, todos compartirían un único bucket por IP. Por defecto es 1
+  en esas plataformas (variables RENDER o DYNO) y 0 en el resto; con otro proxy
+  delante (nginx, Cloudflare...) hay que sumarlo.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify, g
+
+DEFAULT_LIMITS = {
+    "login": (10, 60),
+    "register": (5, 300),
+    "password_reset": (5, 900),
+    "offers": (20, 60),
+}
+
+RATE_LIMITS_ENABLED = os.getenv("RATE_LIMITS_ENABLED", "1") == "1"
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", 0))  # 0 = sin límite
+BEHIND_PLATFORM_ROUTER = bool(os.getenv("RENDER") or os.getenv("DYNO"))
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 1 if BEHIND_PLATFORM_ROUTER else 0))
+
+
+def _parse_limits(spec):
+    limits = dict(DEFAULT_LIMITS)
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        name, budget = item.split("=")
+        count, seconds = budget.split("/")
+        limits[name.strip()] = (int(count), float(seconds))
+    return limits
+
+
+LIMITS = _parse_limits(os.getenv("RATE_LIMITS"))
+
+
+class MemoryBackend:
+    """Buckets en memoria del proceso, acotados a max_keys (se descartan los más antiguos)."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_per_second):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * refill_per_second)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        retry_after = 0 if allowed else (1 - tokens) / refill_per_second
+        return allowed, retry_after
+
+
+class RedisBackend:
+    """Buckets compartidos entre workers; la actualización es atómica con un script Lua."""
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'last')
+    local tokens = tonumber(state[1]) or capacity
+    local last = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - last) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'last', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url):
+        import redis  # dependencia opcional, solo si se configura un backend compartido
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def consume(self, key, capacity, refill_per_second):
+        allowed, tokens = self._script(
+            keys=[f"ratelimit:{key}"], args=[capacity, refill_per_second, time.time()]
+        )
+        retry_after = 0 if allowed else (1 - float(tokens)) / refill_per_second
+        return bool(allowed), retry_after
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                url = os.getenv("RATE_LIMIT_STORAGE_URL", "memory://")
+                _backend = MemoryBackend() if url.startswith("memory://") else RedisBackend(url)
+    return _backend
+
+
+def _user_key():
+    # Identidad del JWT si la ruta está protegida; si no, el email que se intenta usar
+    try:
+        from flask_jwt_extended import get_jwt_identity
+        identity = get_jwt_identity()
+    except RuntimeError:
+        identity = None
+    if identity:
+        return f"id:{identity}"
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and data.get("email"):
+        return f"email:{str(data['email']).strip().lower()}"
+    return None
+
+
+def _too_many_requests(retry_after):
+    response = jsonify({"error": "Demasiadas peticiones, inténtalo más tarde"})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+
+def rate_limit(name):
+    """Aplica el presupuesto LIMITS[name] por IP y por usuario."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not RATE_LIMITS_ENABLED:
+                return fn(*args, **kwargs)
+            count, seconds = LIMITS[name]
+            backend = get_backend()
+            keys = [f"{name}:ip:{request.remote_addr}"]
+            user_key = _user_key()
+            if user_key:
+                keys.append(f"{name}:{user_key}")
+            for key in keys:
+                allowed, retry_after = backend.consume(key, count, count / seconds)
+                if not allowed:
+                    return _too_many_requests(retry_after)
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def setup_rate_limits(app):
+    if TRUSTED_PROXY_HOPS:
+        # Detrás de un proxy (Render, Heroku...) la IP real viene en X-Forwarded-For
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
+
+    if not MAX_CONCURRENT_REQUESTS:
+        return
+
+    slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+    @app.before_request
+    def admit_request():
+        if not request.path.startswith("/api/"):
+            return None
+        if not slots.acquire(blocking=False):
+            response = jsonify({"error": "Servidor ocupado, inténtalo de nuevo en unos segundos"})
+            response.status_code = 503
+            response.headers["Retry-After"] = "1"
+            return response
+        g.admission_slot = True
+        return None
+
+    @app.teardown_request
+    def release_request(exc):
+        if g.pop("admission_slot", False):
+            slots.release()
@@ -1,16 +1,29 @@
-from flask import Flask, request, jsonify, url_for, Blueprint
-from api.models import db, User, Product, ProductImage, Sale, Offer
+from flask import Flask, request, jsonify, url_for, Blueprint, Response, current_app
+from api.models import db, User, Product, ProductImage, Sale, Offer, TrendingProduct, PRODUCT_IS_ACTIVE
 from api.utils import generate_sitemap, APIException
 from flask_cors import CORS
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, decode_token
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
 import datetime
+from collections import Counter
 
 from api.cloudinary_service import upload_image, upload_multiple_images, delete_image
-
-import secrets
-
-password_reset_tokens = {}
+from api.rate_limit import rate_limit
+from api.events import (publish_offer_event, stream, acquire_stream_slot, release_stream_slot,
+                        SSE_BUSY_RETRY_SECONDS, OFFER_EVENT_COLUMNS)
+from api.sync import sync_token, get_updated_since, record_deletions, deleted_ids
+from api import stats
+from api.catalog_index import get_catalog_index
+from api.suggest import get_suggest_index, SUGGEST_LIMIT
+from api import batch
+from api.idempotency import idempotent
+from api.offer_expiry import cancel_reservations
+from api.trending import record_view, record_impressions
+from api.money import to_cents, from_cents, parse_discount
+from api.taxonomy import get_taxonomy, get_category_tree, resolve_category
+from api.dictionaries import get_dictionary, resolve_value, facet_names, used_values
+from api.utils_password import generate_reset_token, verify_reset_token, token_matches_user
 
 api = Blueprint('api', __name__)
 CORS(api, supports_credentials=True, origins="*")  # Para pruebas
@@ -26,6 +39,7 @@ def handle_hello():
 
 # Endpoint para registrar vendedores
 @api.route('/register/seller', methods=['POST'])
+@rate_limit("register")
 def register_seller():
     if not request.is_json:
         return jsonify({"error": "Missing JSON in request"}), 400
@@ -92,10 +106,21 @@ def get_seller_products():
     if user.role != "seller":
         return jsonify({"error": "Access denied, user is not a seller"}), 403
 
-    products = Product.query.filter_by(seller_id=user.id).all()
-    return jsonify({
-        "products": [product.serialize() for product in products]
-    }), 200
+    # Con ?updated_since=<sync_token> solo se devuelven los cambios y los ids borrados
+    token = sync_token()
+    since = get_updated_since()
+    query = Product.query.filter_by(seller_id=user.id)
+    if since:
+        query = query.filter(Product.updated_at >= since)
+    products = query.all()
+
+    response = {
+        "products": [product.serialize() for product in products],
+        "sync_token": token
+    }
+    if since:
+        response["deleted_ids"] = deleted_ids("product", since, seller_id=user.id)
+    return jsonify(response), 200
 
 
 # Endpoint para crear un nuevo producto
@@ -120,23 +145,33 @@ def create_product():
         if field not in data or not data[field]:
             return jsonify({"error": f"Missing required field: {field}"}), 400
 
+    try:
+        price_cents = to_cents(data["price"])
+        discount = parse_discount(data.get("discount", 0))
+        gender_id, category_id, subcategory_id = resolve_category(data["category"], data.get("subcategory"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     new_product = Product(
         title=data["title"],
         description=data["description"],
-        category=data["category"],
-        subcategory=data.get("subcategory"),
+        gender_id=gender_id,
+        category_id=category_id,
+        subcategory_id=subcategory_id,
         size=data["size"],
-        brand=data.get("brand"),
+        brand_id=resolve_value("brand", data.get("brand")),
         condition=data["condition"],
         material=data.get("material"),
-        color=data.get("color"),
-        price=float(data["price"]),
-        discount=float(data.get("discount", 0)),
+        color_id=resolve_value("color", data.get("color")),
+        price_cents=price_cents,
+        discount=discount,
         seller_id=user.id
     )
 
     try:
         db.session.add(new_product)
+        stats.product_created(user.id)
+        stats.product_categorized(new_ids=(category_id, subcategory_id))
         db.session.commit()
 
         image_urls = data.get("images", [])
@@ -161,6 +196,7 @@ def create_product():
 
 
 @api.route('/login', methods=['POST'])
+@rate_limit("login")
 def login():
     if not request.is_json:
         return jsonify({"error": "Missing JSON in request"}), 400
@@ -173,6 +209,10 @@ def login():
     if not user or not user.check_password(data["password"]):
         return jsonify({"error": "Invalid email or password"}), 401
 
+    # check_password pudo actualizar el hash a la política actual
+    if db.session.is_modified(user):
+        db.session.commit()
+
     access_token = create_access_token(
         identity=str(user.id),
         expires_delta=datetime.timedelta(hours=24)
@@ -185,6 +225,7 @@ def login():
 
 
 @api.route('/register/buyer', methods=['POST'])
+@rate_limit("register")
 def register_buyer():
     if not request.is_json:
         return jsonify({"error": "Missing JSON in request"}), 400
@@ -237,15 +278,8 @@ def register_buyer():
 
 @api.route('/categories', methods=['GET'])
 def get_categories():
-    categories = [
-        {"id": 1, "name": "Vestidos", "image": "/images/vestidos.jpg"},
-        {"id": 2, "name": "Abrigos", "image": "/images/abrigos.jpg"},
-        {"id": 3, "name": "Deportivo", "image": "/images/deportivo.jpg"},
-        {"id": 4, "name": "Blusas", "image": "/images/blusas.jpg"},
-        {"id": 5, "name": "Pantalones", "image": "/images/pantalones.jpg"},
-        {"id": 6, "name": "Camisas", "image": "/images/camisas.jpg"},
-    ]
-    return jsonify(categories), 200
+    # Árbol género > categoría > subcategoría con el nº de productos de cada nodo
+    return jsonify(get_category_tree()), 200
 
 
 @api.route("/user/profile", methods=["PUT"])
@@ -293,14 +327,21 @@ def get_seller_sales():
     if user.role != "seller":
         return jsonify({"error": "Access denied, user is not a seller"}), 403
 
-    sales = Sale.query.filter_by(seller_id=user.id).order_by(
-        Sale.created_at.desc()).all()
-    total_earnings = sum(sale.price for sale in sales)
+    token = sync_token()
+    since = get_updated_since()
+    query = Sale.query.filter_by(seller_id=user.id)
+    if since:
+        query = query.filter(Sale.updated_at >= since)
+    sales = query.order_by(Sale.created_at.desc()).all()
+
+    # Totales precalculados en seller_stats: no dependen de cuántas ventas se devuelvan
+    seller_stats = stats.get_seller_stats(user.id)
 
     return jsonify({
         "sales": [sale.serialize() for sale in sales],
-        "total_earnings": total_earnings,
-        "total_sales": len(sales)
+        "total_earnings": seller_stats["total_earnings"],
+        "total_sales": seller_stats["sales_count"],
+        "sync_token": token
     }), 200
 
 
@@ -321,6 +362,7 @@ def get_seller_profile():
         "username": user.username,
         "email": user.email,
         "phone": user.phone,
+        "stats": stats.get_seller_stats(user.id),
     }), 200
 
 
@@ -370,7 +412,7 @@ def update_seller_profile():
         user.email = data["email"]
         user.phone = data.get("phone", user.phone)
         if data.get("new_password"):
-            user.password = generate_password_hash(data["new_password"])
+            user.set_password(data["new_password"])
 
         db.session.commit()
 
@@ -385,6 +427,7 @@ def update_seller_profile():
 
 
 @api.route('/request-password-reset', methods=['POST'])
+@rate_limit("password_reset")
 def request_password_reset():
     if not request.is_json:
         return jsonify({"error": "Missing JSON in request"}), 400
@@ -401,12 +444,8 @@ def request_password_reset():
             "message": "Si el correo existe, recibirás un enlace para restablecer tu contraseña"
         }), 200
 
-    token = secrets.token_urlsafe(32)
-    expiration = datetime.datetime.now() + datetime.timedelta(hours=24)
-    password_reset_tokens[token] = {
-        'user_id': user.id,
-        'expiration': expiration
-    }
+    # Token firmado y sin estado: vale en cualquier worker y sobrevive a reinicios
+    token = generate_reset_token(user)
 
     frontend_url = request.headers.get('Origin', 'http://localhost:3000')
     reset_url = f"{frontend_url}/reset-password/{token}"
@@ -419,6 +458,7 @@ def request_password_reset():
 
 
 @api.route('/reset-password', methods=['POST'])
+@rate_limit("password_reset")
 def reset_password():
     if not request.is_json:
         return jsonify({"error": "Missing JSON in request"}), 400
@@ -433,22 +473,21 @@ def reset_password():
     if len(new_password) < 6:
         return jsonify({"error": "New password must be at least 6 characters long"}), 400
 
-    token_data = password_reset_tokens.get(token)
+    token_data = verify_reset_token(token)
     if not token_data:
         return jsonify({"error": "Invalid or expired token"}), 400
 
-    if datetime.datetime.now() > token_data['expiration']:
-        password_reset_tokens.pop(token, None)
-        return jsonify({"error": "Token has expired"}), 400
-
-    user = User.query.get(token_data['user_id'])
+    user = User.query.get(token_data['uid'])
     if not user:
         return jsonify({"error": "User not found"}), 404
 
+    # El token ya se usó si la contraseña cambió después de emitirlo
+    if not token_matches_user(token_data, user):
+        return jsonify({"error": "Invalid or expired token"}), 400
+
     try:
-        user.password = generate_password_hash(new_password)
+        user.set_password(new_password)
         db.session.commit()
-        password_reset_tokens.pop(token, None)
 
         return jsonify({"message": "Password reset successfully"}), 200
     except Exception as e:
@@ -456,18 +495,122 @@ def reset_password():
         return jsonify({"error": str(e)}), 500
 
 
+def _catalog_projection():
+    """Campos pedidos con ?fields=a,b o ?view=card; None = Product.serialize() completo."""
+    fields = request.args.get('fields', '')
+    if fields:
+        requested = [field.strip() for field in fields.split(',') if field.strip()]
+    elif request.args.get('view') == 'card':
+        requested = Product.CARD_FIELDS
+    else:
+        return None
+
+    unknown = sorted(set(requested) - set(Product.PROJECTABLE_FIELDS))
+    if unknown:
+        raise APIException(f"Unknown fields: {', '.join(unknown)}", status_code=400)
+    return list(dict.fromkeys(["id", *requested]))
+
+
+def _first_image_urls(product_ids):
+    """Primera imagen (menor position) de cada producto en una sola query con row_number()."""
+    ranked = db.select(
+        ProductImage.product_id,
+        ProductImage.url,
+        db.func.row_number().over(
+            partition_by=ProductImage.product_id,
+            order_by=(ProductImage.position, ProductImage.id)
+        ).label("rank")
+    ).where(ProductImage.product_id.in_(product_ids)).subquery()
+    return dict(db.session.execute(
+        db.select(ranked.c.product_id, ranked.c.url).where(ranked.c.rank == 1)
+    ).all())
+
+
+# Máximo de productos por petición en /products/batch
+MAX_BATCH_IDS = 50
+
+# Campos de la API en euros -> columna en céntimos
+MONEY_FIELDS = {"price": "price_cents", "effective_price": "effective_price_cents"}
+# Campos guardados como id: se proyecta el id y se traduce con la taxonomía o el diccionario en caché
+LOOKUP_FIELDS = {
+    "category": ("category_id", lambda value_id: get_taxonomy(value_id).slug(value_id)),
+    "subcategory": ("subcategory_id", lambda value_id: get_taxonomy(value_id).name(value_id)),
+    "brand": ("brand_id", lambda value_id: get_dictionary("brand", value_id).name(value_id)),
+    "color": ("color_id", lambda value_id: get_dictionary("color", value_id).name(value_id)),
+}
+
+
+def _projection_column(field):
+    if field in MONEY_FIELDS:
+        return getattr(Product, MONEY_FIELDS[field]).label(field)
+    if field in LOOKUP_FIELDS:
+        return getattr(Product, LOOKUP_FIELDS[field][0]).label(field)
+    return getattr(Product, field)
+
+
+def _project_rows(rows, fields):
+    products = []
+    for row in rows:
+        product = {field: getattr(row, field) for field in fields if field != "image"}
+        for field in MONEY_FIELDS:
+            if field in product:
+                product[field] = from_cents(product[field])
+        for field, (_, lookup) in LOOKUP_FIELDS.items():
+            if field in product:
+                product[field] = lookup(product[field])
+        for field in ("created_at", "updated_at"):
+            if product.get(field) is not None:
+                product[field] = product[field].isoformat()
+        products.append(product)
+    if "image" in fields:
+        images = _first_image_urls([product["id"] for product in products]) if products else {}
+        for product in products:
+            product["image"] = images.get(product["id"])
+    return products
+
+
+@api.route('/search/suggest', methods=['GET'])
+def search_suggest():
+    """Autocompletado: títulos, marcas y categorías por popularidad, desde memoria (api/suggest.py)."""
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', SUGGEST_LIMIT, type=int)
+    index = get_suggest_index()
+    response = jsonify({"query": query, "suggestions": index.suggest(query, limit) if index else []})
+    # Las mismas letras se repiten mucho: un poco de caché en navegador/CDN ahorra peticiones
+    response.cache_control.public = True
+    response.cache_control.max_age = 30
+    return response, 200
+
+
+def _price_arg(name):
+    """?min_price= / ?max_price= en céntimos; 400 si no es un importe finito (nan, inf, texto...)."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        cents = to_cents(value)
+    except ValueError:
+        raise APIException(f"Invalid {name}: expected a number", status_code=400)
+    # Fuera de un entero de 64 bits la base de datos no puede comparar
+    if abs(cents) >= 2 ** 63:
+        raise APIException(f"Invalid {name}: out of range", status_code=400)
+    return cents
+
+
 @api.route('/products/catalog', methods=['GET'])
 def get_products_catalog():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 12, type=int)
     if per_page > 50:
         per_page = 50
+    elif per_page < 1:
+        per_page = 12
 
     gender = request.args.get('gender', '').lower()
     category = request.args.get('category', '').lower()
     subcategory = request.args.get('subcategory', '').lower()
-    min_price = request.args.get('min_price', type=float)
-    max_price = request.args.get('max_price', type=float)
+    min_price_cents = _price_arg('min_price')
+    max_price_cents = _price_arg('max_price')
     size = request.args.get('size', '')
     condition = request.args.get('condition', '')
     brand = request.args.get('brand', '')
@@ -475,34 +618,28 @@ def get_products_catalog():
     search = request.args.get('search', '')
     sort = request.args.get('sort', 'newest')
 
-    query = Product.query
-
-    if gender:
-        if gender == 'hombre':
-            query = query.filter(Product.category.like('hombre_%'))
-        elif gender == 'mujer':
-            query = query.filter(Product.category.like('mujer_%'))
-        elif gender == 'unisex':
-            query = query.filter(Product.category.like('unisex_%'))
-
-    if category:
-        if '_' not in category:
-            query = query.filter(
-                db.or_(
-                    Product.category.like(f'%_{category}'),
-                    Product.category.ilike(f'%{category}%')
-                )
-            )
-        else:
-            query = query.filter(Product.category == category)
+    # Solo productos activos: las consultas usan los índices parciales del catálogo
+    query = Product.query.filter(PRODUCT_IS_ACTIVE)
+
+    # La taxonomía (en memoria) traduce los filtros a ids: igualdades enteras indexadas
+    taxonomy = get_taxonomy()
+    gender_id = taxonomy.gender_id(gender) if gender else None
+    if gender_id is not None:
+        query = query.filter(Product.gender_id == gender_id)
+
+    category_ids = taxonomy.category_ids(category) if category else None
+    if category_ids is not None:
+        query = query.filter(Product.category_id.in_(category_ids))
 
-    if subcategory:
-        query = query.filter(Product.subcategory.ilike(f'%{subcategory}%'))
+    subcategory_ids = taxonomy.subcategory_ids(subcategory) if subcategory else None
+    if subcategory_ids is not None:
+        query = query.filter(Product.subcategory_id.in_(subcategory_ids))
 
-    if min_price is not None:
-        query = query.filter(Product.price >= min_price)
-    if max_price is not None:
-        query = query.filter(Product.price <= max_price)
+    # Precio final (con descuento) en céntimos: filtro y orden por índice
+    if min_price_cents is not None:
+        query = query.filter(Product.effective_price_cents >= min_price_cents)
+    if max_price_cents is not None:
+        query = query.filter(Product.effective_price_cents <= max_price_cents)
 
     if size:
         query = query.filter(Product.size == size)
@@ -510,11 +647,14 @@ def get_products_catalog():
     if condition:
         query = query.filter(Product.condition == condition)
 
-    if brand:
-        query = query.filter(Product.brand.ilike(f'%{brand}%'))
+    # Marca y color: id canónico por clave/alias exactos o coincidencia aproximada (api/dictionaries.py)
+    brand_ids = get_dictionary("brand").match(brand) if brand else None
+    if brand_ids is not None:
+        query = query.filter(Product.brand_id.in_(brand_ids))
 
-    if color:
-        query = query.filter(Product.color.ilike(f'%{color}%'))
+    color_ids = get_dictionary("color").match(color) if color else None
+    if color_ids is not None:
+        query = query.filter(Product.color_id.in_(color_ids))
 
     if search:
         search_term = f'%{search}%'
@@ -522,53 +662,90 @@ def get_products_catalog():
             db.or_(
                 Product.title.ilike(search_term),
                 Product.description.ilike(search_term),
-                Product.brand.ilike(search_term)
+                # Subcadena de la marca, como en el título: la coincidencia aproximada es solo para ?brand=
+                Product.brand_id.in_(get_dictionary("brand").containing(search))
             )
         )
 
     if sort == 'price_asc':
-        query = query.order_by(Product.price.asc())
+        query = query.order_by(Product.effective_price_cents.asc())
     elif sort == 'price_desc':
-        query = query.order_by(Product.price.desc())
+        query = query.order_by(Product.effective_price_cents.desc())
+    elif sort == 'trending':
+        # Ranking precalculado (api/trending.py); lo que no está en él, detrás por fecha
+        query = query.outerjoin(TrendingProduct, TrendingProduct.product_id == Product.id).order_by(
+            TrendingProduct.rank.is_(None), TrendingProduct.rank, Product.created_at.desc())
     elif sort == 'newest':
         query = query.order_by(Product.created_at.desc())
     else:
         query = query.order_by(Product.created_at.desc())
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    products = [product.serialize() for product in pagination.items]
+    # Proyección: solo las columnas pedidas, sin cargar imágenes ni descripción
+    fields = _catalog_projection()
+    if fields:
+        query = query.with_entities(*[_projection_column(field) for field in fields if field != "image"])
+
+    # Con el índice en memoria (CATALOG_INDEX=1) filtrar, ordenar y contar no toca la base de datos
+    catalog_index = get_catalog_index()
+    page = max(page, 1)
+    hit = catalog_index.search(
+        gender_id=gender_id, category_ids=category_ids, subcategory_ids=subcategory_ids,
+        min_price_cents=min_price_cents, max_price_cents=max_price_cents,
+        size=size, condition=condition, brand_ids=brand_ids, color_ids=color_ids, search=search, sort=sort,
+        page=page, per_page=per_page
+    ) if catalog_index else None
+
+    if hit is None:
+        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        items, total = pagination.items, pagination.total
+    else:
+        page_ids, total = hit
+        # Se mantienen los filtros: si el índice va unos segundos por detrás, no se cuela nada que no cumpla
+        items = query.filter(Product.id.in_(page_ids)).order_by(None).all() if page_ids else []
+        position = {product_id: i for i, product_id in enumerate(page_ids)}
+        items.sort(key=lambda item: position[item.id])
+    pages = -(-total // per_page) if per_page else 0
+
+    if fields:
+        products = _project_rows(items, fields)
+    else:
+        products = [product.serialize() for product in items]
+    # Impresiones para la tendencia: en memoria, se vuelcan por lotes
+    record_impressions([product["id"] for product in products])
 
-    available_filters = {
-        "sizes": db.session.query(Product.size).distinct().all(),
-        "brands": db.session.query(Product.brand).filter(Product.brand.isnot(None)).distinct().all(),
-        "colors": db.session.query(Product.color).filter(Product.color.isnot(None)).distinct().all(),
-        "conditions": db.session.query(Product.condition).distinct().all(),
-    }
+    if catalog_index:
+        available_filters = catalog_index.facets()
+    else:
+        available_filters = {
+            "sizes": db.session.query(Product.size).filter(PRODUCT_IS_ACTIVE).distinct().all(),
+            "conditions": db.session.query(Product.condition).filter(PRODUCT_IS_ACTIVE).distinct().all(),
+        }
 
-    available_filters = {
-        "sizes": [size[0] for size in available_filters["sizes"] if size[0]],
-        "brands": [brand[0] for brand in available_filters["brands"] if brand[0]],
-        "colors": [color[0] for color in available_filters["colors"] if color[0]],
-        "conditions": [condition[0] for condition in available_filters["conditions"] if condition[0]],
-    }
+        available_filters = {
+            "sizes": [size[0] for size in available_filters["sizes"] if size[0]],
+            # Ids distintos (índice) traducidos con el diccionario: una entrada por valor canónico
+            "brands": facet_names("brand", used_values("brand")),
+            "colors": facet_names("color", used_values("color")),
+            "conditions": [condition[0] for condition in available_filters["conditions"] if condition[0]],
+        }
 
     return jsonify({
         "products": products,
         "pagination": {
             "page": page,
             "per_page": per_page,
-            "total": pagination.total,
-            "pages": pagination.pages,
-            "has_prev": pagination.has_prev,
-            "has_next": pagination.has_next
+            "total": total,
+            "pages": pages,
+            "has_prev": page > 1,
+            "has_next": page < pages
         },
         "available_filters": available_filters,
         "applied_filters": {
             "gender": gender,
             "category": category,
             "subcategory": subcategory,
-            "min_price": min_price,
-            "max_price": max_price,
+            "min_price": from_cents(min_price_cents),
+            "max_price": from_cents(max_price_cents),
             "size": size,
             "condition": condition,
             "brand": brand,
@@ -597,7 +774,20 @@ def delete_product(product_id):
     if product.seller_id != user.id:
         return jsonify({"error": "Access denied, this product belongs to another seller"}), 403
 
+    # La venta sigue apuntando al producto
+    if product.status == 'sold':
+        return jsonify({"error": "Cannot delete a sold product"}), 400
+
     try:
+        offers = db.session.execute(
+            db.select(Offer.id, Offer.seller_id, Offer.buyer_id, Offer.status).where(Offer.product_id == product_id)
+        ).all()
+        # Tombstones para la sincronización incremental de las listas
+        record_deletions("offer", [(offer.id, offer.seller_id, offer.buyer_id) for offer in offers])
+        record_deletions("product", [(product.id, product.seller_id, None)])
+        stats.product_deleted(product.seller_id, Counter(offer.status for offer in offers))
+        stats.product_status_changed((product.category_id, product.subcategory_id), product.status, None)
+
         # IMPORTANTE: Primero eliminar las ofertas asociadas
         Offer.query.filter_by(product_id=product_id).delete()
 
@@ -631,31 +821,70 @@ def update_product(product_id):
         return jsonify({"error": "Missing JSON in request"}), 400
 
     data = request.get_json()
+    # Disponibilidad: el vendedor archiva, reactiva o cancela una reserva; reservar y vender van por
+    # ofertas y checkout
+    status = data.get("status", product.status)
+    if status != product.status and status not in Product.SELLER_TRANSITIONS.get(product.status, ()):
+        return jsonify({"error": f"Cannot change status from {product.status} to {status}"}), 400
+
+    try:
+        price_cents = to_cents(data["price"]) if "price" in data else None
+        discount = parse_discount(data["discount"]) if "discount" in data else None
+        taxonomy_ids = resolve_category(
+            data.get("category", product.category),
+            data["subcategory"] if "subcategory" in data else product.subcategory
+        ) if "category" in data or "subcategory" in data else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         if "title" in data:
             product.title = data["title"]
         if "description" in data:
             product.description = data["description"]
-        if "category" in data:
-            product.category = data["category"]
-        if "subcategory" in data:
-            product.subcategory = data["subcategory"]
+        cancelled_offers = []
+        if product.status == "reserved" and status == "active":
+            # Cancela la reserva: la oferta aceptada pasa a rechazada (una compra simultánea gana)
+            released_ids, cancelled_offers = cancel_reservations(
+                [product.id], datetime.datetime.utcnow(), data.get("message", "El vendedor canceló la reserva"))
+            if not released_ids:
+                db.session.rollback()
+                return jsonify({"error": "Product status changed, reload and try again"}), 409
+        elif status != product.status:
+            # Condicional: una compra o una aceptación simultánea gana y esto no la pisa
+            changed = db.session.execute(
+                db.update(Product)
+                .where(Product.id == product.id, Product.status == product.status)
+                .values(status=status)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not changed:
+                db.session.rollback()
+                return jsonify({"error": "Product status changed, reload and try again"}), 409
+            stats.product_status_changed((product.category_id, product.subcategory_id), product.status, status)
+        if taxonomy_ids is not None:
+            if status == "active":
+                stats.product_categorized(old_ids=(product.category_id, product.subcategory_id),
+                                          new_ids=taxonomy_ids[1:])
+            product.gender_id, product.category_id, product.subcategory_id = taxonomy_ids
         if "size" in data:
             product.size = data["size"]
         if "brand" in data:
-            product.brand = data["brand"]
+            product.brand_id = resolve_value("brand", data["brand"])
         if "condition" in data:
             product.condition = data["condition"]
         if "material" in data:
             product.material = data["material"]
         if "color" in data:
-            product.color = data["color"]
-        if "price" in data:
-            product.price = float(data["price"])
-        if "discount" in data:
-            product.discount = float(data["discount"])
+            product.color_id = resolve_value("color", data["color"])
+        if price_cents is not None:
+            product.price_cents = price_cents
+        if discount is not None:
+            product.discount = discount
 
         if "images" in data:
+            # Cambiar solo las imágenes no modifica la fila del producto
+            product.updated_at = datetime.datetime.utcnow()
             ProductImage.query.filter_by(product_id=product.id).delete()
             for index, url in enumerate(data["images"]):
                 image = ProductImage(
@@ -666,6 +895,8 @@ def update_product(product_id):
                 db.session.add(image)
 
         db.session.commit()
+        for offer in cancelled_offers:
+            publish_offer_event("offer_rejected", offer)
         return jsonify({
             "message": "Product updated successfully",
             "product": product.serialize()
@@ -693,6 +924,69 @@ def get_product(product_id):
     return jsonify(product.serialize()), 200
 
 
+def _seller_summary(seller):
+    return {
+        'id': seller.id,
+        'username': seller.username,
+        'first_name': seller.first_name,
+        'city': seller.city or 'No especificada'
+    }
+
+
+def _batch_ids():
+    """?ids=3,1,2 (o ?ids=3&ids=1): enteros sin repetir, en el orden pedido."""
+    try:
+        ids = [int(value) for raw in request.args.getlist('ids') for value in raw.split(',') if value.strip()]
+    except ValueError:
+        raise APIException("ids must be a comma-separated list of integers", status_code=400)
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise APIException("Missing ids", status_code=400)
+    if len(ids) > MAX_BATCH_IDS:
+        raise APIException(f"At most {MAX_BATCH_IDS} ids per request", status_code=400)
+    return ids
+
+
+@api.route('/products/batch', methods=['GET'])
+def get_products_batch():
+    """
+    Varios productos por id (listas de ofertas, carrito, vistos recientemente) con
+    sus imágenes y un resumen del vendedor. Dos queries sean cuantos sean los ids:
+    productos con su vendedor (JOIN) e imágenes de todos ellos.
+    """
+    ids = _batch_ids()
+    products = {
+        product.id: product for product in db.session.scalars(
+            db.select(Product).options(db.joinedload(Product.seller)).where(Product.id.in_(ids)))
+    }
+
+    images = {product_id: [] for product_id in products}
+    if products:
+        for image in db.session.scalars(
+                db.select(ProductImage).where(ProductImage.product_id.in_(products))
+                .order_by(ProductImage.product_id, ProductImage.position, ProductImage.id)):
+            images[image.product_id].append(image)
+    for product_id, product in products.items():
+        # Sin lazy load por producto al serializar
+        set_committed_value(product, 'images', images[product_id])
+
+    found = []
+    for product_id in ids:
+        if product_id in products:
+            product_data = products[product_id].serialize()
+            product_data['seller'] = _seller_summary(products[product_id].seller)
+            found.append(product_data)
+
+    response = jsonify({
+        "products": found,
+        "missing": [product_id for product_id in ids if product_id not in products]
+    })
+    # Revalidación con ETag: si nada cambió, 304 sin cuerpo (débil: la compresión cambia los bytes)
+    response.add_etag(weak=True)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
 @api.route('/products/<int:product_id>/details', methods=['GET'])
 def get_product_details(product_id):
     """
@@ -708,6 +1002,7 @@ def get_product_details(product_id):
     if not product:
         return jsonify({"error": "Producto no encontrado"}), 404
 
+    record_view(product.id)
     product_data = product.serialize()
     product_data['seller'] = {
         'id': product.seller.id,
@@ -719,15 +1014,17 @@ def get_product_details(product_id):
 
     other_products = Product.query.filter(
         Product.seller_id == product.seller_id,
-        Product.id != product_id
+        Product.id != product_id,
+        PRODUCT_IS_ACTIVE
     ).limit(4).all()
 
     product_data['seller_other_products'] = [p.serialize()
                                              for p in other_products]
 
     similar_products = Product.query.filter(
-        Product.category == product.category,
-        Product.id != product_id
+        Product.category_id == product.category_id,
+        Product.id != product_id,
+        PRODUCT_IS_ACTIVE
     ).limit(4).all()
 
     product_data['similar_products'] = [p.serialize()
@@ -770,6 +1067,7 @@ def upload_single_image():
 
 @api.route('/products/<int:product_id>/offers', methods=['POST'])
 @jwt_required()
+@rate_limit("offers")
 def create_offer(product_id):
     """
     Permite a un comprador hacer una oferta en un producto.
@@ -793,50 +1091,50 @@ def create_offer(product_id):
     if not product:
         return jsonify({"error": "Producto no encontrado"}), 404
 
+    if product.status != 'active':
+        return jsonify({"error": "Este producto ya no está disponible"}), 400
+
     try:
-        amount = float(data['amount'])
+        amount_cents = to_cents(data['amount'])
     except ValueError:
         return jsonify({"error": "El monto debe ser un número válido"}), 400
 
-    if amount <= 0:
+    if amount_cents <= 0:
         return jsonify({"error": "El monto debe ser mayor a 0"}), 400
 
-    if amount > product.price:
+    if amount_cents > product.price_cents:
         return jsonify({"error": "La oferta no puede ser mayor al precio del producto"}), 400
 
-    if amount < (product.price * 0.5):
+    if amount_cents * 2 < product.price_cents:
         return jsonify({
             "warning": "Tu oferta es muy baja, es poco probable que sea aceptada",
-            "suggested_min": product.price * 0.7
+            "suggested_min": from_cents(round(product.price_cents * 0.7))
         }), 400
 
-    existing_offer = Offer.query.filter_by(
-        product_id=product_id,
-        buyer_id=user.id,
-        status='pending'
-    ).first()
-
-    if existing_offer:
-        return jsonify({"error": "Ya tienes una oferta pendiente en este producto"}), 400
-
     new_offer = Offer(
         product_id=product_id,
         buyer_id=user.id,
         seller_id=product.seller_id,
-        amount=amount,
+        amount_cents=amount_cents,
         message=data.get('message', ''),
         status='pending'
     )
 
     try:
         db.session.add(new_offer)
+        stats.offer_status_changed(product.seller_id, product.id, None, 'pending')
         db.session.commit()
+        publish_offer_event("offer_created", new_offer)
 
         return jsonify({
             "message": "Oferta enviada exitosamente",
             "offer": new_offer.serialize()
         }), 201
 
+    except IntegrityError:
+        # El índice único parcial (product_id, buyer_id) WHERE status='pending' evita duplicados
+        db.session.rollback()
+        return jsonify({"error": "Ya tienes una oferta pendiente en este producto"}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -852,9 +1150,15 @@ def get_seller_offers():
 
     status = request.args.get('status', '')
     sort = request.args.get('sort', 'newest')
+    token = sync_token()
+    since = get_updated_since()
 
     query = Offer.query.filter_by(seller_id=user.id)
-    if status:
+    if since:
+        # En modo incremental no filtramos por estado: una oferta que deja de estar
+        # pendiente también es un cambio que el cliente debe ver
+        query = query.filter(Offer.updated_at >= since)
+    elif status:
         query = query.filter_by(status=status)
 
     if sort == 'newest':
@@ -862,32 +1166,37 @@ def get_seller_offers():
     elif sort == 'oldest':
         query = query.order_by(Offer.created_at.asc())
     elif sort == 'amount_high':
-        query = query.order_by(Offer.amount.desc())
+        query = query.order_by(Offer.amount_cents.desc())
     elif sort == 'amount_low':
-        query = query.order_by(Offer.amount.asc())
+        query = query.order_by(Offer.amount_cents.asc())
 
     offers = query.all()
-    pending_count = Offer.query.filter_by(
-        seller_id=user.id, status='pending').count()
-    accepted_count = Offer.query.filter_by(
-        seller_id=user.id, status='accepted').count()
-    rejected_count = Offer.query.filter_by(
-        seller_id=user.id, status='rejected').count()
+    seller_stats = stats.get_seller_stats(user.id)
 
-    return jsonify({
+    response = {
         "offers": [offer.serialize() for offer in offers],
         "stats": {
-            "pending": pending_count,
-            "accepted": accepted_count,
-            "rejected": rejected_count,
+            "pending": seller_stats["pending_offers"],
+            "accepted": seller_stats["accepted_offers"],
+            "rejected": seller_stats["rejected_offers"],
             "total": len(offers)
-        }
-    }), 200
+        },
+        "sync_token": token
+    }
+    if since:
+        response["deleted_ids"] = deleted_ids("offer", since, seller_id=user.id)
+    return jsonify(response), 200
 
 
 @api.route('/offers/<int:offer_id>/accept', methods=['PUT'])
 @jwt_required()
 def accept_offer(offer_id):
+    """
+    Acepta una oferta de forma atómica: en una sola transacción bloquea el producto
+    (SELECT ... FOR UPDATE), acepta la oferta solo si sigue pendiente, reserva el
+    producto solo si sigue activo y rechaza el resto de ofertas con un único UPDATE.
+    Dos aceptaciones simultáneas nunca pueden ganar a la vez.
+    """
     user_id = get_jwt_identity()
 
     offer = Offer.query.get(offer_id)
@@ -900,25 +1209,56 @@ def accept_offer(offer_id):
     if offer.status != 'pending':
         return jsonify({"error": "Esta oferta ya fue procesada"}), 400
 
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
+    product_id = offer.product_id
+    now = datetime.datetime.utcnow()
 
     try:
-        offer.status = 'accepted'
-        offer.seller_response = data.get('message', 'Oferta aceptada')
-        offer.responded_at = datetime.datetime.utcnow()
-
-        other_offers = Offer.query.filter(
-            Offer.product_id == offer.product_id,
-            Offer.id != offer_id,
-            Offer.status == 'pending'
+        # En Postgres serializa las aceptaciones del mismo producto (SQLite ya serializa escrituras)
+        category_ids = db.session.execute(
+            db.select(Product.category_id, Product.subcategory_id).where(Product.id == product_id).with_for_update()
+        ).one_or_none()
+        if category_ids is None:
+            # El producto se borró mientras tanto
+            db.session.rollback()
+            return jsonify({"error": "Producto no encontrado"}), 404
+
+        accepted = db.session.execute(
+            db.update(Offer)
+            .where(Offer.id == offer_id, Offer.status == 'pending')
+            .values(status='accepted', seller_response=data.get('message', 'Oferta aceptada'), responded_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not accepted:
+            db.session.rollback()
+            return jsonify({"error": "Esta oferta ya fue procesada"}), 400
+
+        reserved = db.session.execute(
+            db.update(Product)
+            .where(Product.id == product_id, Product.status == 'active')
+            .values(status='reserved')
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not reserved:
+            db.session.rollback()
+            return jsonify({"error": "Este producto ya no está disponible"}), 400
+        stats.product_status_changed(tuple(category_ids), 'active', 'reserved')
+
+        # RETURNING: los eventos salen de estas filas, sin cargar ni releer cada oferta
+        siblings = db.session.execute(
+            db.update(Offer)
+            .where(Offer.product_id == product_id, Offer.id != offer_id, Offer.status == 'pending')
+            .values(status='rejected', seller_response='Otra oferta fue aceptada', responded_at=now)
+            .returning(*OFFER_EVENT_COLUMNS)
+            .execution_options(synchronize_session=False)
         ).all()
-
-        for other in other_offers:
-            other.status = 'rejected'
-            other.seller_response = 'Otra oferta fue aceptada'
-            other.responded_at = datetime.datetime.utcnow()
+        stats.offer_status_changed(offer.seller_id, product_id, 'pending', 'accepted')
+        stats.offer_status_changed(offer.seller_id, product_id, 'pending', 'rejected', len(siblings))
 
         db.session.commit()
+        publish_offer_event("offer_accepted", offer)
+        for other in siblings:
+            publish_offer_event("offer_rejected", other)
 
         return jsonify({
             "message": "Oferta aceptada exitosamente",
@@ -945,14 +1285,24 @@ def reject_offer(offer_id):
     if offer.status != 'pending':
         return jsonify({"error": "Esta oferta ya fue procesada"}), 400
 
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
 
     try:
-        offer.status = 'rejected'
-        offer.seller_response = data.get('message', 'Oferta rechazada')
-        offer.responded_at = datetime.datetime.utcnow()
-
+        # Solo si sigue pendiente: no pisar una aceptación concurrente
+        rejected = db.session.execute(
+            db.update(Offer)
+            .where(Offer.id == offer_id, Offer.status == 'pending')
+            .values(status='rejected', seller_response=data.get('message', 'Oferta rechazada'),
+                    responded_at=datetime.datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not rejected:
+            db.session.rollback()
+            return jsonify({"error": "Esta oferta ya fue procesada"}), 400
+
+        stats.offer_status_changed(offer.seller_id, offer.product_id, 'pending', 'rejected')
         db.session.commit()
+        publish_offer_event("offer_rejected", offer)
 
         return jsonify({
             "message": "Oferta rechazada",
@@ -964,6 +1314,114 @@ def reject_offer(offer_id):
         return jsonify({"error": str(e)}), 500
 
 
+def _id_field(data, name):
+    """Id entero del cuerpo JSON (1 o "1"); 400 si no lo es, None si no viene."""
+    value = data.get(name)
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).strip().isdigit():
+        raise APIException(f"Invalid {name}: expected an integer id", status_code=400)
+    value = int(value)
+    # Fuera de un entero de 64 bits la base de datos no puede comparar
+    if value >= 2 ** 63:
+        raise APIException(f"Invalid {name}: out of range", status_code=400)
+    return value
+
+
+@api.route('/checkout', methods=['POST'])
+@jwt_required()
+@idempotent
+def checkout():
+    """
+    Compra un producto: {"product_id": X} al precio con descuento o {"offer_id": Y}
+    por una oferta aceptada del comprador. En una transacción bloquea el producto,
+    lo marca vendido solo si sigue disponible (activo, o reservado por la oferta),
+    rechaza las ofertas pendientes que queden y crea la Sale. Con Idempotency-Key
+    un reintento devuelve la misma respuesta sin volver a comprar.
+    """
+    user = User.query.get(int(get_jwt_identity()))
+    if not user:
+        return jsonify({"error": "Usuario no encontrado"}), 404
+
+    if user.role != "buyer":
+        return jsonify({"error": "Solo los compradores pueden comprar"}), 403
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        raise APIException("Expected a JSON object", status_code=400)
+    offer_id = _id_field(data, 'offer_id')
+    product_id = _id_field(data, 'product_id')
+    offer = None
+    if offer_id:
+        offer = Offer.query.get(offer_id)
+        if not offer or offer.buyer_id != user.id:
+            return jsonify({"error": "Oferta no encontrada"}), 404
+        if offer.status != 'accepted':
+            return jsonify({"error": "La oferta no ha sido aceptada"}), 400
+        product_id = offer.product_id
+    elif not product_id:
+        return jsonify({"error": "Debe especificar product_id u offer_id"}), 400
+
+    now = datetime.datetime.utcnow()
+    try:
+        # Serializa las compras y aceptaciones del mismo producto (como accept_offer)
+        product = db.session.scalars(
+            db.select(Product).where(Product.id == product_id).with_for_update()
+        ).first()
+        if not product:
+            db.session.rollback()
+            return jsonify({"error": "Producto no encontrado"}), 404
+
+        sold = db.session.execute(
+            db.update(Product)
+            .where(Product.id == product_id, Product.status == ('reserved' if offer else 'active'))
+            .values(status='sold', updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not sold:
+            db.session.rollback()
+            return jsonify({"error": "Este producto ya no está disponible"}), 409
+        stats.product_status_changed((product.category_id, product.subcategory_id),
+                                     'reserved' if offer else 'active', 'sold')
+
+        siblings = db.session.execute(
+            db.update(Offer)
+            .where(Offer.product_id == product_id, Offer.status == 'pending')
+            .values(status='rejected', seller_response='El producto se ha vendido', responded_at=now)
+            .returning(*OFFER_EVENT_COLUMNS)
+            .execution_options(synchronize_session=False)
+        ).all()
+        stats.offer_status_changed(product.seller_id, product_id, 'pending', 'rejected', len(siblings))
+
+        sale = Sale(
+            product_id=product_id,
+            seller_id=product.seller_id,
+            buyer_id=user.id,
+            offer_id=offer.id if offer else None,
+            price_cents=offer.amount_cents if offer else product.effective_price_cents,
+            discount=0 if offer else product.discount,
+            status='completed'
+        )
+        db.session.add(sale)
+        stats.sale_recorded(product.seller_id, sale.price_cents)
+        db.session.commit()
+        for other in siblings:
+            publish_offer_event("offer_rejected", other)
+
+        return jsonify({
+            "message": "Compra realizada exitosamente",
+            "sale": sale.serialize()
+        }), 201
+
+    except IntegrityError:
+        # uq_sale_product_id: el producto ya tiene una venta
+        db.session.rollback()
+        return jsonify({"error": "Este producto ya no está disponible"}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
 @api.route('/buyer/offers', methods=['GET'])
 @jwt_required()
 def get_buyer_offers():
@@ -973,16 +1431,24 @@ def get_buyer_offers():
         return jsonify({"error": "Acceso denegado"}), 403
 
     status = request.args.get('status', '')
+    token = sync_token()
+    since = get_updated_since()
 
     query = Offer.query.filter_by(buyer_id=user.id)
-    if status:
+    if since:
+        query = query.filter(Offer.updated_at >= since)
+    elif status:
         query = query.filter_by(status=status)
 
     offers = query.order_by(Offer.created_at.desc()).all()
 
-    return jsonify({
-        "offers": [offer.serialize() for offer in offers]
-    }), 200
+    response = {
+        "offers": [offer.serialize() for offer in offers],
+        "sync_token": token
+    }
+    if since:
+        response["deleted_ids"] = deleted_ids("offer", since, buyer_id=user.id)
+    return jsonify(response), 200
 
 
 @api.route('/upload/product-images', methods=['POST'])
@@ -1016,3 +1482,43 @@ def upload_product_images():
             "error": "Failed to upload all images",
             "details": failed
         }), 500
+
+
+@api.route('/batch', methods=['POST'])
+def batch_requests():
+    """Varias llamadas a la API en un solo viaje (api/batch.py), p. ej. la carga del panel del vendedor."""
+    data = request.get_json(silent=True) or {}
+    try:
+        subrequests = batch.validate(data.get("requests"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"responses": batch.run_batch(current_app._get_current_object(), subrequests)}), 200
+
+
+@api.route('/events/stream', methods=['GET'])
+def events_stream():
+    """
+    Stream SSE con los eventos de ofertas del usuario (offer_created, offer_accepted,
+    offer_rejected). EventSource no permite enviar cabeceras, así que el JWT va en ?token=.
+    """
+    token = request.args.get('token')
+    if not token:
+        return jsonify({"error": "Missing token"}), 401
+
+    try:
+        user_id = int(decode_token(token)["sub"])
+    except Exception:
+        return jsonify({"error": "Invalid token"}), 401
+
+    # Cada stream ocupa un hilo del worker: por encima del límite, que el navegador vuelva más tarde
+    if not acquire_stream_slot():
+        return Response(f"retry: {SSE_BUSY_RETRY_SECONDS * 1000}\n\n", status=503, mimetype="text/event-stream",
+                        headers={"Retry-After": str(SSE_BUSY_RETRY_SECONDS), "Cache-Control": "no-cache"})
+
+    response = Response(stream(user_id), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # que los proxies no acumulen el stream
+    })
+    # Se libera al cerrar la respuesta, aunque el generador no llegue a arrancar
+    response.call_on_close(release_stream_slot)
+    return response
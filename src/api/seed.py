@@ -0,0 +1,282 @@
+# src/api/seed.py
+
+"""
+Generación masiva de datos de prueba con inserts de SQLAlchemy Core.
+
+- Deterministas: la misma semilla sobre una base vacía genera los mismos datos.
+- Por lotes: los productos se generan en bloques de chunk_size y cada bloque
+  (productos + imágenes + ofertas + ventas) se inserta en su propia transacción,
+  sin mantener el dataset entero en memoria.
+- Un único hash de contraseña (SEED_PASSWORD) calculado una vez y compartido.
+- En Postgres con psycopg2 se usa COPY, bastante más rápido que INSERT multi-fila.
+"""
+import csv
+import io
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select, text
+from api.hashing import hash_password
+from api.stats import OFFER_STATUS_COUNTERS, bump_categories, bump_seller
+from api.taxonomy import DEFAULT_CATEGORIES, ensure_default_taxonomy, get_taxonomy
+from api.dictionaries import resolve_value
+from api.models import db, User, Product, ProductImage, Offer, Sale
+
+SEED_PASSWORD = "revistete123"
+
+CATEGORIES = {gender: [category for category, _ in categories] for gender, categories in DEFAULT_CATEGORIES.items()}
+SIZES = ["XS", "S", "M", "L", "XL"]
+SHOE_SIZES = ["36", "37", "38", "39", "40", "41", "42", "43", "44"]
+CONDITIONS = ["new_with_tags", "new_without_tags", "two_wears", "very_good", "good", "acceptable"]
+BRANDS = ["Zara", "Mango", "H&M", "Pull&Bear", "Bershka", "Massimo Dutti", "Nike", "Adidas",
+          "Levi's", "Uniqlo", "Stradivarius", "Desigual", "Lacoste", "Tommy Hilfiger", None]
+COLORS = ["negro", "blanco", "azul", "rojo", "verde", "gris", "beige", "rosa", "marrón", "amarillo", None]
+MATERIALS = ["algodón", "lino", "poliéster", "lana", "seda", "cuero", "vaquero", None]
+ADJECTIVES = ["básico", "vintage", "oversize", "entallado", "clásico", "estampado", "de punto", "casual"]
+FIRST_NAMES = ["Lucía", "Martina", "Sofía", "Paula", "Julia", "Hugo", "Martín", "Lucas", "Mateo", "Leo",
+               "Carmen", "Elena", "Daniel", "Pablo", "Alba", "Sara", "Álvaro", "Diego", "Irene", "Marta"]
+LAST_NAMES = ["García", "Fernández", "González", "Rodríguez", "López", "Martínez", "Sánchez", "Pérez",
+              "Gómez", "Martín", "Jiménez", "Ruiz", "Hernández", "Díaz", "Moreno", "Álvarez"]
+CITIES = ["Madrid", "Barcelona", "Valencia", "Sevilla", "Bilbao", "Málaga", "Zaragoza", "Valladolid"]
+OFFER_MESSAGES = ["¿Te interesa esta oferta?", "¿Lo dejarías en este precio?", "Lo recojo en mano", "", None]
+
+ALL_MODELS = (User, Product, ProductImage, Offer, Sale)
+
+
+def _next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _copy_rows(table, rows):
+    # COPY ... FROM STDIN (CSV): sin comillas vacío = NULL
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if row[c] is None else row[c] for c in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    cursor.copy_expert(f'COPY "{table.name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def _write(table, rows):
+    if not rows:
+        return
+    if db.engine.dialect.name == "postgresql" and db.engine.dialect.driver == "psycopg2":
+        _copy_rows(table, rows)
+    else:
+        db.session.execute(insert(table), rows)
+
+
+def _sync_sequences():
+    # Insertamos ids explícitos; en Postgres hay que mover las secuencias
+    if db.engine.dialect.name != "postgresql":
+        return
+    for model in ALL_MODELS:
+        table = model.__table__.name
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM \"{table}\"), 1))"
+        ))
+    db.session.commit()
+
+
+def _user_rows(rng, role, count, first_id, password, tag, now):
+    for i in range(count):
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        yield {
+            "id": first_id + i,
+            "email": f"{role}{first_id + i}.{tag}@revistete.test",
+            "username": f"{role}{first_id + i}_{tag}",
+            "password": password,
+            "first_name": first_name,
+            "last_name": f"{last_name} {rng.choice(LAST_NAMES)}",
+            "role": role,
+            "is_active": True,
+            "created_at": created_at,
+            "updated_at": created_at,
+            "address": f"Calle {rng.choice(LAST_NAMES)} {rng.randint(1, 200)}",
+            "city": rng.choice(CITIES),
+            "zip_code": f"{rng.randint(1000, 52999):05d}",
+            "phone": f"6{rng.randint(10000000, 99999999)}",
+            "store_name": f"Armario de {first_name}" if role == "seller" else None,
+            "store_description": "Ropa de segunda mano cuidada" if role == "seller" else None,
+        }
+
+
+def seed_users(count, role="buyer", seed=42, chunk_size=5000, password_hash=None):
+    """Crea `count` usuarios completos; devuelve la lista de ids creados."""
+    rng = random.Random(f"{seed}-{role}")
+    now = datetime.utcnow()
+    password = password_hash or hash_password(SEED_PASSWORD)
+    first_id = _next_id(User)
+    tag = f"s{seed}"
+    rows = _user_rows(rng, role, count, first_id, password, tag, now)
+    for start in range(0, count, chunk_size):
+        _write(User.__table__, [next(rows) for _ in range(min(chunk_size, count - start))])
+        db.session.commit()
+    _sync_sequences()
+    return list(range(first_id, first_id + count))
+
+
+def seed_catalog(sellers=20, buyers=100, products=1000, images_per_product=3, offers_per_product=2,
+                 sale_ratio=0.05, seed=42, chunk_size=5000, progress=None):
+    """
+    Genera vendedores, compradores, productos, imágenes, ofertas y ventas.
+    Devuelve un dict con el número de filas creadas por tabla.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    password = hash_password(SEED_PASSWORD)
+    counts = dict.fromkeys(("users", "products", "images", "offers", "sales"), 0)
+
+    seller_ids = seed_users(sellers, "seller", seed, chunk_size, password)
+    buyer_ids = seed_users(buyers, "buyer", seed, chunk_size, password)
+    counts["users"] = sellers + buyers
+    if not seller_ids:
+        return counts
+
+    ensure_default_taxonomy()
+    taxonomy = get_taxonomy()
+    # Marcas y colores canónicos (se crean una vez); None = sin marca/color
+    brand_ids = {brand: resolve_value("brand", brand) for brand in BRANDS}
+    color_ids = {color: resolve_value("color", color) for color in COLORS}
+    db.session.commit()
+    product_id = _next_id(Product)
+    image_id = _next_id(ProductImage)
+    offer_id = _next_id(Offer)
+    sale_id = _next_id(Sale)
+
+    for start in range(0, products, chunk_size):
+        product_rows, image_rows, offer_rows, sale_rows = [], [], [], []
+        # Contadores desnormalizados calculados al generar, sin recorrer las tablas después
+        seller_stats = defaultdict(lambda: defaultdict(int))
+        category_counts = defaultdict(int)
+        for _ in range(min(chunk_size, products - start)):
+            gender = rng.choice(list(CATEGORIES))
+            category = rng.choice(CATEGORIES[gender])
+            brand = rng.choice(BRANDS)
+            price_cents = rng.randint(5, 200) * 100 + rng.choice([0, 0, 50, 95, 99])
+            discount = rng.choice([0, 0, 0, 10, 20, 30])
+            # Unos pocos vendedores concentran la mayoría de productos
+            seller_id = seller_ids[int(len(seller_ids) * rng.random() ** 2)]
+            created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 180))
+            node = taxonomy.by_slug[f"{gender}_{category}"]
+            product_rows.append({
+                "id": product_id,
+                "title": f"{category.capitalize()} {rng.choice(ADJECTIVES)} {brand or ''}".strip(),
+                "description": f"Prenda de segunda mano, {category} {rng.choice(ADJECTIVES)}. "
+                               f"Usada pocas veces y guardada con cuidado.",
+                "gender_id": node.parent_id,
+                "category_id": node.id,
+                "subcategory_id": None,
+                "size": rng.choice(SHOE_SIZES if category == "zapatos" else SIZES),
+                "brand_id": brand_ids[brand],
+                "condition": rng.choice(CONDITIONS),
+                "material": rng.choice(MATERIALS),
+                "color_id": color_ids[rng.choice(COLORS)],
+                "price_cents": price_cents,
+                "discount": discount,
+                "seller_id": seller_id,
+                "status": "active",
+                "created_at": created_at,
+                "updated_at": created_at,
+            })
+            seller_stats[seller_id]["product_count"] += 1
+            for position in range(images_per_product):
+                image_rows.append({
+                    "id": image_id,
+                    "url": f"https://res.cloudinary.com/demo/image/upload/revistete/{product_id}_{position}.jpg",
+                    "product_id": product_id,
+                    "position": position,
+                })
+                image_id += 1
+
+            # Estado de las ofertas coherente con el del producto, como lo dejarían accept_offer y
+            # checkout: a lo sumo una aceptada (producto reservado o vendido por esa oferta), el
+            # resto rechazadas si el producto ya no está activo, y pendientes solo si lo está
+            offers = rng.sample(buyer_ids, min(offers_per_product, len(buyer_ids)))
+            offer_times = sorted(min(created_at + timedelta(hours=rng.randint(1, 240)), now) for _ in offers)
+            outcome = rng.random()
+            sold = bool(buyer_ids) and outcome < sale_ratio
+            # La mitad de las ventas (y otro tanto de productos reservados) vienen de aceptar la primera oferta
+            reserved = not sold and outcome < 1.5 * sale_ratio
+            accepted = 0 if offers and (reserved or sold and rng.random() < 0.5) else None
+            if sold or accepted is not None:
+                statuses = ["rejected"] * len(offers)
+            else:
+                statuses = [rng.choice(["pending", "pending", "pending", "rejected"]) for _ in offers]
+            if accepted is not None:
+                statuses[accepted] = "accepted"
+                product_rows[-1]["status"] = "sold" if sold else "reserved"
+            elif sold:
+                product_rows[-1]["status"] = "sold"
+
+            if sold:
+                # Nada en el futuro: el delta sync (updated_at >= since) lo devolvería en cada consulta
+                sold_at = min(created_at + timedelta(days=rng.randint(1, 10)), now)
+                offer_times = [min(offered_at, sold_at) for offered_at in offer_times]
+                sale_price_cents = price_cents
+                if accepted is not None:
+                    sale_price_cents = round(price_cents * rng.uniform(0.6, 1.0))
+                sale_rows.append({
+                    "id": sale_id,
+                    "product_id": product_id,
+                    "seller_id": seller_id,
+                    "buyer_id": offers[accepted] if accepted is not None else rng.choice(buyer_ids),
+                    "offer_id": offer_id + accepted if accepted is not None else None,
+                    "price_cents": sale_price_cents,
+                    "discount": 0 if accepted is not None else discount,
+                    "status": rng.choice(["pending", "completed", "completed"]),
+                    "created_at": sold_at,
+                    "updated_at": sold_at,
+                })
+                sale_id += 1
+                seller_stats[seller_id]["sales_count"] += 1
+                seller_stats[seller_id]["total_earnings_cents"] += sale_price_cents
+
+            # Category.product_count solo cuenta los activos
+            if product_rows[-1]["status"] == "active":
+                category_counts[node.id] += 1
+
+            product_rows[-1]["offer_count"] = len(offers)
+            product_rows[-1]["pending_offer_count"] = statuses.count("pending")
+            for position, (buyer_id, status, offered_at) in enumerate(zip(offers, statuses, offer_times)):
+                seller_stats[seller_id][OFFER_STATUS_COUNTERS[status]] += 1
+                offer_rows.append({
+                    "id": offer_id,
+                    "product_id": product_id,
+                    "buyer_id": buyer_id,
+                    "seller_id": seller_id,
+                    "amount_cents": sale_price_cents if sold and position == accepted
+                    else round(price_cents * rng.uniform(0.6, 1.0)),
+                    "message": rng.choice(OFFER_MESSAGES),
+                    "status": status,
+                    "created_at": offered_at,
+                    "updated_at": offered_at,
+                })
+                offer_id += 1
+            product_id += 1
+
+        # Una transacción por lote
+        _write(Product.__table__, product_rows)
+        _write(ProductImage.__table__, image_rows)
+        _write(Offer.__table__, offer_rows)
+        _write(Sale.__table__, sale_rows)
+        for seller_id, deltas in seller_stats.items():
+            bump_seller(seller_id, **deltas)
+        bump_categories(category_counts)
+        db.session.commit()
+
+        counts["products"] += len(product_rows)
+        counts["images"] += len(image_rows)
+        counts["offers"] += len(offer_rows)
+        counts["sales"] += len(sale_rows)
+        if progress:
+            progress(counts)
+
+    _sync_sequences()
+    return counts
@@ -0,0 +1,226 @@
+# src/api/stats.py
+
+"""
+Contadores desnormalizados: tabla seller_stats, Product.offer_count / pending_offer_count
+y Category.product_count (productos activos, los del catálogo, por nodo de la taxonomía).
+
+Las rutas que crean o borran productos, cambian el estado de ofertas o registran
+ventas llaman a estas funciones antes de su commit, así los contadores se
+actualizan en la misma transacción (UPDATE col = col + delta, atómico).
+Las filas de seller_stats se crean con un upsert la primera vez que hacen falta.
+
+reconcile_stats() recalcula todo desde cero con GROUP BY, informa de la deriva
+y la corrige (`flask reconcile-stats`).
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+from sqlalchemy import bindparam, case, func, or_, select, update
+from api.models import db, Category, Offer, Product, Sale, SellerStats, PRODUCT_IS_ACTIVE
+
+COUNTERS = ("product_count", "pending_offers", "accepted_offers", "rejected_offers",
+            "sales_count", "total_earnings_cents")
+# Estado de oferta -> contador del vendedor (las caducadas se archivan y dejan de contar)
+OFFER_STATUS_COUNTERS = {
+    "pending": "pending_offers",
+    "accepted": "accepted_offers",
+    "rejected": "rejected_offers",
+}
+
+
+def dialect_insert(table):
+    """INSERT con on_conflict_do_update/do_nothing del dialecto (Postgres o SQLite)."""
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def bump_seller(seller_id, **deltas):
+    """Suma los deltas a la fila seller_stats del vendedor (la crea si no existe)."""
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+    table = SellerStats.__table__
+    now = datetime.utcnow()
+    stmt = dialect_insert(table).values(seller_id=seller_id, updated_at=now, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.seller_id],
+        set_={**{name: table.c[name] + stmt.excluded[name] for name in deltas}, "updated_at": now},
+    )
+    db.session.execute(stmt)
+
+
+def product_created(seller_id):
+    bump_seller(seller_id, product_count=1)
+
+
+def product_deleted(seller_id, offer_statuses):
+    """offer_statuses: {estado: nº de ofertas} de las ofertas que se borran con el producto."""
+    deltas = defaultdict(int, product_count=-1)
+    for status, count in offer_statuses.items():
+        if status in OFFER_STATUS_COUNTERS:
+            deltas[OFFER_STATUS_COUNTERS[status]] -= count
+    bump_seller(seller_id, **deltas)
+
+
+def offer_status_changed(seller_id, product_id, old_status, new_status, count=1):
+    """
+    Registra `count` ofertas que pasan de old_status a new_status.
+    old_status=None es una oferta nueva; new_status=None una oferta que desaparece
+    (archivada o borrada). product_id=None no toca los contadores del producto.
+    """
+    if not count or old_status == new_status:
+        return
+    deltas = defaultdict(int)
+    if old_status in OFFER_STATUS_COUNTERS:
+        deltas[OFFER_STATUS_COUNTERS[old_status]] -= count
+    if new_status in OFFER_STATUS_COUNTERS:
+        deltas[OFFER_STATUS_COUNTERS[new_status]] += count
+    bump_seller(seller_id, **deltas)
+
+    if product_id is None:
+        return
+    offers = count * ((new_status is not None) - (old_status is not None))
+    pending = count * ((new_status == "pending") - (old_status == "pending"))
+    if offers or pending:
+        db.session.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values(offer_count=Product.offer_count + offers,
+                    pending_offer_count=Product.pending_offer_count + pending)
+            .execution_options(synchronize_session=False, counters_only=True)
+        )
+
+
+def bump_categories(deltas):
+    """deltas: {category_id: delta} sobre Category.product_count (los None se ignoran)."""
+    for category_id, delta in deltas.items():
+        if category_id is None or not delta:
+            continue
+        db.session.execute(
+            update(Category)
+            .where(Category.id == category_id)
+            .values(product_count=Category.product_count + delta)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def product_categorized(old_ids=(), new_ids=()):
+    """
+    Un producto entra en (new_ids), sale de (old_ids) o se mueve entre nodos:
+    (category_id, subcategory_id). Los géneros no llevan contador propio, se suman al leer.
+    """
+    deltas = Counter(new_ids)
+    deltas.subtract(old_ids)
+    bump_categories(deltas)
+
+
+def product_status_changed(category_ids, old_status, new_status):
+    """
+    Un producto de (category_id, subcategory_id) cambia de disponibilidad: entra o sale
+    de Category.product_count, que solo cuenta los activos. old_status=None es un alta.
+    """
+    if (old_status == "active") == (new_status == "active"):
+        return
+    if new_status == "active":
+        product_categorized(new_ids=category_ids)
+    else:
+        product_categorized(old_ids=category_ids)
+
+
+def sale_recorded(seller_id, price_cents):
+    bump_seller(seller_id, sales_count=1, total_earnings_cents=price_cents)
+
+
+def get_seller_stats(seller_id):
+    """Lectura O(1) de los agregados del vendedor (ceros si aún no tiene fila)."""
+    stats = db.session.get(SellerStats, seller_id)
+    return (stats or SellerStats(**dict.fromkeys(COUNTERS, 0))).serialize()
+
+
+def compute_seller_stats():
+    """Agregados reales calculados desde las tablas base: {seller_id: {contador: valor}}."""
+    expected = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for seller_id, count in db.session.execute(
+            select(Product.seller_id, func.count(Product.id)).group_by(Product.seller_id)):
+        expected[seller_id]["product_count"] = count
+    for seller_id, status, count in db.session.execute(
+            select(Offer.seller_id, Offer.status, func.count(Offer.id)).group_by(Offer.seller_id, Offer.status)):
+        if status in OFFER_STATUS_COUNTERS:
+            expected[seller_id][OFFER_STATUS_COUNTERS[status]] = count
+    for seller_id, count, total in db.session.execute(
+            select(Sale.seller_id, func.count(Sale.id), func.coalesce(func.sum(Sale.price_cents), 0))
+            .group_by(Sale.seller_id)):
+        expected[seller_id]["sales_count"] = count
+        expected[seller_id]["total_earnings_cents"] = total
+    return expected
+
+
+def _seller_drift(fix):
+    expected = compute_seller_stats()
+    stored = {row.seller_id: {name: getattr(row, name) for name in COUNTERS} for row in SellerStats.query}
+    drift = []
+    for seller_id in sorted(expected.keys() | stored.keys()):
+        actual = expected.get(seller_id, dict.fromkeys(COUNTERS, 0))
+        current = stored.get(seller_id, dict.fromkeys(COUNTERS, 0))
+        fields = [name for name in COUNTERS if current[name] != actual[name]]
+        if not fields:
+            continue
+        drift.extend({"seller_id": seller_id, "field": name, "stored": current[name], "expected": actual[name]}
+                     for name in fields)
+        if fix:
+            db.session.merge(SellerStats(seller_id=seller_id, updated_at=datetime.utcnow(), **actual))
+    return drift
+
+
+def _product_drift(fix):
+    counts = (
+        select(Offer.product_id,
+               func.count(Offer.id).label("offers"),
+               func.sum(case((Offer.status == "pending", 1), else_=0)).label("pending"))
+        .group_by(Offer.product_id)
+        .subquery()
+    )
+    offers = func.coalesce(counts.c.offers, 0)
+    pending = func.coalesce(counts.c.pending, 0)
+    rows = db.session.execute(
+        select(Product.id, Product.offer_count, Product.pending_offer_count, offers, pending)
+        .outerjoin(counts, counts.c.product_id == Product.id)
+        .where(or_(Product.offer_count != offers, Product.pending_offer_count != pending))
+    ).all()
+    if fix and rows:
+        table = Product.__table__
+        db.session.execute(
+            update(table).where(table.c.id == bindparam("product_id"))
+            .values(offer_count=bindparam("offers"), pending_offer_count=bindparam("pending")),
+            [{"product_id": row[0], "offers": row[3], "pending": row[4]} for row in rows],
+        )
+    return [{"product_id": row[0], "offer_count": [row[1], row[3]], "pending_offer_count": [row[2], row[4]]}
+            for row in rows]
+
+
+def _category_drift(fix):
+    expected = Counter()
+    for column in (Product.category_id, Product.subcategory_id):
+        expected.update(dict(db.session.execute(
+            select(column, func.count(Product.id)).where(column.isnot(None), PRODUCT_IS_ACTIVE)
+            .group_by(column)).all()))
+    drift = [{"category_id": category_id, "stored": stored, "expected": expected[category_id]}
+             for category_id, stored in db.session.execute(select(Category.id, Category.product_count))
+             if stored != expected[category_id]]
+    if fix and drift:
+        table = Category.__table__
+        db.session.execute(
+            update(table).where(table.c.id == bindparam("category_id")).values(product_count=bindparam("expected")),
+            [{"category_id": item["category_id"], "expected": item["expected"]} for item in drift],
+        )
+    return drift
+
+
+def reconcile_stats(fix=True):
+    """Compara los contadores con los datos reales; con fix=True los reescribe."""
+    report = {"sellers": _seller_drift(fix), "products": _product_drift(fix), "categories": _category_drift(fix)}
+    if fix:
+        db.session.commit()
+    return report
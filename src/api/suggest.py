@@ -0,0 +1,302 @@
+# src/api/suggest.py
+
+"""
+Autocompletado de la búsqueda (/api/search/suggest?q=) desde un índice en memoria
+(opcional, SEARCH_SUGGEST=1; sin él la ruta devuelve una lista vacía).
+
+Términos: títulos de producto, marcas y categorías. Cada uno puntúa por
+popularidad: la suma, sobre sus productos activos, de 1 + nº de ofertas recibidas.
+
+El índice es un array ordenado de claves normalizadas (api/dictionaries.normalize)
+con una entrada por cada palabra inicial del término ("vestido largo zara",
+"largo zara", "zara"), así un prefijo casa con cualquier palabra y se resuelve
+con bisect. Para prefijos de hasta CACHED_PREFIX_LENGTH letras, los que más
+términos abarcan, el top ya está precalculado. Una petición no toca la base de datos.
+
+Como el índice del catálogo, cada worker tiene el suyo y un hilo lo mantiene: la
+contribución de cada producto se resta y se vuelve a sumar al cambiar
+(Product.updated_at y tombstones de api/sync.py), cada SUGGEST_REFRESH_SECONDS
+o, agrupando las escrituras de SUGGEST_DEBOUNCE_SECONDS, en cuanto este proceso
+escribe un producto (los contadores de ofertas no despiertan el hilo; llegan en
+el refresco periódico). El refresco solo reordena los términos que cambiaron:
+construir el índice entero es caro (segundos de CPU con el GIL para cientos de
+miles de títulos) y solo se hace al arrancar y cada SUGGEST_REBUILD_SECONDS.
+"""
+import bisect
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from sqlalchemy import select
+from api.models import db, Product, DeletedRecord, PRODUCT_IS_ACTIVE
+from api.dictionaries import get_dictionary, normalize
+from api.sync import SYNC_OVERLAP, watch_product_writes
+from api.taxonomy import get_taxonomy
+from api.utils import serves_requests
+
+SEARCH_SUGGEST = os.getenv("SEARCH_SUGGEST", "0") == "1"
+SUGGEST_REFRESH_SECONDS = float(os.getenv("SUGGEST_REFRESH_SECONDS", 10))
+SUGGEST_REBUILD_SECONDS = float(os.getenv("SUGGEST_REBUILD_SECONDS", 24 * 3600))
+SUGGEST_DEBOUNCE_SECONDS = float(os.getenv("SUGGEST_DEBOUNCE_SECONDS", 1))
+SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 20
+CACHED_PREFIX_LENGTH = 3
+
+ROW_COLUMNS = (Product.id, Product.title, Product.brand_id, Product.category_id, Product.offer_count,
+               Product.status)
+
+logger = logging.getLogger(__name__)
+
+
+class _View:
+    """
+    Estructuras de consulta. Un refresco solo toca los términos cuya puntuación
+    cambió: inserta o retira sus claves con bisect y rehace el top de sus prefijos
+    cortos. Las peticiones leen a la vez; cada paso (insort, del, asignar un top)
+    es atómico con el GIL y los id de término no se reutilizan.
+    """
+
+    def __init__(self, scores, labels):
+        self.ids = {}
+        # Por id de término; puntuación 0 = retirado
+        self.scores = []
+        self.suggestions = []
+        entries = []
+        for term, score in scores.items():
+            if score > 0:
+                term_id = self._new_term(term, score, labels[term])
+                entries.extend((key, term_id) for key in self._keys(term))
+        entries.sort()
+        self.entries = entries
+
+        # Top de los prefijos cortos (a lo sumo MAX_SUGGEST_LIMIT por prefijo)
+        by_prefix = defaultdict(set)
+        for key, term_id in entries:
+            for prefix in self._prefixes((key,)):
+                by_prefix[prefix].add(term_id)
+        self.top = {prefix: self._best(term_ids, MAX_SUGGEST_LIMIT) for prefix, term_ids in by_prefix.items()}
+
+    @staticmethod
+    def _keys(term):
+        words = term[1].split()
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    @staticmethod
+    def _prefixes(keys):
+        return {key[:length] for key in keys for length in range(1, min(CACHED_PREFIX_LENGTH, len(key)) + 1)}
+
+    def _new_term(self, term, score, label):
+        term_id = len(self.scores)
+        self.scores.append(score)
+        self.suggestions.append(label)
+        self.ids[term] = term_id
+        return term_id
+
+    def _best(self, term_ids, limit):
+        return heapq.nlargest(limit, (term_id for term_id in term_ids if self.scores[term_id] > 0),
+                              key=lambda term_id: (self.scores[term_id], -term_id))
+
+    def _matching(self, key):
+        start = bisect.bisect_left(self.entries, (key,))
+        end = bisect.bisect_left(self.entries, (key + "\uffff",), start)
+        return {term_id for _, term_id in self.entries[start:end]}
+
+    def update(self, terms, scores, labels):
+        """Aplica la puntuación actual (scores/labels del índice) de los términos que cambiaron."""
+        for term in terms:
+            score = scores.get(term, 0)
+            term_id = self.ids.get(term)
+            keys = self._keys(term)
+            if term_id is None:
+                if score <= 0:
+                    continue
+                term_id = self._new_term(term, score, labels[term])
+                for key in keys:
+                    bisect.insort(self.entries, (key, term_id))
+                lowered = False
+            else:
+                lowered = score < self.scores[term_id]
+                if score <= 0:
+                    del self.ids[term]
+                    for key in keys:
+                        position = bisect.bisect_left(self.entries, (key, term_id))
+                        if position < len(self.entries) and self.entries[position] == (key, term_id):
+                            del self.entries[position]
+                else:
+                    self.suggestions[term_id] = labels[term]
+                self.scores[term_id] = max(score, 0)
+
+            for prefix in self._prefixes(keys):
+                best = self.top.get(prefix, [])
+                if lowered and term_id in best:
+                    # Puede entrar otro término que no estaba en el top: se recalcula el prefijo
+                    self.top[prefix] = self._best(self._matching(prefix), MAX_SUGGEST_LIMIT)
+                elif not lowered:
+                    self.top[prefix] = self._best(set(best) | {term_id}, MAX_SUGGEST_LIMIT)
+
+    def search(self, key, limit):
+        if len(key) <= CACHED_PREFIX_LENGTH:
+            best = self.top.get(key, [])[:limit]
+        else:
+            best = self._best(self._matching(key), limit)
+        return [self.suggestions[term_id] for term_id in best]
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.synced_at = None
+        self.built_at = None
+        # product_id -> términos a los que contribuye y con qué peso
+        self._products = {}
+        self._scores = Counter()
+        self._labels = {}
+        # Término de cada título, marca y categoría ya visto: se repiten mucho entre productos
+        self._term_cache = {}
+        # Términos cuya puntuación cambió desde el último refresco
+        self._touched = set()
+        self._view = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._view is not None
+
+    def __len__(self):
+        return len(self._view.ids) if self._view else 0
+
+    def _title_term(self, title):
+        title = " ".join((title or "").split())
+        key = normalize(title)
+        return (("title", key), {"text": title, "type": "title", "params": {"search": title}}) if key else None
+
+    def _brand_term(self, brand_id):
+        brand = get_dictionary("brand", brand_id).name(brand_id)
+        return (("brand", normalize(brand)), {"text": brand, "type": "brand", "params": {"brand": brand}}) \
+            if brand else None
+
+    def _category_term(self, category_id):
+        taxonomy = get_taxonomy(category_id)
+        node = taxonomy.nodes.get(category_id)
+        if node is None:
+            return None
+        gender = taxonomy.name(node.parent_id)
+        text = f"{node.name} · {gender}" if gender else node.name
+        return ("category", normalize(text)), {"text": text, "type": "category", "params": {"category": node.slug}}
+
+    def _terms(self, row):
+        terms = []
+        for kind, value, make in (("title", row.title, self._title_term), ("brand", row.brand_id, self._brand_term),
+                                  ("category", row.category_id, self._category_term)):
+            if value is None:
+                continue
+            if (kind, value) not in self._term_cache:
+                self._term_cache[kind, value] = make(value)
+            if self._term_cache[kind, value]:
+                terms.append(self._term_cache[kind, value])
+        return terms
+
+    def _add(self, row):
+        weight = 1 + (row.offer_count or 0)
+        terms = self._terms(row)
+        for term, label in terms:
+            self._scores[term] += weight
+            self._labels[term] = label
+            self._touched.add(term)
+        self._products[row.id] = ([term for term, _ in terms], weight)
+
+    def _remove(self, product_id):
+        terms, weight = self._products.pop(product_id, ((), 0))
+        for term in terms:
+            self._scores[term] -= weight
+            self._touched.add(term)
+            if self._scores[term] <= 0:
+                del self._scores[term]
+                self._labels.pop(term, None)
+
+    def build(self):
+        started = datetime.utcnow()
+        self._products, self._scores, self._labels, self._term_cache = {}, Counter(), {}, {}
+        for row in db.session.execute(select(*ROW_COLUMNS).where(PRODUCT_IS_ACTIVE).execution_options(yield_per=50000)):
+            self._add(row)
+        self._view = _View(self._scores, self._labels)
+        self._touched = set()
+        self.synced_at = self.built_at = started
+        return self
+
+    def refresh(self):
+        """Aplica los productos creados/modificados/borrados desde el último refresco."""
+        with self._refresh_lock:
+            started = datetime.utcnow()
+            since = self.synced_at - SYNC_OVERLAP
+            changed = db.session.execute(select(*ROW_COLUMNS).where(Product.updated_at >= since)).all()
+            deleted = db.session.scalars(select(DeletedRecord.entity_id).where(
+                DeletedRecord.entity == "product", DeletedRecord.deleted_at >= since)).all()
+            self.synced_at = started
+            if not changed and not deleted:
+                return 0
+            for product_id in deleted:
+                self._remove(product_id)
+            for row in changed:
+                self._remove(row.id)
+                # Reservado, vendido o archivado: deja de sugerirse
+                if row.status == "active":
+                    self._add(row)
+            touched, self._touched = self._touched, set()
+            self._view.update(touched, self._scores, self._labels)
+            return len(changed) + len(deleted)
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        key = normalize(query)
+        if not key or not self._view:
+            return []
+        return self._view.search(key, min(max(limit, 1), MAX_SUGGEST_LIMIT))
+
+
+_index = None
+_wakeup = threading.Event()
+
+
+def get_suggest_index():
+    """El índice si está construido; None mientras arranca (o con SEARCH_SUGGEST=0)."""
+    return _index if _index is not None and _index.ready else None
+
+
+def set_suggest_index(index):
+    global _index
+    _index = index
+
+
+def setup_suggest(app):
+    # Solo los procesos que atienden peticiones
+    if not SEARCH_SUGGEST or not serves_requests():
+        return
+
+    watch_product_writes(_wakeup)
+
+    def run():
+        index = SuggestIndex()
+        while True:
+            with app.app_context():
+                try:
+                    rebuild_due = index.ready and \
+                        (datetime.utcnow() - index.built_at).total_seconds() >= SUGGEST_REBUILD_SECONDS
+                    if index.ready and not rebuild_due:
+                        index.refresh()
+                    else:
+                        # Reconstruir sobre un índice nuevo: las peticiones siguen usando el actual
+                        set_suggest_index(SuggestIndex().build() if rebuild_due else index.build())
+                        index = _index
+                        logger.info("Suggest index ready: %d terms", len(index))
+                except Exception:
+                    # Se reintenta en la siguiente vuelta
+                    db.session.rollback()
+                    logger.exception("Suggest index update failed")
+            if _wakeup.wait(SUGGEST_REFRESH_SECONDS):
+                # Una ráfaga de escrituras se aplica en un solo refresco
+                time.sleep(SUGGEST_DEBOUNCE_SECONDS)
+            _wakeup.clear()
+
+    threading.Thread(target=run, name="search-suggest", daemon=True).start()
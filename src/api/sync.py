@@ -0,0 +1,100 @@
+# src/api/sync.py
+
+"""
+Sincronización incremental de listas (?updated_since=<sync_token>).
+
+Los listados devuelven siempre un sync_token. Si el cliente lo reenvía como
+updated_since, solo recibe las filas con updated_at posterior y los ids borrados
+desde entonces (tabla de tombstones DeletedRecord). Si el token es más antiguo que
+la retención de tombstones (SYNC_TOMBSTONE_DAYS) se responde la lista completa.
+
+Los índices en memoria (catálogo, sugerencias) usan lo mismo para refrescarse:
+leen los productos con updated_at reciente y los tombstones, y watch_product_writes()
+los despierta en cuanto este proceso hace commit de una escritura de productos.
+"""
+import os
+from datetime import datetime, timedelta
+from flask import request
+from sqlalchemy import delete, event, select
+from sqlalchemy.orm import Session
+from api.models import db, DeletedRecord, Product
+from api.utils import APIException
+
+SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", 30))
+# Margen para no perder filas de transacciones que hicieron commit tarde con un updated_at anterior
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def sync_token():
+    return (datetime.utcnow() - SYNC_OVERLAP).isoformat()
+
+
+def get_updated_since():
+    """Lee ?updated_since= (o ?sync_token=); None = lista completa."""
+    value = request.args.get("updated_since") or request.args.get("sync_token")
+    if not value:
+        return None
+    try:
+        since = datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        raise APIException("Invalid updated_since, expected an ISO 8601 timestamp", status_code=400)
+    if since < datetime.utcnow() - timedelta(days=SYNC_TOMBSTONE_DAYS):
+        return None
+    return since
+
+
+def record_deletions(entity, rows):
+    """rows: iterable de (entity_id, seller_id, buyer_id). Se añade a la sesión actual."""
+    values = [{"entity": entity, "entity_id": entity_id, "seller_id": seller_id,
+               "buyer_id": buyer_id, "deleted_at": datetime.utcnow()}
+              for entity_id, seller_id, buyer_id in rows]
+    if values:
+        db.session.execute(DeletedRecord.__table__.insert(), values)
+
+
+def deleted_ids(entity, since, seller_id=None, buyer_id=None):
+    query = select(DeletedRecord.entity_id).where(
+        DeletedRecord.entity == entity, DeletedRecord.deleted_at >= since)
+    if seller_id is not None:
+        query = query.where(DeletedRecord.seller_id == seller_id)
+    if buyer_id is not None:
+        query = query.where(DeletedRecord.buyer_id == buyer_id)
+    return list(db.session.scalars(query))
+
+
+def prune_tombstones():
+    cutoff = datetime.utcnow() - timedelta(days=SYNC_TOMBSTONE_DAYS)
+    result = db.session.execute(delete(DeletedRecord).where(DeletedRecord.deleted_at < cutoff))
+    db.session.commit()
+    return result.rowcount
+
+
+_product_watchers = []
+
+
+def _product_flushed(session, flush_context):
+    if any(isinstance(obj, Product) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["products_changed"] = True
+
+
+def _product_bulk_write(state):
+    # UPDATE/DELETE masivos (db.update(Product)...) no pasan por el flush. Los de solo
+    # contadores (execution_options(counters_only=True), api/stats.py) no cambian los índices
+    if (state.is_update or state.is_delete) and state.bind_mapper is not None \
+            and state.bind_mapper.class_ is Product and not state.execution_options.get("counters_only"):
+        state.session.info["products_changed"] = True
+
+
+def _after_commit(session):
+    if session.info.pop("products_changed", False):
+        for wakeup in _product_watchers:
+            wakeup.set()
+
+
+def watch_product_writes(wakeup):
+    """wakeup (threading.Event) se activa tras cada commit de este proceso que escribe productos."""
+    if not _product_watchers:
+        event.listen(Session, "after_flush", _product_flushed)
+        event.listen(Session, "do_orm_execute", _product_bulk_write)
+        event.listen(Session, "after_commit", _after_commit)
+    _product_watchers.append(wakeup)
@@ -0,0 +1,189 @@
+# src/api/taxonomy.py
+
+"""
+Taxonomía del catálogo (tabla category): género > categoría > subcategoría.
+
+Los productos guardan gender_id, category_id y subcategory_id. Los filtros del
+catálogo (?gender=, ?category=, ?subcategory=) se resuelven aquí a ids contra el
+árbol en memoria y en SQL quedan como igualdades enteras sobre columnas indexadas.
+
+get_taxonomy() devuelve una instantánea del árbol, que cambia muy poco: se
+recarga cada CATEGORY_CACHE_SECONDS, al crear una subcategoría en este proceso
+o cuando aparece un id que no conoce (creado por otro worker). Los contadores
+de productos por nodo (Category.product_count) se actualizan en la transacción
+de cada escritura (api/stats.py) y se leen aparte, así /api/categories sirve la
+estructura del caché con los contadores al día.
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+from sqlalchemy import select
+from api.models import db, Category
+from api.stats import dialect_insert
+
+CATEGORY_CACHE_SECONDS = float(os.getenv("CATEGORY_CACHE_SECONDS", 300))
+
+GENDER, CATEGORY, SUBCATEGORY = 0, 1, 2
+
+# Árbol inicial (el mismo que crea la migración); las subcategorías las crean los vendedores
+GENDERS = (("mujer", "Mujer"), ("hombre", "Hombre"), ("unisex", "Unisex"))
+DEFAULT_CATEGORIES = {
+    "mujer": (("vestidos", "Vestidos"), ("blusas", "Blusas"), ("pantalones", "Pantalones"),
+              ("faldas", "Faldas"), ("abrigos", "Abrigos"), ("zapatos", "Zapatos"),
+              ("deportivo", "Ropa Deportiva")),
+    "hombre": (("camisetas", "Camisetas"), ("camisas", "Camisas"), ("pantalones", "Pantalones"),
+               ("abrigos", "Abrigos"), ("zapatos", "Zapatos"), ("deportivo", "Ropa Deportiva")),
+    "unisex": (("accesorios", "Accesorios"), ("bolsos", "Bolsos"), ("gorras", "Gorras")),
+}
+
+Node = namedtuple("Node", "id parent_id depth slug name position")
+
+
+def slugify(value):
+    value = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")
+
+
+class Taxonomy:
+    """Instantánea inmutable del árbol de categorías."""
+
+    def __init__(self, nodes):
+        self.nodes = {node.id: node for node in nodes}
+        self.by_slug = {node.slug: node for node in nodes}
+        self.children = {}
+        for node in sorted(nodes, key=lambda node: (node.position, node.name)):
+            self.children.setdefault(node.parent_id, []).append(node)
+        self.loaded_at = time.monotonic()
+
+    def slug(self, node_id):
+        node = self.nodes.get(node_id)
+        return node.slug if node else None
+
+    def name(self, node_id):
+        node = self.nodes.get(node_id)
+        return node.name if node else None
+
+    def _matching(self, depth, predicate):
+        return [node.id for node in self.nodes.values() if node.depth == depth and predicate(node)]
+
+    # --- filtros del catálogo ---
+
+    def gender_id(self, gender):
+        node = self.by_slug.get(gender)
+        return node.id if node and node.depth == GENDER else None
+
+    def category_ids(self, category):
+        """'mujer_vestidos' es exacta; 'vestidos' vale para todos los géneros (contiene)."""
+        if "_" in category:
+            node = self.by_slug.get(category)
+            return [node.id] if node and node.depth == CATEGORY else []
+        return self._matching(CATEGORY, lambda node: category in node.slug)
+
+    def subcategory_ids(self, subcategory):
+        subcategory = subcategory.lower()
+        return self._matching(SUBCATEGORY, lambda node: subcategory in node.name.lower())
+
+    # --- /api/categories ---
+
+    def tree(self, counts):
+        def build(node):
+            children = [build(child) for child in self.children.get(node.id, [])]
+            count = counts.get(node.id, 0)
+            if node.depth == GENDER:
+                count = sum(child["product_count"] for child in children)
+            return {"id": node.id, "slug": node.slug, "name": node.name,
+                    "product_count": count, "children": children}
+        return [build(node) for node in self.children.get(None, [])]
+
+
+_taxonomy = None
+_lock = threading.Lock()
+
+
+def load_taxonomy():
+    global _taxonomy
+    rows = db.session.execute(select(Category.id, Category.parent_id, Category.depth, Category.slug,
+                                     Category.name, Category.position)).all()
+    _taxonomy = Taxonomy([Node(*row) for row in rows])
+    return _taxonomy
+
+
+def get_taxonomy(*node_ids):
+    """Árbol en caché; se recarga si caducó o si falta alguno de node_ids."""
+    taxonomy = _taxonomy
+    if taxonomy is not None and time.monotonic() - taxonomy.loaded_at < CATEGORY_CACHE_SECONDS \
+            and all(node_id is None or node_id in taxonomy.nodes for node_id in node_ids):
+        return taxonomy
+    with _lock:
+        if _taxonomy is not taxonomy and _taxonomy is not None:
+            return _taxonomy
+        return load_taxonomy()
+
+
+def invalidate_taxonomy():
+    global _taxonomy
+    _taxonomy = None
+
+
+def category_counts():
+    """{id: product_count} al momento: la tabla es pequeña y se lee entera."""
+    return dict(db.session.execute(select(Category.id, Category.product_count)).all())
+
+
+def get_category_tree():
+    return get_taxonomy().tree(category_counts())
+
+
+def _subcategory_id(parent, name):
+    name = " ".join(name.split())[:100]
+    key = slugify(name)
+    if not key:
+        return None
+    slug = f"{parent.slug}_{key}"[:120]
+    node = get_taxonomy().by_slug.get(slug)
+    if node:
+        return node.id
+    # Dos vendedores pueden crear la misma subcategoría a la vez: gana el primero
+    db.session.execute(
+        dialect_insert(Category.__table__)
+        .values(parent_id=parent.id, depth=SUBCATEGORY, slug=slug, name=name, position=0, product_count=0)
+        .on_conflict_do_nothing(index_elements=["slug"])
+    )
+    invalidate_taxonomy()
+    return db.session.scalar(select(Category.id).where(Category.slug == slug))
+
+
+def resolve_category(category, subcategory=None):
+    """
+    Slug de categoría ('mujer_vestidos') y subcategoría libre ('Vaqueros rectos', se crea
+    si no existe) -> (gender_id, category_id, subcategory_id). ValueError si la categoría no existe.
+    """
+    node = get_taxonomy().by_slug.get((category or "").lower())
+    if node is None or node.depth != CATEGORY:
+        raise ValueError(f"Unknown category: {category!r}")
+    subcategory_id = _subcategory_id(node, subcategory) if subcategory else None
+    return node.parent_id, node.id, subcategory_id
+
+
+def ensure_default_taxonomy():
+    """Crea los géneros y categorías por defecto que falten (la migración ya los crea)."""
+    table = Category.__table__
+    for position, (gender, gender_name) in enumerate(GENDERS):
+        db.session.execute(
+            dialect_insert(table)
+            .values(parent_id=None, depth=GENDER, slug=gender, name=gender_name, position=position)
+            .on_conflict_do_nothing(index_elements=["slug"])
+        )
+        gender_id = db.session.scalar(select(Category.id).where(Category.slug == gender))
+        for child_position, (category, name) in enumerate(DEFAULT_CATEGORIES[gender]):
+            db.session.execute(
+                dialect_insert(table)
+                .values(parent_id=gender_id, depth=CATEGORY, slug=f"{gender}_{category}", name=name,
+                        position=child_position)
+                .on_conflict_do_nothing(index_elements=["slug"])
+            )
+    db.session.commit()
+    invalidate_taxonomy()
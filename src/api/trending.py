@@ -0,0 +1,156 @@
+# src/api/trending.py
+
+"""
+Vistas e impresiones de productos con escritura diferida, y ranking de tendencias.
+
+Contar una vista con un UPDATE por petición convertiría los productos populares en
+un punto caliente de escritura. Cada worker acumula en memoria
+{(product_id, día): [vistas, impresiones]} (record_view en la página de detalle,
+record_impressions con los productos de cada página del catálogo) y un hilo lo
+vuelca cada VIEW_FLUSH_SECONDS con un upsert por lote en product_activity
+(col = col + delta, como api/stats.py). Si el proceso muere se pierden como
+mucho esos segundos de vistas.
+
+Tendencia: la suma sobre los últimos TRENDING_WINDOW_DAYS días de
+(vistas + IMPRESSION_WEIGHT * impresiones), cada día con peso
+0.5 ** (antigüedad / TRENDING_HALF_LIFE_DAYS). Se calcula en SQL cada
+TRENDING_REFRESH_SECONDS (o con `flask refresh-trending`) y se guarda en
+trending_product, solo productos activos y como mucho TRENDING_SIZE, así
+?sort=trending del catálogo es un JOIN ordenado por rank.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import case, delete, func, insert, select
+from api.models import db, Product, ProductActivity, TrendingProduct, PRODUCT_IS_ACTIVE
+from api.stats import dialect_insert
+from api.utils import serves_requests
+
+VIEW_FLUSH_SECONDS = float(os.getenv("VIEW_FLUSH_SECONDS", 30))
+TRENDING_REFRESH_SECONDS = float(os.getenv("TRENDING_REFRESH_SECONDS", 600))
+TRENDING_WINDOW_DAYS = int(os.getenv("TRENDING_WINDOW_DAYS", 14))
+TRENDING_HALF_LIFE_DAYS = float(os.getenv("TRENDING_HALF_LIFE_DAYS", 3))
+TRENDING_SIZE = int(os.getenv("TRENDING_SIZE", 5000))
+IMPRESSION_WEIGHT = float(os.getenv("IMPRESSION_WEIGHT", 0.05))
+# Filas por sentencia en el volcado
+FLUSH_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+_buffer = defaultdict(lambda: [0, 0])
+_buffer_lock = threading.Lock()
+
+
+def record_view(product_id):
+    with _buffer_lock:
+        _buffer[product_id, datetime.utcnow().date()][0] += 1
+
+
+def record_impressions(product_ids):
+    day = datetime.utcnow().date()
+    with _buffer_lock:
+        for product_id in product_ids:
+            _buffer[product_id, day][1] += 1
+
+
+def flush_activity():
+    """Vuelca lo acumulado en product_activity. Devuelve las filas escritas."""
+    global _buffer
+    with _buffer_lock:
+        pending, _buffer = _buffer, defaultdict(lambda: [0, 0])
+    if not pending:
+        return 0
+
+    rows = [{"product_id": product_id, "day": day, "views": views, "impressions": impressions}
+            for (product_id, day), (views, impressions) in pending.items()]
+    table = ProductActivity.__table__
+    try:
+        for start in range(0, len(rows), FLUSH_BATCH_SIZE):
+            stmt = dialect_insert(table).values(rows[start:start + FLUSH_BATCH_SIZE])
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.product_id, table.c.day],
+                set_={"views": table.c.views + stmt.excluded.views,
+                      "impressions": table.c.impressions + stmt.excluded.impressions},
+            ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        # Se devuelven al buffer para el siguiente intento
+        with _buffer_lock:
+            for key, (views, impressions) in pending.items():
+                _buffer[key][0] += views
+                _buffer[key][1] += impressions
+        raise
+    return len(rows)
+
+
+def rebuild_trending():
+    """Recalcula trending_product desde product_activity. Devuelve los productos del ranking."""
+    now = datetime.utcnow()
+    today = now.date()
+    cutoff = today - timedelta(days=TRENDING_WINDOW_DAYS - 1)
+    db.session.execute(delete(ProductActivity).where(ProductActivity.day < cutoff))
+
+    # Peso de cada día de la ventana; la suma ponderada se hace en SQL
+    weight = case(
+        {cutoff + timedelta(days=age): 0.5 ** ((TRENDING_WINDOW_DAYS - 1 - age) / TRENDING_HALF_LIFE_DAYS)
+         for age in range(TRENDING_WINDOW_DAYS)},
+        value=ProductActivity.day, else_=0.0,
+    )
+    score = func.sum((ProductActivity.views + IMPRESSION_WEIGHT * ProductActivity.impressions) * weight)
+    ranking = db.session.execute(
+        select(ProductActivity.product_id, score.label("score"))
+        .join(Product, Product.id == ProductActivity.product_id)
+        .where(ProductActivity.day >= cutoff, PRODUCT_IS_ACTIVE)
+        .group_by(ProductActivity.product_id)
+        .order_by(score.desc(), ProductActivity.product_id)
+        .limit(TRENDING_SIZE)
+    ).all()
+
+    db.session.execute(delete(TrendingProduct))
+    if ranking:
+        db.session.execute(insert(TrendingProduct), [
+            {"product_id": product_id, "rank": rank, "score": float(score), "computed_at": now}
+            for rank, (product_id, score) in enumerate(ranking, start=1)
+        ])
+    db.session.commit()
+    return len(ranking)
+
+
+def trending_due():
+    """El ranking se comparte entre workers: se rehace si el de la tabla ya caducó."""
+    computed_at = db.session.scalar(select(func.max(TrendingProduct.computed_at)))
+    return computed_at is None or (datetime.utcnow() - computed_at).total_seconds() >= TRENDING_REFRESH_SECONDS
+
+
+def setup_trending(app):
+    # Solo los procesos que atienden peticiones; en CLI usa `flask refresh-trending`
+    if not serves_requests():
+        return
+
+    def flush():
+        with app.app_context():
+            try:
+                flush_activity()
+            except Exception:
+                logger.exception("View counters flush failed")
+
+    def run():
+        stop = threading.Event()
+        while not stop.wait(VIEW_FLUSH_SECONDS):
+            with app.app_context():
+                try:
+                    flush_activity()
+                    if trending_due():
+                        rebuild_trending()
+                except Exception:
+                    # Otro worker pudo rehacer el ranking a la vez: se reintenta en la siguiente vuelta
+                    db.session.rollback()
+                    logger.exception("Trending update failed")
+
+    # Lo pendiente al apagar el worker también se vuelca
+    atexit.register(flush)
+    threading.Thread(target=run, name="trending", daemon=True).start()
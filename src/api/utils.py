@@ -1,4 +1,8 @@
+import os
+import click
 from flask import jsonify, url_for
+from flask.cli import get_debug_flag
+from werkzeug.serving import is_running_from_reloader
 
 class APIException(Exception):
     status_code = 400
@@ -15,13 +19,31 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+def serves_requests():
+    """
+    True si el proceso va a atender peticiones: gunicorn (wsgi.py), `python app.py`
+    o `flask run`. False en el resto de comandos `flask ...` (db upgrade, seeds,
+    benchmarks...), que no deben arrancar los hilos de fondo. Flask pone
+    FLASK_RUN_FROM_CLI=true en todos sus comandos, también en `flask run`.
+    """
+    if os.getenv("FLASK_RUN_FROM_CLI") != "true":
+        return True
+    ctx = click.get_current_context(silent=True)
+    if ctx is None or ctx.info_name != "run":
+        return False
+    # Con el reloader, el proceso padre solo vigila ficheros: los hilos van en el hijo
+    reload = ctx.params.get("reload")
+    if reload is None:
+        reload = get_debug_flag()
+    return not reload or is_running_from_reloader()
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
     return len(defaults) >= len(arguments)
 
 def generate_sitemap(app):
-    links = ['/admin/']
+    links = ['/admin/'] if 'admin' in app.blueprints else []
     for rule in app.url_map.iter_rules():
         # Filter out rules we can't navigate to in a browser
         # and rules that require parameters
@@ -1,18 +1,35 @@
 # src/api/utils_password.py
 
+import hashlib
 import os
+from typing import Optional
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 
 SECRET = os.getenv("RESET_SECRET", "cámbiame")   # Pon un secreto real en tu .env
 SALT   = "password-reset-salt"
 TS     = URLSafeTimedSerializer(SECRET, salt=SALT)
 
-def generate_reset_token(user_id: int) -> str:
-    return TS.dumps({"uid": user_id})
+RESET_TOKEN_MAX_AGE = 24 * 3600  # segundos
 
-def verify_reset_token(token: str, max_age=3600) -> int | None:
+
+def _password_fingerprint(password_hash: str) -> str:
+    # Nonce de un solo uso: al cambiar la contraseña cambia el hash y el token deja de valer
+    return hashlib.sha256(password_hash.encode()).hexdigest()[:16]
+
+
+def generate_reset_token(user) -> str:
+    return TS.dumps({"uid": user.id, "pw": _password_fingerprint(user.password)})
+
+
+def verify_reset_token(token: str, max_age=RESET_TOKEN_MAX_AGE) -> Optional[dict]:
     try:
         data = TS.loads(token, max_age=max_age)
-        return data.get("uid")
     except (BadSignature, SignatureExpired):
         return None
+    if not isinstance(data, dict) or "uid" not in data or "pw" not in data:
+        return None
+    return data
+
+
+def token_matches_user(data: dict, user) -> bool:
+    return data["pw"] == _password_fingerprint(user.password)
@@ -6,66 +6,115 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for, send_from_directory
-from flask_cors import CORS
-from flask_migrate import Migrate
-from flask_swagger import swagger
-from flask_jwt_extended import JWTManager
+from flask import Flask, jsonify
 from api.utils import APIException, generate_sitemap
 from api.models import db
-from api.routes import api
-from api.admin import setup_admin
-from api.commands import setup_commands
 
 ENV = "development" if os.getenv("FLASK_DEBUG") == "1" else "production"
 static_file_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '../public/')
-app = Flask(__name__)
-app.url_map.strict_slashes = False
-
-
-# database configuration
-db_url = os.getenv("DATABASE_URL")
-if db_url is not None:
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace("postgres://", "postgresql://")
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
-
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# JWT
-app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET', 'super-secret-key')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 86400
-jwt = JWTManager(app)
-
-# CORS global para todas las rutas /api/*
-CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
-
-# Inicializar la base de datos
-MIGRATE = Migrate(app, db, compare_type=True)
-db.init_app(app)
-
-# Setup
-setup_admin(app)
-setup_commands(app)
-app.register_blueprint(api, url_prefix='/api')
-
-@app.errorhandler(APIException)
-def handle_invalid_usage(error):
-    return jsonify(error.to_dict()), error.status_code
-
-@app.route('/')
-def sitemap():
-    if ENV == "development":
-        return generate_sitemap(app)
-    return send_from_directory(static_file_dir, 'index.html')
-
-@app.route('/<path:path>', methods=['GET'])
-def serve_any_other_file(path):
-    if not os.path.isfile(os.path.join(static_file_dir, path)):
-        path = 'index.html'
-    response = send_from_directory(static_file_dir, path)
-    response.cache_control.max_age = 0
-    return response
+
+# El panel de admin solo se construye si se habilita (por defecto, solo en desarrollo)
+ENABLE_ADMIN = os.getenv("ENABLE_ADMIN", "1" if ENV == "development" else "0") == "1"
+
+
+def create_app():
+    """
+    Crea la aplicación cargando cada subsistema solo cuando hace falta:
+    - Flask-Migrate (alembic) solo al ejecutar comandos `flask ...`
+    - Flask-Admin solo si ENABLE_ADMIN=1
+    - Swagger se genera bajo demanda en /swagger.json
+    - Cloudinary se configura en la primera subida (ver api/cloudinary_service.py)
+    - El índice del catálogo (y numpy) solo con CATALOG_INDEX=1, el autocompletado solo con SEARCH_SUGGEST=1
+    Las rutas, las métricas y el hilo de tendencias se cargan siempre en los procesos que atienden peticiones.
+    Las respuestas se comprimen y los estáticos se sirven precomprimidos (api/compression.py).
+    """
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+
+    # database configuration
+    db_url = os.getenv("DATABASE_URL")
+    if db_url is not None:
+        app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace("postgres://", "postgresql://")
+    else:
+        app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
+
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # JWT
+    from flask_jwt_extended import JWTManager
+    app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET', 'super-secret-key')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 86400
+    JWTManager(app)
+
+    # CORS global para todas las rutas /api/*
+    from flask_cors import CORS
+    CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
+
+    # Inicializar la base de datos
+    db.init_app(app)
+
+    # alembic es la importación más cara del arranque y solo la usan los comandos `flask db ...`
+    if os.getenv("FLASK_RUN_FROM_CLI") == "true":
+        from flask_migrate import Migrate
+        Migrate(app, db, compare_type=True)
+
+    # Setup
+    if ENABLE_ADMIN:
+        from api.admin import setup_admin
+        setup_admin(app)
+
+    from api.metrics import setup_metrics
+    setup_metrics(app)
+
+    from api.compression import setup_compression, send_static
+    setup_compression(app)
+
+    from api.rate_limit import setup_rate_limits
+    setup_rate_limits(app)
+
+    from api.offer_expiry import setup_offer_expiry
+    setup_offer_expiry(app)
+
+    from api.catalog_index import setup_catalog_index
+    setup_catalog_index(app)
+
+    from api.suggest import setup_suggest
+    setup_suggest(app)
+
+    from api.trending import setup_trending
+    setup_trending(app)
+
+    from api.commands import setup_commands
+    setup_commands(app)
+
+    from api.routes import api
+    app.register_blueprint(api, url_prefix='/api')
+
+    @app.errorhandler(APIException)
+    def handle_invalid_usage(error):
+        return jsonify(error.to_dict()), error.status_code
+
+    @app.route('/')
+    def sitemap():
+        if ENV == "development":
+            return generate_sitemap(app)
+        return send_static(static_file_dir, 'index.html')
+
+    @app.route('/swagger.json')
+    def swagger_spec():
+        from flask_swagger import swagger
+        return jsonify(swagger(app))
+
+    @app.route('/<path:path>', methods=['GET'])
+    def serve_any_other_file(path):
+        if not os.path.isfile(os.path.join(static_file_dir, path)):
+            path = 'index.html'
+        return send_static(static_file_dir, path)
+
+    return app
+
+
+app = create_app()
 
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3001))
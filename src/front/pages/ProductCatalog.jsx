@@ -41,6 +41,10 @@ const ProductCatalog = () => {
     // Estado para controlar si el sidebar de filtros está abierto en móvil
     const [showFilters, setShowFilters] = useState(false);
 
+    // Texto del buscador y sugerencias: el catálogo solo se consulta al confirmar la búsqueda
+    const [searchInput, setSearchInput] = useState(filters.search);
+    const [suggestions, setSuggestions] = useState([]);
+
     // Efecto para manejar los parámetros de la ruta
     useEffect(() => {
         // Si viene de una ruta como /mujer/vestidos
@@ -76,6 +80,9 @@ const ProductCatalog = () => {
         params.append('page', pagination.page);
         params.append('per_page', pagination.per_page);
 
+        // Solo los campos que pinta la tarjeta (id, título, precio, talla, marca, primera imagen)
+        params.append('view', 'card');
+
         return params.toString();
     };
 
@@ -117,6 +124,51 @@ const ProductCatalog = () => {
         setSearchParams(params);
     }, [filters]);
 
+    // Sugerencias mientras se escribe (índice en memoria del backend, sin consultar el catálogo)
+    useEffect(() => {
+        const query = searchInput.trim();
+        if (query.length < 2) {
+            setSuggestions([]);
+            return;
+        }
+        const controller = new AbortController();
+        const timer = setTimeout(async () => {
+            try {
+                const response = await fetch(
+                    `${import.meta.env.VITE_BACKEND_URL}/api/search/suggest?q=${encodeURIComponent(query)}`,
+                    { signal: controller.signal }
+                );
+                if (response.ok) {
+                    const data = await response.json();
+                    setSuggestions(data.suggestions);
+                }
+            } catch (error) {
+                if (error.name !== 'AbortError') console.error('Error al cargar sugerencias:', error);
+            }
+        }, 150);
+        return () => {
+            clearTimeout(timer);
+            controller.abort();
+        };
+    }, [searchInput]);
+
+    // Una sugerencia de marca o categoría aplica ese filtro; la de un título, la búsqueda
+    const applySuggestion = (suggestion) => {
+        setFilters(prev => ({ ...prev, search: '', ...suggestion.params }));
+        setSearchInput(suggestion.params.search || '');
+        setSuggestions([]);
+        setPagination(prev => ({ ...prev, page: 1 }));
+    };
+
+    const handleSearchInput = (value) => {
+        setSearchInput(value);
+        // Elegir una opción del datalist llega como un cambio con su texto exacto
+        const suggestion = suggestions.find(item => item.text === value);
+        if (suggestion) {
+            applySuggestion(suggestion);
+        }
+    };
+
     // Función para manejar cambios en los filtros
     const handleFilterChange = (filterName, value) => {
         setFilters(prev => ({
@@ -141,6 +193,7 @@ const ProductCatalog = () => {
             search: '',
             sort: 'newest'
         });
+        setSearchInput('');
         setPagination(prev => ({ ...prev, page: 1 }));
     };
 
@@ -202,9 +255,17 @@ const ProductCatalog = () => {
                                     type="text"
                                     className="form-control"
                                     placeholder="Buscar productos..."
-                                    value={filters.search}
-                                    onChange={(e) => handleFilterChange('search', e.target.value)}
+                                    list="search-suggestions"
+                                    value={searchInput}
+                                    onChange={(e) => handleSearchInput(e.target.value)}
+                                    onKeyDown={(e) => e.key === 'Enter' && handleFilterChange('search', searchInput.trim())}
+                                    onBlur={() => searchInput.trim() !== filters.search && handleFilterChange('search', searchInput.trim())}
                                 />
+                                <datalist id="search-suggestions">
+                                    {suggestions.map(suggestion => (
+                                        <option key={`${suggestion.type}-${suggestion.text}`} value={suggestion.text} />
+                                    ))}
+                                </datalist>
                             </div>
 
                             {/* Género */}
@@ -464,6 +525,7 @@ const ProductCatalog = () => {
                                 onChange={(e) => handleFilterChange('sort', e.target.value)}
                             >
                                 <option value="newest">Más recientes</option>
+                                <option value="trending">Tendencias</option>
                                 <option value="price_asc">Precio: menor a mayor</option>
                                 <option value="price_desc">Precio: mayor a menor</option>
                             </select>
@@ -496,9 +558,7 @@ const ProductCatalog = () => {
                                         <Link to={`/product/${product.id}`} className="text-decoration-none">
                                             <div className="position-relative overflow-hidden">
                                                 <img
-                                                    src={product.images && product.images.length > 0
-                                                        ? product.images[0].url
-                                                        : 'https://via.placeholder.com/300x400?text=Sin+imagen'}
+                                                    src={product.image || 'https://via.placeholder.com/300x400?text=Sin+imagen'}
                                                     className="card-img-top"
                                                     alt={product.title}
                                                     style={{ height: '300px', objectFit: 'cover' }}
@@ -546,7 +606,7 @@ const ProductCatalog = () => {
                                                     {product.discount > 0 ? (
                                                         <>
                                                             <span className="text-danger fw-bold">
-                                                                ${(product.price * (1 - product.discount / 100)).toFixed(2)}
+                                                                ${product.effective_price.toFixed(2)}
                                                             </span>
                                                             <span className="text-muted text-decoration-line-through ms-2 small">
                                                                 ${product.price}
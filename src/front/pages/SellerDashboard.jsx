@@ -4,6 +4,14 @@ import React, { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import useGlobalReducer from "../hooks/useGlobalReducer";
 
+// Disponibilidad del producto (Product.status en el backend)
+const PRODUCT_STATUS_BADGES = {
+    active: { label: "Activo", className: "bg-success" },
+    reserved: { label: "Reservado", className: "bg-warning" },
+    sold: { label: "Vendido", className: "bg-info" },
+    archived: { label: "Archivado", className: "bg-secondary" }
+};
+
 export const SellerDashboard = () => {
     const { store } = useGlobalReducer();
     const navigate = useNavigate();
@@ -23,28 +31,50 @@ export const SellerDashboard = () => {
         if (!store.auth?.isAuthenticated || store.auth?.user?.role !== "seller") {
             navigate("/login");
         } else {
-            // Cargar productos del vendedor
-            loadSellerProducts();
+            // Cargar productos y ofertas pendientes del vendedor
+            loadDashboard();
         }
     }, [store.auth, navigate]);
 
+    // Notificaciones en tiempo real: el backend empuja los eventos de ofertas por SSE
+    // y solo recargamos el contador cuando llega uno (en lugar de hacer polling)
     useEffect(() => {
-        const interval = setInterval(() => {
-            if (!document.hidden) {  // Solo si la pestaña está visible
-                loadPendingOffersCount();
-            }
-        }, 300);
+        if (!store.auth?.token) return;
+
+        const backendUrl = import.meta.env.VITE_BACKEND_URL;
+        const handleOfferEvent = () => loadPendingOffersCount();
+        let source;
+        let retryTimer;
+
+        const connect = () => {
+            source = new EventSource(`${backendUrl}/api/events/stream?token=${store.auth.token}`);
+            ["offer_created", "offer_accepted", "offer_rejected"].forEach((type) =>
+                source.addEventListener(type, handleOfferEvent)
+            );
+            // Al (re)conectar recargamos: los eventos publicados mientras no había stream se pierden
+            source.addEventListener("open", handleOfferEvent);
+            // Si el servidor está lleno responde 503 y EventSource no reconecta solo: reintentamos más tarde
+            source.onerror = () => {
+                if (source.readyState === EventSource.CLOSED) {
+                    retryTimer = setTimeout(connect, 30000);
+                }
+            };
+        };
+        connect();
 
-        return () => clearInterval(interval);
-    }, []);
+        return () => {
+            clearTimeout(retryTimer);
+            source.close();
+        };
+    }, [store.auth?.token]);
 
-    // Función para cargar el contador de ofertas pendientes
+    // Función para cargar el contador de ofertas pendientes (agregado de seller_stats, sin listar las ofertas)
     const loadPendingOffersCount = async () => {
 
         try {
             const backendUrl = import.meta.env.VITE_BACKEND_URL;
 
-            const url = `${backendUrl}/api/seller/offers?status=pending`;
+            const url = `${backendUrl}/api/seller/profile`;
 
 
             const response = await fetch(url, {
@@ -56,7 +86,7 @@ export const SellerDashboard = () => {
 
             if (response.ok) {
                 const data = await response.json();
-                setPendingOffersCount(data.stats?.pending || 0);
+                setPendingOffersCount(data.stats?.pending_offers || 0);
             } else {
                 console.error("Error en la respuesta:", response.status, response.statusText);
                 const errorText = await response.text();
@@ -68,6 +98,46 @@ export const SellerDashboard = () => {
         }
     };
 
+    // Carga inicial en un solo viaje (/api/batch): productos y perfil, cuyo stats trae el contador
+    // de ofertas pendientes ya agregado (listar las ofertas solo para contarlas sería lo más caro del lote)
+    const loadDashboard = async () => {
+        try {
+            setIsLoading(true);
+            const backendUrl = import.meta.env.VITE_BACKEND_URL;
+
+            const response = await fetch(`${backendUrl}/api/batch`, {
+                method: "POST",
+                headers: {
+                    "Content-Type": "application/json",
+                    "Authorization": `Bearer ${store.auth?.token}`
+                },
+                body: JSON.stringify({
+                    requests: [
+                        { id: "products", method: "GET", path: "/api/seller/products" },
+                        { id: "profile", method: "GET", path: "/api/seller/profile" }
+                    ]
+                })
+            });
+
+            if (!response.ok) {
+                throw new Error("Error al cargar el panel");
+            }
+
+            const data = await response.json();
+            const [products, profile] = data.responses;
+            if (products.status === 200) {
+                setProducts(products.body.products || []);
+            }
+            if (profile.status === 200) {
+                setPendingOffersCount(profile.body.stats?.pending_offers || 0);
+            }
+        } catch (error) {
+            console.error("Error loading dashboard:", error);
+        } finally {
+            setIsLoading(false);
+        }
+    };
+
     const loadSellerProducts = async () => {
         try {
             setIsLoading(true);
@@ -129,6 +199,35 @@ export const SellerDashboard = () => {
         }
     };
 
+    // Archivar retira el producto del catálogo sin borrarlo; se puede volver a publicar
+    const handleToggleArchive = async (product) => {
+        const status = product.status === "active" ? "archived" : "active";
+        try {
+            const backendUrl = import.meta.env.VITE_BACKEND_URL;
+
+            const response = await fetch(`${backendUrl}/api/products/${product.id}`, {
+                method: "PUT",
+                headers: {
+                    "Content-Type": "application/json",
+                    "Authorization": `Bearer ${store.auth?.token}`
+                },
+                body: JSON.stringify({ status })
+            });
+
+            const data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.error || "Error al actualizar el producto");
+            }
+
+            setProducts(prevProducts => prevProducts.map(item => item.id === product.id ? data.product : item));
+            setAlertMessage(status === "archived" ? "Producto archivado" : "Producto publicado de nuevo");
+            setAlertType("success");
+        } catch (error) {
+            console.error("Error actualizando producto:", error);
+            setAlertMessage(error.message || "Ocurrió un error al actualizar el producto");
+            setAlertType("danger");
+        }
+    };
 
     const handleEditProduct = (product) => {
         setEditingProduct(product);
@@ -360,7 +459,9 @@ export const SellerDashboard = () => {
                                                         <td>{product.title}</td>
                                                         <td>${product.price.toFixed(2)}</td>
                                                         <td>
-                                                            <span className="badge bg-success">Activo</span>
+                                                            <span className={`badge ${PRODUCT_STATUS_BADGES[product.status]?.className || 'bg-secondary'}`}>
+                                                                {PRODUCT_STATUS_BADGES[product.status]?.label || product.status}
+                                                            </span>
                                                         </td>
                                                         <td>
                                                             <button
@@ -369,6 +470,15 @@ export const SellerDashboard = () => {
                                                             >
                                                                 <i className="fas fa-edit"></i>
                                                             </button>
+                                                            {(product.status === "active" || product.status === "archived") && (
+                                                                <button
+                                                                    className="btn btn-sm btn-outline-secondary me-1"
+                                                                    title={product.status === "active" ? "Archivar" : "Volver a publicar"}
+                                                                    onClick={() => handleToggleArchive(product)}
+                                                                >
+                                                                    <i className={`fas ${product.status === "active" ? "fa-archive" : "fa-undo"}`}></i>
+                                                                </button>
+                                                            )}
                                                             <button
                                                                 className="btn btn-sm btn-outline-danger"
                                                                 onClick={() => handleDeleteProduct(product.id)}